@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, EmailStr
-import os, base64, hmac, hashlib, boto3, anyio
+import os, base64, hmac, hashlib
 from botocore.exceptions import ClientError
+from app.services.cognitoGateway import COGNITO_STUB, cognito_gateway
+from app.services.tokenVerifier import token_verifier
+from app.shared.auth import get_token_claims
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -11,11 +14,9 @@ USER_POOL_ID = os.getenv("COGNITO_USER_POOL_ID")
 CLIENT_ID = os.getenv("COGNITO_APP_CLIENT_ID")
 CLIENT_SECRET = os.getenv("COGNITO_APP_CLIENT_SECRET")  # si existe -> enviar SECRET_HASH
 
-if not (REGION and USER_POOL_ID and CLIENT_ID):
+if not COGNITO_STUB and not (REGION and USER_POOL_ID and CLIENT_ID):
     raise RuntimeError("Faltan vars de entorno: COGNITO_REGION, COGNITO_USER_POOL_ID, COGNITO_APP_CLIENT_ID.")
 
-cognito = boto3.client("cognito-idp", region_name=REGION)
-
 # === Utils ===
 def _secret_hash(username: str) -> str | None:
     if not CLIENT_SECRET:
@@ -49,8 +50,8 @@ async def login(body: LoginDto):
     username = body.email.strip().lower()
     password = body.password
 
-    def _initiate():
-        return cognito.initiate_auth(
+    try:
+        resp = await cognito_gateway.initiate_auth(
             ClientId=CLIENT_ID,
             AuthFlow="USER_PASSWORD_AUTH",
             AuthParameters=_build_auth_params(username, {
@@ -59,9 +60,6 @@ async def login(body: LoginDto):
             }),
         )
 
-    try:
-        resp = await anyio.to_thread.run_sync(_initiate)
-
         # Manejo de challenges comunes
         if "ChallengeName" in resp:
             ch = resp["ChallengeName"]
@@ -87,17 +85,14 @@ async def refresh(body: RefreshDto):
         # Forzar a enviar username cuando el client usa secret
         raise HTTPException(status_code=400, detail="username es requerido para REFRESH cuando el client usa secret.")
 
-    def _refresh():
-        return cognito.initiate_auth(
+    try:
+        resp = await cognito_gateway.initiate_auth(
             ClientId=CLIENT_ID,
             AuthFlow="REFRESH_TOKEN_AUTH",
             AuthParameters=_build_auth_params(username, {
                 "REFRESH_TOKEN": body.refresh_token,
             }),
         )
-
-    try:
-        resp = await anyio.to_thread.run_sync(_refresh)
         auth = resp.get("AuthenticationResult", {})
         return {
             "access_token": auth.get("AccessToken"),
@@ -106,4 +101,25 @@ async def refresh(body: RefreshDto):
             "token_type": auth.get("TokenType"),
         }
     except ClientError as e:
-        raise HTTPException(status_code=401, detail=e.response["Error"]["Message"])
\ No newline at end of file
+        raise HTTPException(status_code=401, detail=e.response["Error"]["Message"])
+
+@router.get("/me")
+async def me(claims: dict = Depends(get_token_claims)):
+    """Claims del token actual, verificado localmente contra el JWKS cacheado (sin llamar a Cognito)."""
+    return {
+        "sub": claims.get("sub"),
+        "username": claims.get("username") or claims.get("cognito:username"),
+        "email": claims.get("email"),
+        "token_use": claims.get("token_use"),
+        "exp": claims.get("exp"),
+        "scope": claims.get("scope"),
+    }
+
+@router.get("/verifier/stats")
+async def verifier_stats():
+    return token_verifier.stats()
+
+@router.get("/cognito/stats")
+async def cognito_stats():
+    """Concurrencia, errores y latencias (p50/p95/p99) por operación de Cognito."""
+    return cognito_gateway.stats()
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_db, AsyncSessionLocal
+from app.schemas.chatsDto import ChatRequestDto
+from app.services.chatService import ChatService
+from app.services.conversationMemory import conversation_memory
+from app.services.llmService import build_messages, stream_completion
+from app.services.queryBatcher import query_batcher
+from app.services.retrievalService import RetrievalService
+from app.services.semanticCache import semantic_cache, SEMANTIC_CACHE_ENABLED
+from app.shared.auth import AUTH_ENABLED, token_matches_user
+
+router = APIRouter(prefix="/chat", tags=["chat"])
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _authorize_user(request: Request, db: AsyncSession, user_id: int, client_id: int | None = None) -> None:
+    """
+    `idUser`/`idClient` vienen del cuerpo: el usuario debe existir, estar activo y pertenecer al
+    cliente, y con AUTH_ENABLED ser el dueño del token. Si no, se podría consultar el índice de
+    otro tenant o escribir chats a nombre de otro usuario.
+    """
+    user = await ChatService(db).get_chat_user(user_id)
+    if user is None or not user.swt:
+        raise HTTPException(status_code=404, detail="User not found.")
+    if client_id is not None and user.idClient != client_id:
+        raise HTTPException(status_code=403, detail="User does not belong to this client.")
+    if AUTH_ENABLED and not token_matches_user(getattr(request.state, "claims", None), user.username, user.email):
+        raise HTTPException(status_code=403, detail="Token does not belong to this user.")
+
+async def _persist(body: ChatRequestDto, answer: str, doc_ids: list) -> int | None:
+    details = [("user", body.message), ("bot", answer)]
+    # sesión propia: la de la dependencia ya se cerró cuando el stream está en curso
+    async with AsyncSessionLocal() as session:
+        chat_id = await ChatService(session).persist_exchange(
+            idUser=body.idUser,
+            session_id=body.session_id,
+            message=body.message,
+            response=answer,
+            source_documents=doc_ids,
+            details=details,
+        )
+    if chat_id is not None:
+        await conversation_memory.append(body.idUser, body.session_id, details)
+    return chat_id
+
+async def _cached_events(body: ChatRequestDto, cached, started: float):
+    doc_ids = sorted(cached.doc_ids)
+    yield _sse("sources", {"documents": doc_ids, "chunks": []})
+    yield _sse("token", {"t": cached.answer})
+    chat_id = await asyncio.shield(_persist(body, cached.answer, doc_ids))
+    yield _sse("done", {
+        "chat_id": chat_id,
+        "cached": True,
+        "similarity": round(cached.similarity, 4),
+        "timings_ms": {"total": round((time.perf_counter() - started) * 1000, 3)},
+    })
+
+@router.post("/stream")
+async def chat_stream(body: ChatRequestDto, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Responde como server-sent events:
+    - `sources`: chunks usados como contexto (se envía antes de generar).
+    - `token`: cada fragmento generado por el LLM.
+    - `done`: id del chat persistido, tiempos y si la respuesta salió de la caché semántica.
+    Si una pregunta casi idéntica ya se respondió con los mismos documentos, se devuelve
+    esa respuesta sin recuperar ni llamar al LLM. Solo en el primer turno de la sesión: con
+    historial la misma pregunta puede significar otra cosa ("¿y el anterior?"), así que ni
+    se consulta ni se alimenta la caché.
+    El chat y sus detalles se guardan en un único INSERT en bloque al terminar el stream.
+    Si el cliente se desconecta, Starlette cancela el generador y se corta la generación
+    (no se persiste nada).
+    """
+    if not body.message.strip():
+        raise HTTPException(status_code=400, detail="message es requerido.")
+    await _authorize_user(request, db, body.idUser, body.idClient)
+
+    started = time.perf_counter()
+    query_vec = await query_batcher.embed(body.message)
+    # misma sesión: no se pueden solapar (el historial suele salir de la caché)
+    history = await conversation_memory.history(db, body.idUser, body.session_id)
+    use_cache = SEMANTIC_CACHE_ENABLED and not history
+    cached = semantic_cache.lookup(body.idClient, query_vec) if use_cache else None
+    if cached is not None:
+        return StreamingResponse(
+            _cached_events(body, cached, started),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    retrieval = await RetrievalService(db).retrieve(body.idClient, body.message, k=body.k, query_vec=query_vec)
+    chunks = retrieval["results"]
+    doc_ids = sorted({c["idDocument"] for c in chunks})
+    messages = build_messages(body.message, [c["content"] for c in chunks], history)
+
+    async def events():
+        yield _sse("sources", {
+            "documents": doc_ids,
+            "chunks": [{"idDocument": c["idDocument"], "chunk_index": c["chunk_index"]} for c in chunks],
+        })
+        parts = []
+        first_token_ms = None
+        async for token in stream_completion(messages):
+            if first_token_ms is None:
+                first_token_ms = round((time.perf_counter() - started) * 1000, 3)
+            parts.append(token)
+            yield _sse("token", {"t": token})
+
+        answer = "".join(parts)
+        if use_cache:
+            semantic_cache.add(body.idClient, query_vec, body.message, answer, doc_ids)
+        # shield: una desconexión justo al final no debe dejar el commit a medias
+        chat_id = await asyncio.shield(_persist(body, answer, doc_ids))
+        yield _sse("done", {
+            "chat_id": chat_id,
+            "cached": False,
+            "timings_ms": {
+                "retrieval": retrieval["timings_ms"]["total"],
+                "first_token": first_token_ms,
+                "total": round((time.perf_counter() - started) * 1000, 3),
+            },
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/sessions/{session_id}/history", response_model=dict)
+async def session_history(
+    session_id: str,
+    idUser: int,
+    request: Request,
+    token_budget: int | None = Query(None, ge=0),
+    db: AsyncSession = Depends(get_db),
+) -> dict:
+    """Ventana de historial que se enviaría al LLM en el próximo turno de la sesión."""
+    await _authorize_user(request, db, idUser)
+    messages = await conversation_memory.history(db, idUser, session_id, token_budget=token_budget)
+    return {"session_id": session_id, "messages": messages}
+
+@router.get("/memory/stats", response_model=dict)
+async def conversation_memory_stats() -> dict:
+    return conversation_memory.stats()
+
+@router.get("/cache/stats", response_model=dict)
+async def semantic_cache_stats() -> dict:
+    return semantic_cache.stats()
+
+@router.post("/cache/{client_id}/warm", response_model=dict)
+async def warm_semantic_cache(client_id: int, limit: int = 500, db: AsyncSession = Depends(get_db)) -> dict:
+    """Precarga la caché semántica con los últimos `Chats` respondidos del cliente."""
+    loaded = await semantic_cache.warm(client_id, db, query_batcher.embed_many, limit=limit)
+    return {"loaded": loaded}
+
+@router.delete("/cache/{client_id}", response_model=dict)
+async def clear_semantic_cache(client_id: int) -> dict:
+    semantic_cache.invalidate_client(client_id)
+    return {"detail": "Semantic cache cleared."}
@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.session import get_db
-from app.schemas.clientsDto import CreateClientsDto, UpdateClientsDto, ClientsDto
+from app.db.session import get_db, ReadSessionLocal
+from app.schemas.clientsDto import CreateClientsDto, UpdateClientsDto, ClientsDto, BulkUpdateClientsDto
 from app.services.clientService import clientService
+from app.services.clientCache import client_cache
+from app.services.exportService import DATASETS, ExportService
+from app.shared.bulk import BULK_MAX_ITEMS
+from app.shared.endPointResponses import PageDto, BulkResultDto, BulkDeleteDto
 from typing import List, Optional
 import os
-import boto3
-from botocore.exceptions import ClientError
-import anyio
 
 router = APIRouter(prefix="/clients", tags=["clients"])
 
@@ -32,6 +34,42 @@ async def create_client(
     
     return client
 
+# --- Lotes (declaradas antes de /{client_id}) ---
+
+def _check_bulk_size(n: int) -> None:
+    if n > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo {BULK_MAX_ITEMS} ítems por lote.")
+
+@router.post("/bulk", response_model=BulkResultDto)
+async def create_clients_bulk(
+    clients: List[CreateClientsDto],
+    client_service: clientService = Depends(get_client_service),
+):
+    """Crea varios clientes en una transacción; los errores se informan por ítem."""
+    _check_bulk_size(len(clients))
+    return await client_service.create_clients_bulk(clients)
+
+@router.put("/bulk", response_model=BulkResultDto)
+async def update_clients_bulk(
+    clients: List[BulkUpdateClientsDto],
+    client_service: clientService = Depends(get_client_service),
+):
+    _check_bulk_size(len(clients))
+    return await client_service.update_clients_bulk(clients)
+
+@router.post("/bulk-delete", response_model=BulkResultDto)
+async def delete_clients_bulk(
+    body: BulkDeleteDto,
+    client_service: clientService = Depends(get_client_service),
+):
+    _check_bulk_size(len(body.ids))
+    return await client_service.delete_clients_bulk(body.ids)
+
+@router.get("/cache/stats", response_model=dict)
+async def client_cache_stats() -> dict:
+    """Aciertos/fallos de la caché de búsquedas de clientes (por id, RUC y api_key)."""
+    return client_cache.stats()
+
 @router.get("/{client_id}", response_model=ClientsDto)
 async def get_client(
     client_id: int,
@@ -42,14 +80,48 @@ async def get_client(
         raise HTTPException(status_code=404, detail="Client not found.")
     return client
 
-@router.get("/", response_model=List[ClientsDto])
+@router.get("/{client_id}/export")
+async def export_client(
+    client_id: int,
+    include: str = Query(",".join(DATASETS), description="users,documents,chats"),
+    client_service: clientService = Depends(get_client_service),
+):
+    """
+    Volcado NDJSON (`application/x-ndjson`) de usuarios, documentos y chats (con sus detalles)
+    del cliente, en streaming desde cursores del servidor: la memoria no crece con el tamaño del export.
+    """
+    datasets = [d.strip() for d in include.split(",") if d.strip()]
+    unknown = [d for d in datasets if d not in DATASETS]
+    if unknown or not datasets:
+        raise HTTPException(status_code=400, detail=f"include admite: {', '.join(DATASETS)}.")
+    if not await client_service.get_client(client_id):
+        raise HTTPException(status_code=404, detail="Client not found.")
+
+    async def body():
+        # sesión propia (réplica si hay): la de la dependencia se cierra antes de que empiece el stream
+        async with ReadSessionLocal() as session:
+            async for chunk in ExportService(session).export_client(client_id, datasets):
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="client_{client_id}.ndjson"'},
+    )
+
+@router.get("/", response_model=PageDto[ClientsDto])
 async def list_clients(
-    skip: int = 0,
-    limit: int = 100,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    swt: Optional[bool] = None,
     client_service: clientService = Depends(get_client_service),
-) -> List[ClientsDto]:
-    clients = await client_service.get_clients(skip=skip, limit=limit)
-    return clients
+):
+    """Paginación por cursor: enviar `next_cursor` de la respuesta anterior como `cursor`."""
+    try:
+        clients, next_cursor = await client_service.get_clients(cursor=cursor, limit=limit, swt=swt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": clients, "next_cursor": next_cursor}
 
 @router.put("/{client_id}", response_model=ClientsDto)
 async def update_client(
@@ -0,0 +1,156 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_db
+from app.schemas.documentsDto import (
+    CreateDocumentsDto, UpdateDocumentsDto, DocumentsDto, IngestDocumentsDto, DocumentDedupDto, ClientDedupDto,
+)
+from app.schemas.jobsDto import JobAcceptedDto
+from app.services.documentService import DocumentService
+from app.services.jobQueue import INGEST, QueueFull, job_queue
+from app.services import uploadStore
+from app.shared.endPointResponses import PageDto
+from app.util import parsing
+from typing import Optional
+
+router = APIRouter(prefix="/documents", tags=["documents"])
+
+async def get_document_service(db: AsyncSession = Depends(get_db)) -> DocumentService:
+    return DocumentService(db)
+
+def _queue_full(e: QueueFull) -> HTTPException:
+    return HTTPException(status_code=429, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+def _accepted(job, document_id: Optional[int] = None) -> dict:
+    return {"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}", "document_id": document_id}
+
+@router.post("/", response_model=DocumentsDto)
+async def create_document(
+    document: CreateDocumentsDto,
+    service: DocumentService = Depends(get_document_service),
+):
+    created = await service.create_document(document)
+    if not created:
+        raise HTTPException(status_code=500, detail="Error creating document.")
+    return created
+
+@router.post("/upload/{client_id}", response_model=JobAcceptedDto, status_code=202)
+async def upload_document(
+    client_id: int,
+    request: Request,
+    filename: str = Query(..., min_length=1, max_length=255),
+    title: Optional[str] = Query(None, max_length=200),
+    service: DocumentService = Depends(get_document_service),
+):
+    """
+    Sube un archivo (.txt, .md o .pdf) enviado como cuerpo crudo de la petición
+    (p. ej. `curl --data-binary @manual.pdf`). Se escribe a disco en streaming, se registra como
+    documento con `file_path` y su ingesta (parseo incremental, chunks y vectores) queda encolada
+    como job: la respuesta trae `job_id` y el progreso se consulta en `GET /jobs/{job_id}`.
+    Con la cola llena responde 429 antes de leer el cuerpo.
+    """
+    fmt = parsing.detect_format(filename, request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Unsupported file type (txt, md, pdf).")
+    if fmt == parsing.PDF and not parsing.pdf_supported():
+        raise HTTPException(status_code=415, detail="PDF support requires the optional `pypdf` package.")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > uploadStore.UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="File too large.")
+    try:
+        await job_queue.check_capacity(service.db, client_id)
+    except QueueFull as e:
+        raise _queue_full(e)
+
+    try:
+        path, size = await uploadStore.save_stream(client_id, filename, request.stream())
+    except uploadStore.UploadTooLarge:
+        raise HTTPException(status_code=413, detail="File too large.")
+    if size == 0:
+        uploadStore.delete_file(path)
+        raise HTTPException(status_code=400, detail="Empty file.")
+
+    created = await service.create_document(
+        CreateDocumentsDto(idClient=client_id, title=title or filename[:200], content=""), index=False, file_path=path,
+    )
+    if not created:
+        uploadStore.delete_file(path)
+        raise HTTPException(status_code=500, detail="Error creating document.")
+    # la capacidad ya se verificó: el archivo está guardado y no se rechaza por una carrera
+    job = await job_queue.enqueue(service.db, client_id, INGEST, {"document_ids": [created.id]}, total=1, check=False)
+    return _accepted(job, created.id)
+
+@router.post("/ingest/{client_id}", response_model=JobAcceptedDto, status_code=202)
+async def ingest_documents(
+    client_id: int,
+    body: Optional[IngestDocumentsDto] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Encola la (re)ingesta de los documentos del cliente (todos, o solo `document_ids`): se chunkean,
+    embeben y reemplazan sus chunks y vectores en segundo plano. El resultado queda en `GET /jobs/{job_id}`.
+    """
+    document_ids = body.document_ids if body else None
+    try:
+        job = await job_queue.enqueue(
+            db, client_id, INGEST, {"document_ids": document_ids}, total=len(document_ids or []),
+        )
+    except QueueFull as e:
+        raise _queue_full(e)
+    return _accepted(job)
+
+@router.get("/dedup/{client_id}", response_model=ClientDedupDto)
+async def client_dedup(
+    client_id: int,
+    top: int = Query(10, ge=0, le=100),
+    service: DocumentService = Depends(get_document_service),
+):
+    """Chunks casi duplicados del cliente (enlazados sin embeber) y los documentos con mayor proporción."""
+    return await service.get_client_dedup(client_id, top)
+
+@router.get("/{document_id}/dedup", response_model=DocumentDedupDto)
+async def document_dedup(document_id: int, service: DocumentService = Depends(get_document_service)):
+    """Proporción de chunks del documento que son casi duplicados de otro chunk del cliente."""
+    dedup = await service.get_document_dedup(document_id)
+    if dedup is None:
+        raise HTTPException(status_code=404, detail="Document not found.")
+    return dedup
+
+@router.get("/{document_id}", response_model=DocumentsDto)
+async def get_document(document_id: int, service: DocumentService = Depends(get_document_service)):
+    document = await service.get_document(document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found.")
+    return document
+
+@router.get("/", response_model=PageDto[DocumentsDto])
+async def list_documents(
+    client_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    swt: Optional[bool] = None,
+    service: DocumentService = Depends(get_document_service),
+):
+    """Paginación por cursor: enviar `next_cursor` de la respuesta anterior como `cursor`."""
+    try:
+        documents, next_cursor = await service.get_documents(client_id=client_id, cursor=cursor, limit=limit, swt=swt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": documents, "next_cursor": next_cursor}
+
+@router.put("/{document_id}", response_model=DocumentsDto)
+async def update_document(
+    document_id: int,
+    document: UpdateDocumentsDto,
+    service: DocumentService = Depends(get_document_service),
+):
+    updated = await service.update_document(document_id, document)
+    if not updated:
+        raise HTTPException(status_code=404, detail="Document not found or error updating.")
+    return updated
+
+@router.delete("/{document_id}", response_model=dict)
+async def delete_document(document_id: int, service: DocumentService = Depends(get_document_service)):
+    deleted = await service.delete_document(document_id)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Document not found or error deleting.")
+    return {"detail": "Document deleted successfully."}
@@ -0,0 +1,54 @@
+from typing import Literal, Optional
+import anyio
+from fastapi import APIRouter, HTTPException
+from app.services.annIndex import index_builder
+from app.services.bm25Index import bm25_store
+from app.services.indexRegistry import index_registry
+from app.services.embeddingCache import embedding_cache
+from app.services.vectorStore import compactor
+
+router = APIRouter(prefix="/indexes", tags=["indexes"])
+
+@router.get("/stats", response_model=dict)
+async def index_stats() -> dict:
+    """Contadores del registro de índices de este worker (hits, misses, cargas, desalojos)."""
+    return index_registry.stats()
+
+@router.get("/embedding-cache/stats", response_model=dict)
+async def embedding_cache_stats() -> dict:
+    """Aciertos, fallos y desalojos de la caché de embeddings por contenido."""
+    return embedding_cache.stats()
+
+@router.get("/builds/stats", response_model=dict)
+async def index_build_stats() -> dict:
+    """Construcciones de índices ANN de este worker (pendientes, hechas, fallidas y la última por cliente)."""
+    return index_builder.stats()
+
+@router.get("/compactions/stats", response_model=dict)
+async def compaction_stats() -> dict:
+    """Compactaciones de vectores (snapshot + delta) de este worker: pendientes, hechas y fallidas."""
+    return compactor.stats()
+
+@router.get("/bm25/stats", response_model=dict)
+async def bm25_stats() -> dict:
+    """Índices léxicos abiertos en este worker, reconstrucciones en curso, hechas y descartadas."""
+    return bm25_store.stats()
+
+@router.get("/{client_id}", response_model=dict)
+async def describe_index(client_id: int) -> dict:
+    """Tipo de índice del cliente (flat/hnsw/ivfpq), tamaño y cambios pendientes de reconstrucción."""
+    info = await anyio.to_thread.run_sync(index_registry.describe, client_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Index not found.")
+    return info
+
+@router.post("/{client_id}/rebuild", response_model=dict)
+async def rebuild_index(client_id: int, kind: Optional[Literal["flat", "hnsw", "ivfpq"]] = None) -> dict:
+    """Agenda la reconstrucción del índice en segundo plano (tipo automático por tamaño, o `kind`)."""
+    return {"scheduled": index_builder.schedule(client_id, kind)}
+
+@router.delete("/{client_id}", response_model=dict)
+async def evict_index(client_id: int) -> dict:
+    """Saca de memoria el índice del cliente en este worker (el archivo en disco no se toca)."""
+    index_registry.invalidate(client_id)
+    return {"detail": "Index evicted."}
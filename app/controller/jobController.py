@@ -0,0 +1,48 @@
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_db
+from app.schemas.jobsDto import JobDto
+from app.services.jobQueue import job_queue
+from app.services.jobService import JobService
+from app.shared.endPointResponses import PageDto
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+async def get_job_service(db: AsyncSession = Depends(get_db)) -> JobService:
+    return JobService(db)
+
+@router.get("/stats", response_model=dict)
+async def job_stats(service: JobService = Depends(get_job_service)) -> dict:
+    """Jobs por estado (todos los procesos) y contadores del pool de workers de este proceso."""
+    return {"jobs": await service.status_counts(), "workers": job_queue.stats()}
+
+@router.get("/{job_id}", response_model=JobDto)
+async def get_job(job_id: int, service: JobService = Depends(get_job_service)):
+    """Estado y progreso (`progress_done` de `progress_total` documentos) de un job."""
+    job = await service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+@router.get("/", response_model=PageDto[JobDto])
+async def list_jobs(
+    client_id: Optional[int] = None,
+    status: Optional[Literal["queued", "running", "done", "failed", "cancelled"]] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    service: JobService = Depends(get_job_service),
+):
+    try:
+        jobs, next_cursor = await service.get_jobs(client_id=client_id, status=status, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": jobs, "next_cursor": next_cursor}
+
+@router.post("/{job_id}/cancel", response_model=JobDto)
+async def cancel_job(job_id: int, service: JobService = Depends(get_job_service)):
+    """Cancela un job en cola o en ejecución (lo ya ingerido queda en el índice)."""
+    job = await service.cancel_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_db
+from app.schemas.retrievalDto import RetrievalRequestDto, RetrievalResponseDto
+from app.services.retrievalService import RetrievalService
+from app.services.queryBatcher import query_batcher
+from app.services.reranker import reranker
+
+router = APIRouter(prefix="/retrieval", tags=["retrieval"])
+
+async def get_retrieval_service(db: AsyncSession = Depends(get_db)) -> RetrievalService:
+    return RetrievalService(db)
+
+@router.post("/{client_id}", response_model=RetrievalResponseDto)
+async def retrieve(
+    client_id: int,
+    body: RetrievalRequestDto,
+    service: RetrievalService = Depends(get_retrieval_service),
+):
+    """Búsqueda híbrida (FAISS + BM25 con RRF) sobre los chunks del cliente."""
+    if not body.query.strip():
+        raise HTTPException(status_code=400, detail="query es requerido.")
+    return await service.retrieve(
+        client_id, body.query, k=body.k, candidates=body.candidates, mode=body.mode,
+        nprobe=body.nprobe, ef_search=body.ef_search,
+        rerank=body.rerank, rerank_candidates=body.rerank_candidates, deadline_ms=body.deadline_ms,
+    )
+
+@router.get("/stats", response_model=dict)
+async def retrieval_stats() -> dict:
+    """Métricas del micro-batching de embeddings de consulta (tamaño medio y tasa de llenado)."""
+    return query_batcher.stats()
+
+@router.get("/rerank/stats", response_model=dict)
+async def rerank_stats() -> dict:
+    """Llamadas, timeouts y latencia del cross-encoder de re-ranking en este worker."""
+    return reranker.stats()
@@ -1,13 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
-from app.schemas.tablesXclientDto import createTablesXclientDto, updateTablesXclientDto
+from app.schemas.tablesXclientDto import createTablesXclientDto, updateTablesXclientDto, TablesXclientDto, BulkUpdateTablesXclientDto
 from app.services.tablesXclientService import tablesXclientService
+from app.shared.bulk import BULK_MAX_ITEMS
+from app.shared.endPointResponses import PageDto, BulkResultDto, BulkDeleteDto
 from typing import List, Optional
 import os
-import boto3
-from botocore.exceptions import ClientError
-import anyio
 
 router = APIRouter(prefix="/tablesXclient", tags=["tablesXclient"])
 
@@ -24,6 +23,37 @@ async def create_table(
         raise HTTPException(status_code=500, detail="Error creating table.")
     return table
 
+# --- Lotes (declaradas antes de /{table_id}) ---
+
+def _check_bulk_size(n: int) -> None:
+    if n > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo {BULK_MAX_ITEMS} ítems por lote.")
+
+@router.post("/bulk", response_model=BulkResultDto)
+async def create_tables_bulk(
+    tables: List[createTablesXclientDto],
+    table_service: tablesXclientService = Depends(get_table_service),
+):
+    """Crea varias configuraciones en una transacción; los errores se informan por ítem."""
+    _check_bulk_size(len(tables))
+    return await table_service.create_tables_bulk(tables)
+
+@router.put("/bulk", response_model=BulkResultDto)
+async def update_tables_bulk(
+    tables: List[BulkUpdateTablesXclientDto],
+    table_service: tablesXclientService = Depends(get_table_service),
+):
+    _check_bulk_size(len(tables))
+    return await table_service.update_tables_bulk(tables)
+
+@router.post("/bulk-delete", response_model=BulkResultDto)
+async def delete_tables_bulk(
+    body: BulkDeleteDto,
+    table_service: tablesXclientService = Depends(get_table_service),
+):
+    _check_bulk_size(len(body.ids))
+    return await table_service.delete_tables_bulk(body.ids)
+
 @router.get("/{table_id}", response_model=createTablesXclientDto)
 async def get_table(
     table_id: int,
@@ -34,14 +64,20 @@ async def get_table(
         raise HTTPException(status_code=404, detail="Table not found.")
     return table
 
-@router.get("/", response_model=List[createTablesXclientDto])
+@router.get("/", response_model=PageDto[TablesXclientDto])
 async def list_tables(
-    skip: int = 0,
-    limit: int = 100,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    swt: Optional[bool] = None,
+    idClient: Optional[int] = None,
     table_service: tablesXclientService = Depends(get_table_service),
-) -> List[createTablesXclientDto]:
-    tables = await table_service.get_tables(skip=skip, limit=limit)
-    return tables
+):
+    """Paginación por cursor: enviar `next_cursor` de la respuesta anterior como `cursor`."""
+    try:
+        tables, next_cursor = await table_service.get_tables(cursor=cursor, limit=limit, swt=swt, idClient=idClient)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": tables, "next_cursor": next_cursor}
 
 @router.put("/{table_id}", response_model=createTablesXclientDto)
 async def update_table(
@@ -1,27 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
-from app.schemas.usersDto import CreateUsersDto, UpdateUsersDto, UsersDto
+from app.schemas.usersDto import CreateUsersDto, UpdateUsersDto, UsersDto, BulkUpdateUsersDto
 from app.services.userServices import UserService
-from typing import List
-import os
-import boto3
+from app.shared.bulk import BULK_MAX_ITEMS, item_error, item_ok, summarize
+from app.shared.endPointResponses import PageDto, BulkResultDto, BulkDeleteDto
+from app.util.env import env_int
+from typing import List, Optional
+import asyncio
 from botocore.exceptions import ClientError
-import anyio
+from app.services.cognitoGateway import cognito_gateway
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 # --- Config Cognito ---
-COGNITO_REGION = os.getenv("COGNITO_REGION")
-COGNITO_USER_POOL_ID = os.getenv("COGNITO_USER_POOL_ID")
-AWS_ACCESS_KEY_ID = os.getenv("IAM_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = os.getenv("IAM_SECRET_ACCESS_KEY")
-
-if not COGNITO_REGION or not COGNITO_USER_POOL_ID:
-    raise RuntimeError("Config Cognito incompleta: COGNITO_REGION y COGNITO_USER_POOL_ID son requeridos.")
-
-# Cliente boto3 (sincrónico; lo usaremos en hilos)
-_cognito = boto3.client("cognito-idp", region_name=COGNITO_REGION, aws_access_key_id=AWS_ACCESS_KEY_ID, aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
+COGNITO_BULK_CONCURRENCY = env_int("COGNITO_BULK_CONCURRENCY", 8)  # llamadas simultáneas en lotes
 
 async def get_user_service(db: AsyncSession = Depends(get_db)) -> UserService:
     return UserService(db)
@@ -33,52 +26,64 @@ async def cognito_admin_create_user(username: str, email: str, email_verified: b
     Crea el usuario en el User Pool y devuelve el 'Username' (normalmente es el sub interno de Cognito
     en formato UUID si no especificas Username distinto).
     """
-    def _call():
-        attrs = [
-            {"Name": "email", "Value": email},
-            {"Name": "email_verified", "Value": "true" if email_verified else "false"},
-        ]
-        # Puedes añadir más atributos, p. ej., phone_number, name, etc.
-        return _cognito.admin_create_user(
-            UserPoolId=COGNITO_USER_POOL_ID,
+    attrs = [
+        {"Name": "email", "Value": email},
+        {"Name": "email_verified", "Value": "true" if email_verified else "false"},
+    ]
+    # Puedes añadir más atributos, p. ej., phone_number, name, etc.
+    try:
+        resp = await cognito_gateway.admin_create_user(
             Username=email,  # puedes usar email como username si quieres
             UserAttributes=attrs,
             MessageAction="SUPPRESS",  # no enviar email de invitación
         )
-
-    try:
-        resp = await anyio.to_thread.run_sync(_call)
         # El campo resp['User']['Username'] puede ser el mismo que pasaste o uno generado por Cognito
         return resp["User"]["Username"]
     except ClientError as e:
         raise HTTPException(status_code=400, detail=f"Cognito create error: {e.response['Error']['Message']}")
 
 async def cognito_admin_set_permanent_password(username: str, password: str) -> None:
-    def _call():
-        return _cognito.admin_set_user_password(
-            UserPoolId=COGNITO_USER_POOL_ID,
+    try:
+        await cognito_gateway.admin_set_user_password(
             Username=username,
             Password=password,
             Permanent=True,
         )
-    try:
-        await anyio.to_thread.run_sync(_call)
     except ClientError as e:
         # Si falla, conviene borrar el usuario que se acabó de crear
         raise HTTPException(status_code=400, detail=f"Cognito set password error: {e.response['Error']['Message']}")
 
 async def cognito_admin_delete_user(username: str) -> None:
-    def _call():
-        return _cognito.admin_delete_user(
-            UserPoolId=COGNITO_USER_POOL_ID,
-            Username=username,
-        )
     try:
-        await anyio.to_thread.run_sync(_call)
+        await cognito_gateway.admin_delete_user(Username=username)
     except ClientError:
         # No levantamos otra excepción aquí para no ocultar el error original.
         pass
 
+async def _cognito_create_with_password(user: CreateUsersDto) -> str:
+    created = await cognito_admin_create_user(username=user.username, email=user.email, email_verified=True)
+    try:
+        await cognito_admin_set_permanent_password(username=created, password=user.password)
+    except Exception:
+        # también ante errores de red/timeout: el usuario ya existe en Cognito
+        await _compensate([created])
+        raise
+    return created
+
+async def _compensate(usernames: List[str]) -> None:
+    """Borra de Cognito usuarios sin fila en la BD; un fallo aquí se registra, no tumba la respuesta."""
+    results = await _bounded([cognito_admin_delete_user(name) for name in usernames], COGNITO_BULK_CONCURRENCY)
+    for name, result in zip(usernames, results):
+        if isinstance(result, Exception):
+            print(f"Error deleting orphan Cognito user {name}: {result}")
+
+async def _bounded(calls, limit: int):
+    sem = asyncio.Semaphore(max(1, limit))
+    async def _run(call):
+        async with sem:
+            return await call
+    return await asyncio.gather(*(_run(c) for c in calls), return_exceptions=True)
+
 # --- Rutas ---
 
 @router.post("/", response_model=UsersDto)
@@ -122,9 +127,77 @@ async def create_user(user: CreateUsersDto, service: UserService = Depends(get_u
         await cognito_admin_delete_user(created_cognito_username)
         raise
 
-@router.get("/", response_model=List[UsersDto])
-async def get_users(service: UserService = Depends(get_user_service)):
-    return await service.get_users()
+# --- Lotes (declaradas antes de /{user_id}) ---
+
+def _check_bulk_size(n: int) -> None:
+    if n > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo {BULK_MAX_ITEMS} ítems por lote.")
+
+@router.post("/bulk", response_model=BulkResultDto)
+async def create_users_bulk(users: List[CreateUsersDto], service: UserService = Depends(get_user_service)):
+    """
+    Flujo:
+    1) Validar todo el lote (repetidos, existentes, cliente) sin tocar Cognito.
+    2) Crear en Cognito los válidos con concurrencia acotada (COGNITO_BULK_CONCURRENCY).
+    3) INSERT multi-fila en BD de los creados en Cognito, en una sola transacción.
+    4) Borrar de Cognito solo los usuarios cuya fila no quedó en la BD (rollback compensatorio).
+    """
+    _check_bulk_size(len(users))
+    errors = await service.validate_new_users(users)
+    results = [item_error(i, e) for i, e in errors.items()]
+    pending = [(i, u) for i, u in enumerate(users) if i not in errors]
+
+    async def _create(i: int, u: CreateUsersDto):
+        try:
+            return i, u, await _cognito_create_with_password(u), None
+        except HTTPException as e:
+            return i, u, None, e.detail
+        except Exception as e:
+            # EndpointConnectionError, ReadTimeoutError tras los reintentos, etc.: error del ítem
+            print(f"Error creating Cognito user {u.username}: {e}")
+            return i, u, None, f"Cognito unavailable: {e.__class__.__name__}"
+
+    created = await _bounded([_create(i, u) for i, u in pending], COGNITO_BULK_CONCURRENCY)
+    results.extend(item_error(i, err) for i, _, cognito_username, err in created if cognito_username is None)
+    in_cognito = [(i, u, cognito_username) for i, u, cognito_username, _ in created if cognito_username is not None]
+
+    ids, db_error = await service.insert_users_bulk([u for _, u, _ in in_cognito])
+    failed = []
+    for i, u, cognito_username in in_cognito:
+        user_id = ids.get(u.username) if ids is not None else None
+        if user_id is None:
+            failed.append(cognito_username)
+            results.append(item_error(i, db_error or "User could not be created"))
+        else:
+            results.append(item_ok(i, user_id))
+    if failed:
+        await _compensate(failed)
+    return summarize(results)
+
+@router.put("/bulk", response_model=BulkResultDto)
+async def update_users_bulk(users: List[BulkUpdateUsersDto], service: UserService = Depends(get_user_service)):
+    _check_bulk_size(len(users))
+    return await service.update_users_bulk(users)
+
+@router.post("/bulk-delete", response_model=BulkResultDto)
+async def delete_users_bulk(body: BulkDeleteDto, service: UserService = Depends(get_user_service)):
+    _check_bulk_size(len(body.ids))
+    return await service.delete_users_bulk(body.ids)
+
+@router.get("/", response_model=PageDto[UsersDto])
+async def get_users(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    swt: Optional[bool] = None,
+    idClient: Optional[int] = None,
+    service: UserService = Depends(get_user_service),
+):
+    """Paginación por cursor: enviar `next_cursor` de la respuesta anterior como `cursor`."""
+    try:
+        users, next_cursor = await service.get_users(cursor=cursor, limit=limit, swt=swt, idClient=idClient)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": users, "next_cursor": next_cursor}
 
 @router.get("/{user_id}", response_model=UsersDto)
 async def get_user(user_id: int, service: UserService = Depends(get_user_service)):
@@ -4,6 +4,8 @@ from app.models.clients import Clients
 from app.models.chats import Chats
 from app.models.chatDetails import ChatDetails
 from app.models.documents import Documents
+from app.models.documentChunks import DocumentChunks
 from app.models.tableXClients import TableXClients
+from app.models.jobs import Jobs
 
-__all__ = ["Users", "Clients", "Chats", "ChatDetails", "Documents", "TableXClients"]
\ No newline at end of file
+__all__ = ["Users", "Clients", "Chats", "ChatDetails", "Documents", "DocumentChunks", "TableXClients", "Jobs"]
\ No newline at end of file
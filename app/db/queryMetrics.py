@@ -0,0 +1,134 @@
+# app/db/queryMetrics.py
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.shared.metrics import LatencyHistogram, prometheus_histogram, prometheus_metric
+from app.util.env import env_bool, env_float, env_int
+
+METRICS_SQL_ENABLED = env_bool("METRICS_SQL_ENABLED", True)
+DB_SLOW_QUERY_MS = env_float("DB_SLOW_QUERY_MS", 200.0)
+# misma sentencia (con parámetros ligados) repetida N veces en una request -> patrón N+1
+DB_N_PLUS_ONE_THRESHOLD = env_int("DB_N_PLUS_ONE_THRESHOLD", 10)
+
+_QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class RequestQueries:
+    """Consultas de una request: se acumulan desde los eventos del engine vía contextvar."""
+
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter = Counter()
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        return [(s, n) for s, n in self.statements.most_common(3) if n >= threshold]
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+def begin_request() -> Tuple[RequestQueries, object]:
+    stats = RequestQueries()
+    return stats, _current.set(stats)
+
+def end_request(token) -> None:
+    _current.reset(token)
+
+
+def _operation(statement: str) -> str:
+    head = statement.lstrip()[:10].split(None, 1)
+    return head[0].upper() if head else "OTHER"
+
+
+class QueryMetrics:
+    """
+    Tiempo y cantidad de sentencias SQL por engine y operación (SELECT/INSERT/...), sentencias lentas
+    y patrones N+1 por ruta. Se engancha a `before/after_cursor_execute` del engine síncrono que
+    hay debajo de cada `AsyncEngine`; el contexto de la request llega por contextvar (SQLAlchemy
+    lo propaga al greenlet del driver).
+    """
+
+    def __init__(self, slow_ms: float, n_plus_one: int):
+        self.slow = slow_ms / 1000
+        self.n_plus_one = max(2, n_plus_one)
+        self.latency: Dict[Tuple, LatencyHistogram] = {}
+        self.errors: Counter = Counter()
+        self.slow_queries: Counter = Counter()
+        self.per_request: Dict[Tuple, LatencyHistogram] = {}
+        self.request_db_seconds: Dict[Tuple, LatencyHistogram] = {}
+        self.n_plus_one_requests: Counter = Counter()
+        self._engines: List = []
+
+    def instrument(self, async_engine, name: str) -> None:
+        engine = async_engine.sync_engine
+        if engine in self._engines:
+            return
+        self._engines.append(engine)
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            seconds = time.perf_counter() - conn.info["query_start"].pop()
+            self._observe(name, statement, seconds, executemany)
+
+        @event.listens_for(engine, "handle_error")
+        def _error(ctx):
+            starts = ctx.connection.info.get("query_start") if ctx.connection is not None else None
+            if starts:
+                starts.pop()
+            self.errors[(("engine", name),)] += 1
+
+    def _observe(self, engine: str, statement: str, seconds: float, executemany: bool) -> None:
+        key = (("engine", engine), ("operation", _operation(statement)))
+        hist = self.latency.get(key)
+        if hist is None:
+            hist = self.latency.setdefault(key, LatencyHistogram(_QUERY_BUCKETS))
+        hist.observe(seconds)
+        if seconds >= self.slow:
+            self.slow_queries[key] += 1
+            print(f"Slow query ({seconds * 1000:.1f} ms, {engine}): {' '.join(statement.split())[:500]}")
+        stats = _current.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += seconds
+            if not executemany:
+                stats.statements[statement] += 1
+
+    def finish_request(self, stats: RequestQueries, method: str, route: str) -> None:
+        key = (("method", method), ("route", route))
+        hist = self.per_request.get(key)
+        if hist is None:
+            hist = self.per_request.setdefault(key, LatencyHistogram(_COUNT_BUCKETS))
+            self.request_db_seconds.setdefault(key, LatencyHistogram(_QUERY_BUCKETS))
+        hist.observe(stats.count)
+        self.request_db_seconds[key].observe(stats.seconds)
+        repeated = stats.repeated(self.n_plus_one)
+        if repeated:
+            self.n_plus_one_requests[key] += 1
+            statement, n = repeated[0]
+            print(f"Possible N+1 in {method} {route}: {n}x {' '.join(statement.split())[:300]}")
+
+    def prometheus(self) -> List[str]:
+        lines = prometheus_histogram("db_query_duration_seconds", "Duración de sentencias SQL.", self.latency)
+        lines += prometheus_metric("db_slow_queries_total", "counter", f"Sentencias de {self.slow * 1000:g} ms o más.", self.slow_queries)
+        lines += prometheus_metric("db_query_errors_total", "counter", "Sentencias que fallaron.", self.errors)
+        lines += prometheus_histogram("http_request_db_queries", "Sentencias SQL por request.", self.per_request)
+        lines += prometheus_histogram("http_request_db_seconds", "Tiempo en SQL por request.", self.request_db_seconds)
+        lines += prometheus_metric(
+            "http_request_n_plus_one_total", "counter",
+            f"Requests que repitieron una sentencia {self.n_plus_one} veces o más.", self.n_plus_one_requests,
+        )
+        return lines
+
+
+query_metrics = QueryMetrics(DB_SLOW_QUERY_MS, DB_N_PLUS_ONE_THRESHOLD)
@@ -1,8 +1,14 @@
 # app/db/session.py
-import os
+import time
+from typing import Dict
 from urllib.parse import quote_plus
+from fastapi import Request
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.shared.metrics import LatencyHistogram
+from app.util.env import env, env_int
 
 # Si prefieres cargar .env desde código (alternativa a --env-file)
 try:
@@ -11,20 +17,11 @@ try:
 except Exception:
     pass
 
-def _env(name: str, default: str | None = None) -> str | None:
-    v = os.getenv(name)
-    if v is None:
-        return default
-    v = v.strip()
-    if v == "" or v.lower() in {"none", "null"}:
-        return default
-    return v
-
-DB_USER = _env("DB_USER", "root")
-DB_PASSWORD = _env("DB_PASSWORD", "")
-DB_HOST = _env("DB_HOST", "127.0.0.1")
-DB_PORT = _env("DB_PORT", "3306")
-DB_NAME = _env("DB_NAME", "rag_db")
+DB_USER = env("DB_USER", "root")
+DB_PASSWORD = env("DB_PASSWORD", "")
+DB_HOST = env("DB_HOST", "127.0.0.1")
+DB_PORT = env("DB_PORT", "3306")
+DB_NAME = env("DB_NAME", "rag_db")
 
 # Escapa password por si tiene @ : / & (etc.)
 PW = quote_plus(DB_PASSWORD or "")
@@ -32,20 +29,99 @@ PW = quote_plus(DB_PASSWORD or "")
 # Params recomendados para MySQL
 QS_PARAMS = "charset=utf8mb4"
 
-DATABASE_URL = f"mysql+asyncmy://{DB_USER}:{PW}@{DB_HOST}:{DB_PORT}/{DB_NAME}?{QS_PARAMS}"
+DATABASE_URL = env("DB_URL") or f"mysql+asyncmy://{DB_USER}:{PW}@{DB_HOST}:{DB_PORT}/{DB_NAME}?{QS_PARAMS}"
 
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,          # pon True si quieres ver los CREATE/SELECT en consola
-    pool_pre_ping=True,
-    pool_recycle=1800,
+# Réplica de lectura opcional: DB_READ_URL completa o DB_READ_HOST (mismo usuario/BD que el primario)
+DB_READ_HOST = env("DB_READ_HOST")
+READ_DATABASE_URL = env("DB_READ_URL") or (
+    f"mysql+asyncmy://{DB_USER}:{PW}@{DB_READ_HOST}:{env('DB_READ_PORT', DB_PORT)}/{DB_NAME}?{QS_PARAMS}"
+    if DB_READ_HOST else None
 )
 
+# Pool por engine (el de réplica usa los mismos valores)
+DB_POOL_SIZE = env_int("DB_POOL_SIZE", 10)
+DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 20)
+DB_POOL_TIMEOUT = env_int("DB_POOL_TIMEOUT", 30)      # segundos esperando una conexión libre
+DB_POOL_RECYCLE = env_int("DB_POOL_RECYCLE", 1800)
+
+
+class PoolStats:
+    """Espera al pedir una conexión al pool (incluye abrirla si hay hueco) y timeouts de checkout."""
+
+    def __init__(self):
+        self.checkout = LatencyHistogram((0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0))
+        self.timeouts = 0
+
+pool_stats: Dict[str, PoolStats] = {}
+
+def _instrumented_pool(name: str):
+    stats = pool_stats.setdefault(name, PoolStats())
+
+    class InstrumentedPool(AsyncAdaptedQueuePool):
+        def _do_get(self):
+            t0 = time.perf_counter()
+            try:
+                return super()._do_get()
+            except PoolTimeoutError:
+                stats.timeouts += 1
+                raise
+            finally:
+                stats.checkout.observe(time.perf_counter() - t0)
+
+    return InstrumentedPool
+
+def _make_engine(url: str, name: str):
+    kwargs = dict(
+        echo=False,          # pon True si quieres ver los CREATE/SELECT en consola
+        pool_pre_ping=True,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    if not url.startswith("sqlite"):
+        kwargs.update(
+            poolclass=_instrumented_pool(name),
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return create_async_engine(url, **kwargs)
+
+engine = _make_engine(DATABASE_URL, "primary")
+read_engine = _make_engine(READ_DATABASE_URL, "replica") if READ_DATABASE_URL else engine
+
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+ReadSessionLocal = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+_READ_METHODS = {"GET", "HEAD"}
+
+async def get_db(request: Request) -> AsyncSession:
+    """Las peticiones GET/HEAD van a la réplica (si hay); el resto, al primario."""
+    factory = ReadSessionLocal if request.method in _READ_METHODS else AsyncSessionLocal
+    async with factory() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
 
-async def get_db() -> AsyncSession:
+async def get_write_db() -> AsyncSession:
+    """Sesión en el primario sin importar el método (lecturas que no toleran retraso de réplica)."""
     async with AsyncSessionLocal() as session:
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+
+def db_pool_stats() -> Dict:
+    engines = {"primary": engine}
+    if read_engine is not engine:
+        engines["replica"] = read_engine
+    out = {}
+    for name, eng in engines.items():
+        pool = eng.pool
+        info = {"status": pool.status()}
+        if hasattr(pool, "checkedout"):
+            info.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+        stats = pool_stats.get(name)
+        if stats is not None:
+            info.update(checkout=stats.checkout.snapshot(), timeouts=stats.timeouts)
+        out[name] = info
+    return out
@@ -1,9 +1,12 @@
-from sqlalchemy import String, Integer, ForeignKey
+from sqlalchemy import String, Integer, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base, TimestampMixin
 
 class ChatDetails(TimestampMixin, Base):
     __tablename__ = "chat_details"
+    __table_args__ = (
+        Index("ix_chat_details_chat_order", "idChat", "order"),  # turnos de un chat en orden
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     idChat: Mapped[int] = mapped_column(ForeignKey("chats.id"), nullable=False)
@@ -1,9 +1,12 @@
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import String, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base, TimestampMixin
 
 class Chats(TimestampMixin, Base):
     __tablename__ = "chats"
+    __table_args__ = (
+        Index("ix_chats_session_id", "session_id", "id"),  # últimos chats de una conversación
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     idUser: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
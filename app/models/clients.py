@@ -1,9 +1,12 @@
-from sqlalchemy import String, Boolean
+from sqlalchemy import String, Boolean, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base, TimestampMixin
 
 class Clients(TimestampMixin, Base):
     __tablename__ = "clients"
+    __table_args__ = (
+        Index("ix_clients_swt_id", "swt", "id"),  # paginación por cursor filtrando por swt
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     ruc: Mapped[str] = mapped_column(String(11), unique=True, nullable=False)
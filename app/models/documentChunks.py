@@ -0,0 +1,20 @@
+from sqlalchemy import Text, Integer, BigInteger, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from app.db.base import Base, TimestampMixin
+
+class DocumentChunks(TimestampMixin, Base):
+    __tablename__ = "document_chunks"
+    __table_args__ = (
+        UniqueConstraint("idDocument", "chunk_index", name="uq_document_chunks_doc_index"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    idDocument: Mapped[int] = mapped_column(ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+    idClient: Mapped[int] = mapped_column(ForeignKey("clients.id"), nullable=False, index=True)
+    chunk_index: Mapped[int] = mapped_column(Integer, nullable=False)
+    vector_id: Mapped[int] = mapped_column(BigInteger, nullable=False)  # id en el índice FAISS (ver vectorStore.make_vector_id)
+    content: Mapped[str] = mapped_column(Text, nullable=False)
+    # casi duplicado de otro chunk del cliente (ver dedupIndex): vector_id del canónico; este no tiene vector propio
+    duplicate_of: Mapped[int] = mapped_column(BigInteger, nullable=True, index=True)
+
+    document: Mapped["Documents"] = relationship(back_populates="chunks")
@@ -1,14 +1,20 @@
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import String, Text, ForeignKey, Index
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base, TimestampMixin
 
 class Documents(TimestampMixin, Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ix_documents_client_id", "idClient", "id"),  # paginación por cursor por cliente
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     idClient: Mapped[int] = mapped_column(ForeignKey("clients.id"), nullable=False)
     title: Mapped[str] = mapped_column(String(200), nullable=False)
-    content: Mapped[str] = mapped_column(String(4000), nullable=False)
+    # LONGTEXT en MySQL; los documentos subidos como archivo guardan aquí solo un extracto (ver uploadStore)
+    content: Mapped[str] = mapped_column(Text().with_variant(mysql.LONGTEXT(), "mysql"), nullable=False)
     file_path: Mapped[str] = mapped_column(String(1000), nullable=True)
 
-    client: Mapped["Clients"] = relationship(back_populates="documents")
\ No newline at end of file
+    client: Mapped["Clients"] = relationship(back_populates="documents")
+    chunks: Mapped[list["DocumentChunks"]] = relationship(back_populates="document", passive_deletes=True)
\ No newline at end of file
@@ -0,0 +1,28 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import String, Text, Integer, DateTime, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base, TimestampMixin
+
+class Jobs(TimestampMixin, Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_client_id", "status", "idClient", "id"),  # siguiente job en cola por cliente
+        Index("ix_jobs_client_id", "idClient", "id"),                    # listado por cliente
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    idClient: Mapped[int] = mapped_column(ForeignKey("clients.id"), nullable=False)
+    kind: Mapped[str] = mapped_column(String(30), nullable=False)       # ingest
+    status: Mapped[str] = mapped_column(String(20), nullable=False)     # queued | running | done | failed | cancelled
+    payload: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON (p. ej. {"document_ids": [...]})
+    result: Mapped[Optional[str]] = mapped_column(Text, nullable=True)   # JSON con el resultado final
+    error: Mapped[Optional[str]] = mapped_column(String(1000), nullable=True)
+    progress_done: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    progress_total: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    owner: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)  # worker que lo ejecuta (host:pid)
+    # un job "running" con la concesión vencida quedó huérfano (worker caído) y vuelve a la cola
+    lease_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    startedAt: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finishedAt: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
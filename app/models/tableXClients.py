@@ -1,9 +1,12 @@
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import String, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base, TimestampMixin
 
 class TableXClients(TimestampMixin, Base):
     __tablename__ = "table_x_clients"
+    __table_args__ = (
+        Index("ix_table_x_clients_client_id", "idClient", "id"),  # paginación por cursor por cliente
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     idClient: Mapped[int] = mapped_column(ForeignKey("clients.id"), nullable=False)
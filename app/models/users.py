@@ -1,9 +1,13 @@
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import String, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base, TimestampMixin
 
 class Users(TimestampMixin, Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_client_id", "idClient", "id"),  # paginación por cursor por cliente
+        Index("ix_users_swt_id", "swt", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     username: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
@@ -0,0 +1,31 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+class ChatRequestDto(BaseModel):
+    idUser: int
+    idClient: int
+    session_id: str
+    message: str
+    k: int = Field(5, ge=1, le=20)  # chunks de contexto
+
+class ChatDetailsDto(BaseModel):
+    id: Optional[int] = None
+    idChat: int
+    detail: str
+    type: str
+    order: int
+
+    class Config:
+        orm_mode = True
+
+class ChatsDto(BaseModel):
+    id: Optional[int] = None
+    idUser: int
+    session_id: str
+    message: str
+    response: Optional[str] = None
+    source_documents: Optional[str] = None
+    details: List[ChatDetailsDto] = []
+
+    class Config:
+        orm_mode = True
@@ -28,3 +28,6 @@ class ClientsDto(BaseModel):
 
     class Config:
         orm_mode = True
+
+class BulkUpdateClientsDto(UpdateClientsDto):
+    id: int
@@ -0,0 +1,61 @@
+from typing import List, Optional
+from pydantic import BaseModel
+from datetime import datetime
+
+class CreateDocumentsDto(BaseModel):
+    idClient: int
+    title: str
+    content: str
+    # sin file_path: lo asigna el servidor al subir un archivo (ver uploadStore)
+    swt: Optional[bool] = True
+    createDate: Optional[str] = datetime.now().isoformat()
+
+class UpdateDocumentsDto(BaseModel):
+    title: Optional[str] = None
+    content: Optional[str] = None
+    swt: Optional[bool] = None
+    updateDate: Optional[str] = datetime.now().isoformat()
+
+class DocumentsDto(BaseModel):
+    id: Optional[int] = None
+    idClient: int
+    title: str
+    content: str
+    file_path: Optional[str] = None
+    swt: bool
+
+    class Config:
+        orm_mode = True
+
+class IngestDocumentsDto(BaseModel):
+    # None -> todos los documentos activos del cliente
+    document_ids: Optional[List[int]] = None
+
+class IngestResultDto(BaseModel):
+    client_id: int
+    documents: int
+    chunks: int
+    duplicate_chunks: int = 0  # casi duplicados enlazados a otro chunk (sin embeber)
+    dedup_ratio: float = 0.0
+    index_size: int
+    embed_seconds: float
+    total_seconds: float
+
+class DocumentDedupSummaryDto(BaseModel):
+    document_id: int
+    chunks: int
+    duplicate_chunks: int
+    dedup_ratio: float
+
+class DocumentDedupDto(DocumentDedupSummaryDto):
+    # documentos que tienen los chunks canónicos de los duplicados
+    duplicate_of_documents: List[int] = []
+
+class ClientDedupDto(BaseModel):
+    client_id: int
+    documents: int
+    chunks: int
+    duplicate_chunks: int
+    dedup_ratio: float
+    # documentos con mayor proporción de duplicados
+    top_documents: List[DocumentDedupSummaryDto] = []
@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+
+class JobDto(BaseModel):
+    id: int
+    idClient: int
+    kind: str
+    status: str  # queued | running | done | failed | cancelled
+    progress_done: int
+    progress_total: int
+    progress: float  # 0..1
+    attempts: int
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    createDate: Optional[datetime] = None
+    startedAt: Optional[datetime] = None
+    finishedAt: Optional[datetime] = None
+
+class JobAcceptedDto(BaseModel):
+    job_id: int
+    status: str
+    status_url: str
+    document_id: Optional[int] = None
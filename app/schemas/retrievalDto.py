@@ -0,0 +1,31 @@
+from typing import Dict, List, Literal, Optional
+from pydantic import BaseModel, Field
+
+class RetrievalRequestDto(BaseModel):
+    query: str
+    k: int = Field(5, ge=1, le=100)
+    candidates: int = Field(50, ge=1, le=1000)  # top-N de cada etapa antes de fusionar
+    mode: Literal["hybrid", "vector", "lexical"] = "hybrid"
+    # ajuste recall/latencia del índice ANN del cliente (se ignoran con índice plano)
+    nprobe: Optional[int] = Field(None, ge=1, le=65536)      # IVF-PQ: listas a recorrer
+    ef_search: Optional[int] = Field(None, ge=1, le=4096)    # HNSW: tamaño de la cola de búsqueda
+    # re-ranking con cross-encoder: None = valor por defecto del servidor (RERANK_ENABLED)
+    rerank: Optional[bool] = None
+    rerank_candidates: Optional[int] = Field(None, ge=1, le=200)
+    deadline_ms: Optional[float] = Field(None, ge=0, le=10000)  # presupuesto total; vencido -> orden RRF
+
+class RetrievedChunkDto(BaseModel):
+    vector_id: int
+    idDocument: int
+    chunk_index: int
+    content: str
+    score: float
+    vector_rank: Optional[int] = None
+    lexical_rank: Optional[int] = None
+    rerank_score: Optional[float] = None
+
+class RetrievalResponseDto(BaseModel):
+    results: List[RetrievedChunkDto]
+    timings_ms: Dict[str, float]
+    # "ok" | "timeout" | "deadline" | "error"; None si no se pidió re-ranking
+    rerank_status: Optional[str] = None
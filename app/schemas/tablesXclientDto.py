@@ -21,4 +21,7 @@ class TablesXclientDto(BaseModel):
     description: Optional[str] = None
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class BulkUpdateTablesXclientDto(updateTablesXclientDto):
+    id: int
@@ -29,4 +29,6 @@ class UsersDto(BaseModel):
     swt: bool
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+class BulkUpdateUsersDto(UpdateUsersDto):
+    id: int
@@ -0,0 +1,360 @@
+# app/services/annIndex.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Set, Tuple
+
+import numpy as np
+from filelock import FileLock, Timeout
+
+from app.services import vectorStore
+from app.util.env import env, env_float, env_int
+
+FLAT = "flat"
+HNSW = "hnsw"
+IVFPQ = "ivfpq"
+
+# Tipo de índice por cliente: "auto" elige por cantidad de vectores; flat|hnsw|ivfpq lo fuerza
+INDEX_TYPE = (env("INDEX_TYPE", "auto") or "auto").lower()
+INDEX_HNSW_MIN_VECTORS = env_int("INDEX_HNSW_MIN_VECTORS", 50_000)
+INDEX_IVFPQ_MIN_VECTORS = env_int("INDEX_IVFPQ_MIN_VECTORS", 1_000_000)
+INDEX_HNSW_M = env_int("INDEX_HNSW_M", 32)
+INDEX_HNSW_EF_CONSTRUCTION = env_int("INDEX_HNSW_EF_CONSTRUCTION", 80)
+INDEX_EF_SEARCH = env_int("INDEX_EF_SEARCH", 64)       # por defecto; se puede pasar por consulta
+INDEX_IVF_NLIST = env_int("INDEX_IVF_NLIST", 0)        # 0 = automático (~4·√n)
+INDEX_PQ_M = env_int("INDEX_PQ_M", 0)                  # subcuantizadores PQ; 0 = automático (d/8)
+INDEX_NPROBE = env_int("INDEX_NPROBE", 16)             # por defecto; se puede pasar por consulta
+# IVF-PQ: se piden k·refine candidatos y se re-puntúan con los vectores exactos del plano (mmap)
+INDEX_PQ_REFINE = env_int("INDEX_PQ_REFINE", 4)
+INDEX_TRAIN_SAMPLE = env_int("INDEX_TRAIN_SAMPLE", 100_000)
+# fracción de vectores del ANN desactualizados a partir de la cual se reconstruye
+INDEX_REBUILD_DRIFT = env_float("INDEX_REBUILD_DRIFT", 0.05)
+INDEX_BUILD_THREADS = env_int("INDEX_BUILD_THREADS", 1)
+
+_ADD_BATCH = 65_536
+_MAX_OVERFETCH = 1024
+
+
+def choose_type(ntotal: int) -> str:
+    if INDEX_TYPE in (FLAT, HNSW, IVFPQ):
+        return INDEX_TYPE
+    if ntotal >= INDEX_IVFPQ_MIN_VECTORS:
+        return IVFPQ
+    if ntotal >= INDEX_HNSW_MIN_VECTORS:
+        return HNSW
+    return FLAT
+
+def _ivf_nlist(n: int) -> int:
+    nlist = INDEX_IVF_NLIST or int(4 * np.sqrt(max(n, 1)))
+    # k-means necesita ~39 puntos por centroide
+    return int(max(1, min(nlist, n // 39, 65_536)))
+
+def _pq_m(d: int) -> int:
+    if INDEX_PQ_M and d % INDEX_PQ_M == 0:
+        return INDEX_PQ_M
+    m = max(1, d // 8)
+    while d % m:
+        m -= 1
+    return m
+
+def new_ann(kind: str, d: int, n: int):
+    import faiss
+    if kind == HNSW:
+        inner = faiss.IndexHNSWFlat(d, INDEX_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        inner.hnsw.efConstruction = INDEX_HNSW_EF_CONSTRUCTION
+        inner.hnsw.efSearch = INDEX_EF_SEARCH
+    elif kind == IVFPQ:
+        quantizer = faiss.IndexFlatIP(d)
+        inner = faiss.IndexIVFPQ(quantizer, d, _ivf_nlist(n), _pq_m(d), 8, faiss.METRIC_INNER_PRODUCT)
+        inner.nprobe = INDEX_NPROBE
+    else:
+        raise ValueError(f"Tipo de índice ANN desconocido: {kind}")
+    return faiss.IndexIDMap2(inner)
+
+def build_from_flat(flat: vectorStore.FlatVectors, kind: str, seed: int = 0):
+    """Construye un ANN con los vectores e ids del plano del cliente, por lotes."""
+    n, d = flat.ntotal, flat.d
+    ann = new_ann(kind, d, n)
+    if kind == IVFPQ:
+        live = flat.live_positions()
+        sample = np.random.default_rng(seed).choice(n, size=min(n, INDEX_TRAIN_SAMPLE), replace=False)
+        ann.train(flat.take(live[np.sort(sample)]))
+    for ids, vectors in flat.blocks(_ADD_BATCH):
+        ann.add_with_ids(vectors, ids)
+    return ann
+
+def ann_kind(ann) -> str:
+    import faiss
+    inner = faiss.downcast_index(ann.index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return HNSW
+    if isinstance(inner, faiss.IndexIVF):
+        return IVFPQ
+    return FLAT
+
+def read_dirty_docs(client_id: int) -> np.ndarray:
+    docs: Set[int] = set()
+    for path in vectorStore.ann_dirty_paths(client_id):
+        try:
+            with open(path, "r", encoding="ascii") as f:
+                docs.update(int(tok) for tok in f.read().split())
+        except FileNotFoundError:
+            pass
+    return np.fromiter(sorted(docs), dtype=np.int64, count=len(docs))
+
+
+class ClientIndex:
+    """
+    Índice de consulta de un cliente. Sin ANN es el índice plano (exacto). Con ANN, los documentos
+    cambiados desde que se construyó se excluyen de sus resultados y se buscan en un pequeño índice
+    plano "delta" armado desde el plano, así que las respuestas reflejan siempre el último commit.
+    """
+
+    def __init__(self, flat: vectorStore.FlatVectors, ann=None, dirty_docs: Optional[np.ndarray] = None):
+        import faiss
+        self.flat = flat
+        self.ann = ann
+        self.kind = ann_kind(ann) if ann is not None else FLAT
+        self.dirty_docs = dirty_docs if dirty_docs is not None and ann is not None else np.zeros(0, dtype=np.int64)
+        self.delta = None
+        self.stale = 0
+        if self.dirty_docs.size:
+            ann_ids = faiss.vector_to_array(ann.id_map)
+            self.stale = int(np.isin(vectorStore.vector_doc_ids(ann_ids), self.dirty_docs).sum())
+            pos = flat.document_positions(self.dirty_docs)
+            if pos.size:
+                self.delta = vectorStore.new_index(flat.d)
+                self.delta.add_with_ids(flat.take(pos), flat.ids_at(pos))
+
+    @property
+    def ntotal(self) -> int:
+        return self.flat.ntotal
+
+    @property
+    def d(self) -> int:
+        return self.flat.d
+
+    @property
+    def drift(self) -> float:
+        if self.ann is None:
+            return 0.0
+        changed = self.stale + (self.delta.ntotal if self.delta is not None else 0)
+        return changed / max(1, int(self.ann.ntotal))
+
+    def needs_rebuild(self) -> bool:
+        return choose_type(self.ntotal) != self.kind or self.drift > INDEX_REBUILD_DRIFT
+
+    def search(self, queries: np.ndarray, k: int, nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        if self.ann is None:
+            return self.flat.search(queries, k)
+        refine = INDEX_PQ_REFINE if self.kind == IVFPQ and INDEX_PQ_REFINE > 1 else 1
+        fetch = min(k * refine + min(self.stale, _MAX_OVERFETCH), int(self.ann.ntotal))
+        D, I = self.ann.search(queries, fetch, params=self._params(k, nprobe, ef_search))
+        if self.stale:
+            stale = np.isin(vectorStore.vector_doc_ids(I), self.dirty_docs) & (I != -1)
+            D[stale] = -np.inf
+            I[stale] = -1
+        if refine > 1:
+            self._rescore(queries, D, I)
+        if self.delta is not None:
+            Dd, Id = self.delta.search(queries, min(k, int(self.delta.ntotal)))
+            D, I = np.hstack([D, Dd]), np.hstack([I, Id])
+        D = np.where(I == -1, -np.inf, D)
+        order = np.argsort(-D, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+    def _rescore(self, queries: np.ndarray, D: np.ndarray, I: np.ndarray) -> None:
+        """Reemplaza las distancias aproximadas de PQ por el producto interno exacto (in situ)."""
+        rows, cols = np.nonzero(I != -1)
+        if rows.size == 0:
+            return
+        positions = self.flat.locate(I[rows, cols])
+        found = positions >= 0
+        vectors = self.flat.take(positions[found])
+        D[rows[found], cols[found]] = np.einsum("ij,ij->i", vectors, queries[rows[found]])
+        D[rows[~found], cols[~found]] = -np.inf
+
+    def _params(self, k: int, nprobe: Optional[int], ef_search: Optional[int]):
+        # parámetros por consulta: no se modifica el índice compartido entre hilos
+        import faiss
+        if self.kind == HNSW:
+            return faiss.SearchParametersHNSW(efSearch=max(k, ef_search or INDEX_EF_SEARCH))
+        return faiss.SearchParametersIVF(nprobe=nprobe or INDEX_NPROBE)
+
+    def describe(self) -> Dict:
+        return {
+            "type": self.kind,
+            "desired_type": choose_type(self.ntotal),
+            "ntotal": self.ntotal,
+            "dim": self.d,
+            "ann_ntotal": int(self.ann.ntotal) if self.ann is not None else None,
+            "dirty_documents": int(self.dirty_docs.size),
+            "stale_vectors": self.stale,
+            "delta_vectors": int(self.delta.ntotal) if self.delta is not None else 0,
+            "drift": round(self.drift, 4),
+        }
+
+
+def _file_version(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+def open_client_index(client_id: int, use_mmap: bool = True) -> Optional[ClientIndex]:
+    """
+    Abre plano + ANN + documentos cambiados de forma consistente. El orden importa: el plano se
+    abre antes de leer la lista de cambios (los escritores anotan antes de guardar el plano) y si
+    el ANN se reemplazó mientras tanto se reintenta.
+    """
+    ann_file = vectorStore.ann_path(client_id)
+    for _ in range(3):
+        version = _file_version(ann_file)
+        flat = vectorStore.open_vectors(client_id, use_mmap)
+        if flat is None:
+            return None
+        if version is None:
+            return ClientIndex(flat)
+        dirty = read_dirty_docs(client_id)
+        try:
+            ann = vectorStore.open_index(ann_file, use_mmap)
+        except FileNotFoundError:
+            continue
+        if _file_version(ann_file) == version:
+            return ClientIndex(flat, ann, dirty)
+    # el ANN cambia más rápido de lo que se puede abrir: respondemos con el plano (exacto)
+    return ClientIndex(flat)
+
+
+class IndexBuilder:
+    """
+    Entrena y publica índices ANN en segundo plano, en un pool propio (no el de las consultas).
+    Las consultas siguen sobre el índice anterior hasta que el nuevo se renombra en su lugar;
+    un lock de archivo por cliente evita que dos workers construyan lo mismo a la vez.
+    """
+
+    def __init__(self, threads: int = INDEX_BUILD_THREADS):
+        self._threads = max(1, threads)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending: Set[int] = set()
+        self.builds = 0
+        self.skipped = 0
+        self.failures = 0
+        self.last: Dict[int, Dict] = {}
+
+    def schedule(self, client_id: int, kind: Optional[str] = None) -> bool:
+        with self._lock:
+            if client_id in self._pending:
+                return False
+            self._pending.add(client_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._threads, thread_name_prefix="index-build")
+        self._executor.submit(self._run, client_id, kind)
+        return True
+
+    def build(self, client_id: int, kind: Optional[str] = None) -> Optional[Dict]:
+        """Construye y publica el índice del cliente ahora (bloqueante). None si otro worker ya lo hace."""
+        import faiss
+        lock = FileLock(vectorStore.index_path(client_id) + ".build.lock")
+        try:
+            lock.acquire(timeout=0)
+        except Timeout:
+            self.skipped += 1
+            return None
+        try:
+            started = time.perf_counter()
+            dirty, building = vectorStore.ann_dirty_paths(client_id)
+            with vectorStore.client_lock(client_id):
+                # snapshot inmutable: el mmap sigue viendo este archivo aunque un escritor publique otro
+                flat = vectorStore.open_vectors_locked(client_id)
+                if flat is None:
+                    return None
+                # desde aquí los escritores anotan en `dirty` lo que el nuevo ANN no incluirá
+                _rotate_dirty(dirty, building)
+            kind = kind or choose_type(flat.ntotal)
+
+            ann_file = vectorStore.ann_path(client_id)
+            if kind == FLAT or flat.ntotal == 0:
+                with vectorStore.client_lock(client_id):
+                    for path in (ann_file, dirty, building):
+                        _remove(path)
+                kind = FLAT
+            else:
+                try:
+                    ann = build_from_flat(flat, kind)
+                    tmp = f"{ann_file}.tmp.{os.getpid()}"
+                    faiss.write_index(ann, tmp)
+                except Exception:
+                    with vectorStore.client_lock(client_id):
+                        if not os.path.exists(ann_file):
+                            _remove(building)
+                            _remove(dirty)
+                    raise
+                with vectorStore.client_lock(client_id):
+                    os.replace(tmp, ann_file)
+                    _remove(building)
+
+            info = {
+                "type": kind,
+                "vectors": flat.ntotal,
+                "bytes": os.path.getsize(ann_file) if kind != FLAT else os.path.getsize(vectorStore.index_path(client_id)),
+                "seconds": round(time.perf_counter() - started, 3),
+                "built_at": time.time(),
+            }
+            with self._lock:
+                self.builds += 1
+                self.last[client_id] = info
+            return info
+        finally:
+            lock.release()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "pending": sorted(self._pending),
+                "builds": self.builds,
+                "skipped": self.skipped,
+                "failures": self.failures,
+                "last": {str(k): v for k, v in self.last.items()},
+            }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _run(self, client_id: int, kind: Optional[str]) -> None:
+        try:
+            self.build(client_id, kind)
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+            print(f"Error building ANN index for client {client_id}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(client_id)
+
+
+def _rotate_dirty(dirty: str, building: str) -> None:
+    """Mueve los cambios anotados a `building` (se conservan si un build anterior quedó a medias)."""
+    try:
+        with open(dirty, "r", encoding="ascii") as f:
+            pending = f.read()
+    except FileNotFoundError:
+        pending = ""
+    with open(building, "a", encoding="ascii") as f:
+        f.write(pending)
+    _remove(dirty)
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+index_builder = IndexBuilder()
@@ -0,0 +1,366 @@
+# app/services/bm25Index.py
+import asyncio
+import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from filelock import FileLock, Timeout
+from sqlalchemy import select
+import anyio
+
+from app.db.session import AsyncSessionLocal
+from app.models.documentChunks import DocumentChunks
+from app.services.snapshotStore import open_snapshot, write_snapshot
+from app.services.vectorStore import VECTOR_STORE_DIR
+from app.util.env import env_float, env_int
+
+if TYPE_CHECKING:
+    from scipy import sparse  # se importa al construir/cargar un índice, no al arrancar
+
+BM25_K1 = env_float("BM25_K1", 1.2)
+BM25_B = env_float("BM25_B", 0.75)
+BM25_CACHE_SIZE = env_int("BM25_CACHE_SIZE", 64)  # clientes con índice léxico en memoria
+BM25_BUILD_POLL_SECONDS = env_float("BM25_BUILD_POLL_SECONDS", 0.1)  # espera mientras otro worker reconstruye
+BM25_BUILD_BATCH = env_int("BM25_BUILD_BATCH", 1000)  # chunks leídos y tokenizados por lote al reconstruir
+
+# archivos de versiones anteriores (npz + ids + vocabulario JSON), reemplazados por el snapshot
+_LEGACY_SUFFIXES = (".npz", ".ids.npy", ".vocab.json")
+
+# Palabras y códigos compuestos (RUC, SKU-123, 20.5.1, etc.)
+_TOKEN = re.compile(r"\w+(?:[-./]\w+)*", re.UNICODE)
+_SPLIT = re.compile(r"[-./]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokens en minúscula; los códigos compuestos se indexan completos y por partes."""
+    tokens: List[str] = []
+    for tok in _TOKEN.findall((text or "").lower()):
+        tokens.append(tok)
+        if _SPLIT.search(tok):
+            tokens.extend(p for p in _SPLIT.split(tok) if p)
+    return tokens
+
+
+class SnapshotVocab:
+    """
+    Vocabulario término -> columna leído del snapshot: términos UTF-8 ordenados en un solo blob
+    y búsqueda binaria, en lugar de un dict de Python que cada worker armaría en su propia memoria.
+    """
+
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, cols: np.ndarray):
+        self._blob = memoryview(terms)
+        self._offsets = offsets
+        self._cols = cols
+
+    def __len__(self) -> int:
+        return len(self._cols)
+
+    def _term(self, i: int) -> bytes:
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].tobytes()
+
+    def get(self, term: str, default: Optional[int] = None) -> Optional[int]:
+        key = term.encode("utf-8")  # el orden de los bytes UTF-8 es el de los code points
+        lo, hi = 0, len(self._cols)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._cols) and self._term(lo) == key:
+            return int(self._cols[lo])
+        return default
+
+
+class BM25Index:
+    """
+    Índice invertido BM25 como matriz dispersa (chunks x términos) con los pesos ya calculados,
+    de modo que puntuar una consulta es sumar columnas: W[:, términos] @ conteos.
+    """
+
+    def __init__(self, weights: "sparse.csc_matrix", vocab: "Dict[str, int] | SnapshotVocab", ids: np.ndarray,
+                 version: int = 0):
+        self.weights = weights
+        self.vocab = vocab
+        self.ids = ids  # vector_id de cada fila
+        self.version = version  # versión de los chunks del cliente con la que se construyó (ver BM25Store)
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[int, str]], k1: float = BM25_K1, b: float = BM25_B) -> "BM25Index":
+        builder = BM25Builder()
+        builder.add(docs)
+        return builder.finish(k1, b)
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Devuelve (vector_ids, scores) del top-k, ordenados de mayor a menor."""
+        counts: Dict[int, int] = {}
+        for tok in tokenize(query):
+            col = self.vocab.get(tok)
+            if col is not None:
+                counts[col] = counts.get(col, 0) + 1
+        if not counts or self.weights.shape[0] == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        cols = np.fromiter(counts.keys(), dtype=np.int64)
+        qw = np.fromiter(counts.values(), dtype=np.float32)
+        scores = np.asarray(self.weights[:, cols] @ qw).ravel()
+        hits = np.flatnonzero(scores > 0)
+        if hits.size > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        order = hits[np.argsort(-scores[hits], kind="stable")]
+        return self.ids[order], scores[order]
+
+    # --- persistencia ---
+
+    def save(self, path: str) -> None:
+        """Publica el índice como snapshot inmutable (ver snapshotStore)."""
+        weights = self.weights.tocsc()
+        terms = sorted(self.vocab)
+        encoded = [t.encode("utf-8") for t in terms]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        write_snapshot(path, {
+            "data": weights.data.astype(np.float32, copy=False),
+            "indices": weights.indices,
+            "indptr": weights.indptr,
+            "ids": self.ids,
+            "terms": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            "term_offsets": offsets,
+            "term_cols": np.fromiter((self.vocab[t] for t in terms), dtype=np.int32, count=len(terms)),
+        }, {"shape": list(weights.shape), "version": int(self.version)})
+
+    @classmethod
+    def load(cls, path: str, use_mmap: bool = True) -> "BM25Index":
+        """Abre el snapshot con mmap: la matriz y el vocabulario son vistas compartidas entre workers."""
+        from scipy import sparse
+        snap = open_snapshot(path, use_mmap)
+        weights = sparse.csc_matrix(
+            (snap["data"], snap["indices"], snap["indptr"]), shape=tuple(snap.meta["shape"]), copy=False,
+        )
+        vocab = SnapshotVocab(snap["terms"], snap["term_offsets"], snap["term_cols"])
+        return cls(weights, vocab, snap["ids"], int(snap.meta.get("version", 0)))
+
+
+class BM25Builder:
+    """
+    Construcción incremental de un BM25Index: cada lote de (vector_id, texto) se tokeniza y se
+    descarta, y solo quedan los pares (fila, término) en arreglos compactos. Así reconstruir un
+    cliente grande no retiene su texto completo en memoria.
+    """
+
+    def __init__(self):
+        self.vocab: Dict[str, int] = {}
+        self._ids = array("q")
+        self._rows = array("q")
+        self._cols = array("q")
+
+    def add(self, docs: Iterable[Tuple[int, str]]) -> None:
+        vocab = self.vocab
+        for vector_id, text in docs:
+            row = len(self._ids)
+            self._ids.append(int(vector_id))
+            cols = [vocab.setdefault(tok, len(vocab)) for tok in tokenize(text)]
+            self._cols.extend(cols)
+            self._rows.extend([row] * len(cols))
+
+    def finish(self, k1: float = BM25_K1, b: float = BM25_B) -> BM25Index:
+        from scipy import sparse
+        vocab = self.vocab
+        n_docs = len(self._ids)
+        ids = np.frombuffer(self._ids, dtype=np.int64).copy() if n_docs else np.empty(0, dtype=np.int64)
+        if not self._rows:
+            return BM25Index(sparse.csc_matrix((n_docs, 0), dtype=np.float32), vocab, ids)
+
+        # matriz de frecuencias (los duplicados se suman al convertir)
+        tf = sparse.csr_matrix(
+            (np.ones(len(self._rows), dtype=np.float32),
+             (np.frombuffer(self._rows, dtype=np.int64), np.frombuffer(self._cols, dtype=np.int64))),
+            shape=(n_docs, len(vocab)),
+        )
+        self._rows, self._cols = array("q"), array("q")
+        tf.sum_duplicates()
+        dl = np.asarray(tf.sum(axis=1)).ravel()
+        avgdl = float(dl.mean()) or 1.0
+        df = np.bincount(tf.indices, minlength=len(vocab))
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        coo = tf.tocoo()
+        norm = k1 * (1 - b + b * dl[coo.row] / avgdl)
+        data = idf[coo.col] * coo.data * (k1 + 1) / (coo.data + norm)
+        weights = sparse.csc_matrix((data.astype(np.float32), (coo.row, coo.col)), shape=tf.shape)
+        return BM25Index(weights, vocab, ids)
+
+
+class BM25Store:
+    """
+    Índices BM25 por cliente: LRU de snapshots abiertos (mmap), publicados en disco junto a los
+    vectores y reconstruidos desde `document_chunks` cuando quedaron desactualizados.
+
+    Cada ingestión sube la versión del cliente (`client_<id>.bm25.version`) en vez de borrar el
+    snapshot. Mientras tanto se sigue sirviendo el anterior y la reconstrucción corre en segundo
+    plano, una a la vez entre todos los workers. Solo se publica si la versión no cambió durante
+    la construcción; si cambió, se descarta y la siguiente consulta lanza otra.
+    """
+
+    def __init__(self, max_clients: int):
+        self.max_clients = max(1, max_clients)
+        self._entries: "OrderedDict[int, Tuple[BM25Index, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._builds: Dict[int, asyncio.Task] = {}
+        self.builds = 0
+        self.discarded = 0
+
+    def _path(self, client_id: int) -> str:
+        return os.path.join(VECTOR_STORE_DIR, f"client_{int(client_id)}.bm25")
+
+    def _version(self, client_id: int) -> int:
+        try:
+            with open(self._path(client_id) + ".version", "r", encoding="ascii") as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _cached(self, client_id: int) -> Tuple[Optional[BM25Index], bool]:
+        """(snapshot publicado o None, si está al día con la versión del cliente)."""
+        try:
+            mtime = os.stat(self._path(client_id)).st_mtime_ns
+        except FileNotFoundError:
+            return None, False
+        with self._lock:
+            entry = self._entries.get(client_id)
+            if entry is not None and entry[1] == mtime:
+                self._entries.move_to_end(client_id)
+                index = entry[0]
+            else:
+                index = None
+        if index is None:
+            index = BM25Index.load(self._path(client_id))
+            self._put(client_id, index, mtime)
+        return index, index.version >= self._version(client_id)
+
+    def _put(self, client_id: int, index: BM25Index, mtime: int) -> None:
+        with self._lock:
+            self._entries[client_id] = (index, mtime)
+            self._entries.move_to_end(client_id)
+            while len(self._entries) > self.max_clients:
+                self._entries.popitem(last=False)
+
+    def _build_and_publish(self, client_id: int, builder: BM25Builder, version: int) -> BM25Index:
+        path = self._path(client_id)
+        index = builder.finish()
+        index.version = version
+        building = f"{path}.build.{os.getpid()}"
+        index.save(building)
+        self.builds += 1
+        with FileLock(path + ".lock"):
+            if self._version(client_id) != version:
+                # hubo una ingestión mientras se leían los chunks: este índice ya nació viejo
+                _remove(building)
+                self.discarded += 1
+                return index
+            os.replace(building, path)
+        for suffix in _LEGACY_SUFFIXES:
+            _remove(path + suffix)
+        # se sirve desde el snapshot recién publicado, igual que en los demás workers
+        index = BM25Index.load(path)
+        self._put(client_id, index, os.stat(path).st_mtime_ns)
+        return index
+
+    async def _rebuild(self, client_id: int) -> BM25Index:
+        # una reconstrucción a la vez entre procesos; se sondea para no bloquear el event loop
+        lock = FileLock(self._path(client_id) + ".build.lock")
+        while True:
+            try:
+                lock.acquire(timeout=0)
+                break
+            except Timeout:
+                await asyncio.sleep(BM25_BUILD_POLL_SECONDS)
+        try:
+            index, current = await anyio.to_thread.run_sync(self._cached, client_id)
+            if index is not None and current:
+                return index  # lo publicó otro worker mientras esperábamos
+            # la versión se lee antes que los chunks: si sube después, la publicación se rechaza
+            version = await anyio.to_thread.run_sync(self._version, client_id)
+            # el índice se comparte entre workers: se construye desde el primario, no desde una réplica
+            # los chunks se leen por lotes y se tokenizan a medida que llegan (fuera del event loop)
+            builder = BM25Builder()
+            async with AsyncSessionLocal() as db:
+                result = await db.stream(
+                    select(DocumentChunks.vector_id, DocumentChunks.content)
+                    # los casi duplicados no entran: se recuperan por su chunk canónico
+                    .where(DocumentChunks.idClient == client_id, DocumentChunks.duplicate_of.is_(None))
+                    .order_by(DocumentChunks.vector_id)
+                    .execution_options(yield_per=BM25_BUILD_BATCH)
+                )
+                async for rows in result.partitions():
+                    await anyio.to_thread.run_sync(builder.add, rows)
+            return await anyio.to_thread.run_sync(self._build_and_publish, client_id, builder, version)
+        finally:
+            lock.release()
+
+    def _schedule(self, client_id: int) -> asyncio.Task:
+        task = self._builds.get(client_id)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._rebuild(client_id))
+            self._builds[client_id] = task
+            task.add_done_callback(lambda t: self._build_done(client_id, t))
+        return task
+
+    def _build_done(self, client_id: int, task: asyncio.Task) -> None:
+        if self._builds.get(client_id) is task:
+            del self._builds[client_id]
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error building BM25 index for client {client_id}: {task.exception()}")
+
+    async def get(self, client_id: int) -> BM25Index:
+        index, current = await anyio.to_thread.run_sync(self._cached, client_id)
+        if index is not None:
+            if not current:
+                self._schedule(client_id)  # se sigue sirviendo el anterior hasta que se publique
+            return index
+        # sin snapshot no hay nada que servir: se espera la construcción (compartida entre consultas;
+        # shield para que una request cancelada no la corte para las demás)
+        return await asyncio.shield(self._schedule(client_id))
+
+    def invalidate(self, client_id: int) -> None:
+        """Marca el índice léxico del cliente como desactualizado; se reconstruye en segundo plano."""
+        os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
+        path = self._path(client_id)
+        with FileLock(path + ".lock"):
+            version = self._version(client_id) + 1
+            tmp = f"{path}.version.tmp.{os.getpid()}"
+            with open(tmp, "w", encoding="ascii") as f:
+                f.write(str(version))
+            os.replace(tmp, path + ".version")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "clients": len(self._entries),
+                "building": sorted(self._builds),
+                "builds": self.builds,
+                "discarded": self.discarded,
+            }
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fusiona listas ordenadas de ids con RRF: score(d) = sum(1 / (k + rank))."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            doc = int(doc)
+            scores[doc] = scores.get(doc, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+
+
+bm25_store = BM25Store(BM25_CACHE_SIZE)
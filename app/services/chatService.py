@@ -0,0 +1,77 @@
+import json
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.chats import Chats
+from app.models.chatDetails import ChatDetails
+from app.models.users import Users
+
+# Límites de las columnas String de chats / chat_details
+_MESSAGE_MAX = 1000
+_RESPONSE_MAX = 2000
+_SOURCES_MAX = 4000
+_DETAIL_MAX = 2000
+
+
+def sources_json(doc_ids: Sequence[int], limit: int = _SOURCES_MAX) -> str:
+    """
+    Ids de documentos fuente como lista JSON (sin repetidos, en orden) que entra en `limit`
+    caracteres; si no entran todos se descartan los últimos, nunca se corta el JSON.
+    """
+    ids = list(dict.fromkeys(int(d) for d in doc_ids))
+    used = 2  # "[]"
+    for n, doc_id in enumerate(ids):
+        used += len(str(doc_id)) + (2 if n else 0)  # ", " entre ids, como json.dumps
+        if used > limit:
+            ids = ids[:n]
+            break
+    return json.dumps(ids)
+
+
+class ChatService:
+    def __init__(self, db_session: AsyncSession):
+        self.db = db_session
+
+    async def get_chat_user(self, user_id: int):
+        """Lo necesario para autorizar un chat: cliente, identidad en Cognito y si está activo."""
+        result = await self.db.execute(
+            select(Users.id, Users.idClient, Users.username, Users.email, Users.swt).where(Users.id == user_id)
+        )
+        return result.first()
+
+    async def persist_exchange(
+        self,
+        idUser: int,
+        session_id: str,
+        message: str,
+        response: str,
+        source_documents: Sequence[int],
+        details: Sequence[Tuple[str, str]],
+    ) -> Optional[int]:
+        """
+        Guarda el intercambio completo en una sola transacción: la fila de `chats`
+        y todos sus `chat_details` (en orden) con un INSERT multi-fila.
+        """
+        chat = Chats(
+            idUser=idUser,
+            session_id=session_id,
+            message=message[:_MESSAGE_MAX],
+            response=response[:_RESPONSE_MAX],
+            source_documents=sources_json(source_documents),
+        )
+        self.db.add(chat)
+        try:
+            await self.db.flush()  # obtiene chat.id sin cerrar la transacción
+            rows: List[dict] = [
+                {"idChat": chat.id, "type": kind, "detail": text[:_DETAIL_MAX], "order": i}
+                for i, (kind, text) in enumerate(details, start=1)
+            ]
+            if rows:
+                await self.db.execute(insert(ChatDetails), rows)
+            await self.db.commit()
+            return chat.id
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            print(f"Error persisting chat: {e}")
+            return None
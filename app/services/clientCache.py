@@ -0,0 +1,120 @@
+# app/services/clientCache.py
+import os
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.schemas.clientsDto import ClientsDto
+from app.services.vectorStore import VECTOR_STORE_DIR
+from app.shared.invalidationLog import InvalidationLog
+from app.shared.ttlCache import TTLCache
+from app.util.env import env_bool, env_float, env_int
+
+CLIENT_CACHE_ENABLED = env_bool("CLIENT_CACHE_ENABLED", True)
+CLIENT_CACHE_TTL_SECONDS = env_float("CLIENT_CACHE_TTL_SECONDS", 60.0)
+CLIENT_CACHE_NEGATIVE_TTL_SECONDS = env_float("CLIENT_CACHE_NEGATIVE_TTL_SECONDS", 5.0)  # "no existe"
+CLIENT_CACHE_MAX_ENTRIES = env_int("CLIENT_CACHE_MAX_ENTRIES", 10_000)
+# Invalidación entre workers: registro append-only compartido (app/shared/invalidationLog.py)
+CLIENT_CACHE_SHARED_INVALIDATION = env_bool("CLIENT_CACHE_SHARED_INVALIDATION", True)
+CLIENT_CACHE_LOG_MAX_BYTES = env_int("CLIENT_CACHE_LOG_MAX_BYTES", 256 * 1024)
+
+
+class ClientCache:
+    """
+    Caché read-through de `Clients` por id, RUC y api_key (guarda snapshots `ClientsDto`, no filas ORM).
+    Las escrituras de `clientService` invalidan la caché local y publican en el registro
+    compartido, que los demás workers aplican antes de su siguiente lectura.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, negative_ttl: float, log: Optional[InvalidationLog] = None):
+        self.negative_ttl = negative_ttl
+        self.by_id = TTLCache(max_entries, ttl)
+        self.by_ruc = TTLCache(max_entries, ttl)
+        self.by_api_key = TTLCache(max_entries, ttl)
+        self._log = log
+        self._log_lock = threading.Lock()
+        self.remote_invalidations = 0
+
+    def get(self, kind: str, key) -> Tuple[bool, Optional[ClientsDto]]:
+        self._sync()
+        return self._cache(kind).get(key)
+
+    def put(self, kind: str, key, client: Optional[ClientsDto]) -> None:
+        if client is None:
+            self._cache(kind).set(key, None, ttl=self.negative_ttl)
+            return
+        # una lectura por cualquier clave calienta las tres
+        self.by_id.set(client.id, client)
+        self.by_ruc.set(client.ruc, client)
+        if client.api_key:
+            self.by_api_key.set(client.api_key, client)
+
+    def invalidate(self, ids: Iterable[int] = (), rucs: Iterable[str] = (), api_keys: Iterable[str] = ()) -> None:
+        message = {
+            "ids": [int(i) for i in ids],
+            "rucs": [r for r in rucs if r],
+            "api_keys": [k for k in api_keys if k],
+        }
+        self._apply(message)
+        if self._log is not None:
+            try:
+                self._log.publish(message)
+            except OSError as e:
+                print(f"Error publishing client cache invalidation: {e}")
+
+    def clear(self) -> None:
+        self.by_id.clear()
+        self.by_ruc.clear()
+        self.by_api_key.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "by_id": self.by_id.stats(),
+            "by_ruc": self.by_ruc.stats(),
+            "by_api_key": self.by_api_key.stats(),
+            "shared_invalidation": self._log is not None,
+            "remote_invalidations": self.remote_invalidations,
+        }
+
+    # --- internos ---
+
+    def _apply(self, message: Dict) -> None:
+        ids = set(message.get("ids", ()))
+        for i in ids:
+            self.by_id.delete(i)
+        for r in message.get("rucs", ()):
+            self.by_ruc.delete(r)
+        for k in message.get("api_keys", ()):
+            self.by_api_key.delete(k)
+        if ids:
+            # entradas por RUC/api_key que apuntan a esos ids (p. ej. valores ya cambiados)
+            stale = lambda c: c is not None and c.id in ids  # noqa: E731
+            self.by_ruc.delete_where(stale)
+            self.by_api_key.delete_where(stale)
+
+    def _sync(self) -> None:
+        if self._log is None:
+            return
+        with self._log_lock:
+            try:
+                reset, messages = self._log.poll()
+            except (OSError, ValueError):
+                # registro ilegible: no sabemos qué cambió, vaciamos todo
+                self._log.skip_to_end()
+                reset, messages = True, []
+        if reset:
+            self.clear()
+        for message in messages:
+            self._apply(message)
+        self.remote_invalidations += len(messages)
+
+    def _cache(self, kind: str) -> TTLCache:
+        return {"id": self.by_id, "ruc": self.by_ruc, "api_key": self.by_api_key}[kind]
+
+
+client_cache = ClientCache(
+    CLIENT_CACHE_MAX_ENTRIES,
+    CLIENT_CACHE_TTL_SECONDS,
+    CLIENT_CACHE_NEGATIVE_TTL_SECONDS,
+    InvalidationLog(os.path.join(VECTOR_STORE_DIR, "clients.invalidations"), CLIENT_CACHE_LOG_MAX_BYTES)
+    if CLIENT_CACHE_SHARED_INVALIDATION else None,
+)
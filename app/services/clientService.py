@@ -1,25 +1,48 @@
-from typing import List, Optional
-from sqlalchemy import select as Select
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select as Select, or_
 from sqlalchemy.exc import SQLAlchemyError
 from app.models.clients import Clients
-from app.schemas.clientsDto import CreateClientsDto, UpdateClientsDto
+from app.schemas.clientsDto import ClientsDto, CreateClientsDto, UpdateClientsDto, BulkUpdateClientsDto
+from app.services.clientCache import CLIENT_CACHE_ENABLED, client_cache
+from app.shared.bulk import delete_by_id, find_duplicates, insert_rows, item_error, item_ok, summarize, update_by_id
+from app.shared.pagination import keyset_page
 from sqlalchemy.ext.asyncio import AsyncSession
 class clientService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def get_client(self, client_id: int):
+    # --- Lecturas con caché (devuelven snapshots ClientsDto, no filas ORM) ---
+
+    async def get_client(self, client_id: int) -> Optional[ClientsDto]:
+        return await self._cached_lookup("id", client_id, Clients.id)
+
+    async def get_client_by_ruc(self, ruc: str) -> Optional[ClientsDto]:
+        return await self._cached_lookup("ruc", ruc, Clients.ruc)
+
+    async def get_client_by_api_key(self, api_key: str) -> Optional[ClientsDto]:
+        return await self._cached_lookup("api_key", api_key, Clients.api_key)
+
+    async def _cached_lookup(self, kind: str, key, column) -> Optional[ClientsDto]:
+        if CLIENT_CACHE_ENABLED:
+            found, client = client_cache.get(kind, key)
+            if found:
+                return client
+        row = (await self.db.execute(Select(Clients).where(column == key))).scalar_one_or_none()
+        client = ClientsDto.model_validate(row, from_attributes=True) if row else None
+        if CLIENT_CACHE_ENABLED:
+            client_cache.put(kind, key, client)
+        return client
+
+    async def _load_client(self, client_id: int) -> Optional[Clients]:
+        """Fila ORM sin caché, para modificarla."""
         result = await self.db.execute(Select(Clients).where(Clients.id == client_id))
         return result.scalar_one_or_none()
-    
-    async def get_client_by_ruc(self, ruc: str) -> Optional[Clients]:
-        result = await self.db.execute(Select(Clients).where(Clients.ruc == ruc))
-        return result.scalar_one_or_none()
 
-    async def get_clients(self, skip: int = 0, limit: int = 100) -> List[Clients]:
-        stmt = Select(Clients).offset(skip).limit(limit)
-        result = await self.db.execute(stmt)
-        return result.scalars().all()
+    async def get_clients(self, cursor: Optional[str] = None, limit: int = 100, swt: Optional[bool] = None) -> Tuple[List[Clients], Optional[str]]:
+        stmt = Select(Clients)
+        if swt is not None:
+            stmt = stmt.where(Clients.swt == swt)
+        return await keyset_page(self.db, stmt, Clients.id, cursor, limit)
     
     async def create_client(self, client_data: CreateClientsDto) -> Optional[Clients]:
         client = Clients(**client_data)
@@ -27,6 +50,8 @@ class clientService:
         try:
             await self.db.commit()
             await self.db.refresh(client)
+            # quita posibles entradas negativas ("no existe") de este RUC/api_key
+            client_cache.invalidate(rucs=[client.ruc], api_keys=[client.api_key])
             return client
         except SQLAlchemyError as e:
             await self.db.rollback()
@@ -34,7 +59,7 @@ class clientService:
             return None
         
     async def update_client(self, client_id: int, client_data: UpdateClientsDto) -> Optional[Clients]:
-        client = await self.get_client(client_id)
+        client = await self._load_client(client_id)
         if not client:
             return None
         for field, value in client_data.dict(exclude_unset=True).items():
@@ -42,19 +67,89 @@ class clientService:
         try:
             await self.db.commit()
             await self.db.refresh(client)
+            client_cache.invalidate(ids=[client.id], rucs=[client.ruc], api_keys=[client.api_key])
             return client
         except SQLAlchemyError:
             await self.db.rollback()
             return None
     
     async def delete_client(self, client_id: int) -> bool:
-        client = await self.get_client(client_id)
+        client = await self._load_client(client_id)
         if not client:
             return False
         try:
             await self.db.delete(client)
             await self.db.commit()
+            client_cache.invalidate(ids=[client_id])
             return True
         except SQLAlchemyError:
             await self.db.rollback()
-            return False
\ No newline at end of file
+            return False
+
+    # --- Operaciones en lote ---
+
+    async def create_clients_bulk(self, items: List[CreateClientsDto]) -> Dict:
+        """
+        Valida el lote (RUC/nombre/api_key únicos, en el lote y contra la BD) e inserta
+        los válidos con INSERT multi-fila en una sola transacción.
+        """
+        errors: Dict[int, str] = {}
+        for field in ("ruc", "name", "api_key"):
+            for i in find_duplicates([getattr(c, field) for c in items]):
+                errors.setdefault(i, f"{field} repetido en el lote")
+
+        rucs = [c.ruc for c in items]
+        names = [c.name for c in items]
+        api_keys = [c.api_key for c in items if c.api_key]
+        conditions = [Clients.ruc.in_(rucs), Clients.name.in_(names)]
+        if api_keys:
+            conditions.append(Clients.api_key.in_(api_keys))
+        taken = (await self.db.execute(
+            Select(Clients.ruc, Clients.name, Clients.api_key).where(or_(*conditions))
+        )).all() if items else []
+        taken_rucs = {t.ruc for t in taken}
+        taken_names = {t.name for t in taken}
+        taken_keys = {t.api_key for t in taken if t.api_key}
+        for i, c in enumerate(items):
+            if c.ruc in taken_rucs:
+                errors.setdefault(i, "Client with this RUC already exists.")
+            elif c.name in taken_names:
+                errors.setdefault(i, "Client with this name already exists.")
+            elif c.api_key and c.api_key in taken_keys:
+                errors.setdefault(i, "Client with this api_key already exists.")
+
+        valid = [(i, c) for i, c in enumerate(items) if i not in errors]
+        results = [item_error(i, e) for i, e in errors.items()]
+        try:
+            await insert_rows(self.db, Clients, [c.dict(exclude={"createDate"}) for _, c in valid])
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            print(f"Error creating clients in bulk: {e}")
+            results.extend(item_error(i, f"db error: {e.__class__.__name__}") for i, _ in valid)
+            return summarize(results)
+
+        # MySQL no tiene RETURNING: recuperamos los ids por la clave única en una sola consulta
+        created = {}
+        if valid:
+            created = dict((await self.db.execute(
+                Select(Clients.ruc, Clients.id).where(Clients.ruc.in_([c.ruc for _, c in valid]))
+            )).all())
+        results.extend(item_ok(i, created.get(c.ruc)) for i, c in valid)
+        client_cache.invalidate(rucs=[c.ruc for _, c in valid], api_keys=[c.api_key for _, c in valid])
+        return summarize(results)
+
+    async def update_clients_bulk(self, items: List[BulkUpdateClientsDto]) -> Dict:
+        rows = [item.dict(exclude_unset=True) | {"id": item.id} for item in items]
+        results = await update_by_id(self.db, Clients, rows)
+        client_cache.invalidate(
+            ids=[r["id"] for r in rows],
+            rucs=[r.get("ruc") for r in rows],
+            api_keys=[r.get("api_key") for r in rows],
+        )
+        return summarize(results)
+
+    async def delete_clients_bulk(self, ids: List[int]) -> Dict:
+        results = await delete_by_id(self.db, Clients, ids)
+        client_cache.invalidate(ids=ids)
+        return summarize(results)
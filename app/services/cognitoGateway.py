@@ -0,0 +1,186 @@
+# app/services/cognitoGateway.py
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Optional
+
+from botocore.exceptions import ClientError
+
+from app.shared.metrics import LatencyHistogram
+from app.util.env import env, env_bool, env_float, env_int
+
+COGNITO_REGION = env("COGNITO_REGION")
+COGNITO_USER_POOL_ID = env("COGNITO_USER_POOL_ID")
+AWS_ACCESS_KEY_ID = env("IAM_ACCESS_KEY_ID")
+AWS_SECRET_ACCESS_KEY = env("IAM_SECRET_ACCESS_KEY")
+
+# Pool propio: una Cognito lenta no debe ocupar el pool por defecto de anyio (40 hilos)
+COGNITO_THREADS = env_int("COGNITO_THREADS", 16)
+COGNITO_MAX_POOL_CONNECTIONS = env_int("COGNITO_MAX_POOL_CONNECTIONS", COGNITO_THREADS)
+COGNITO_CONNECT_TIMEOUT = env_float("COGNITO_CONNECT_TIMEOUT", 2.0)
+COGNITO_READ_TIMEOUT = env_float("COGNITO_READ_TIMEOUT", 5.0)
+# Reintentos "standard" de botocore: backoff exponencial con jitter completo
+COGNITO_MAX_ATTEMPTS = env_int("COGNITO_MAX_ATTEMPTS", 3)  # incluye el primer intento
+# Límite de llamadas simultáneas por operación; COGNITO_OP_CONCURRENCY="initiate_auth=32,admin_create_user=8"
+COGNITO_DEFAULT_CONCURRENCY = env_int("COGNITO_DEFAULT_CONCURRENCY", COGNITO_THREADS)
+COGNITO_OP_CONCURRENCY = env("COGNITO_OP_CONCURRENCY", "")
+# Sustituto en memoria para pruebas de carga (sin AWS)
+COGNITO_STUB = env_bool("COGNITO_STUB", False)
+COGNITO_STUB_LATENCY_MS = env_float("COGNITO_STUB_LATENCY_MS", 0.0)
+
+if not COGNITO_STUB and not (COGNITO_REGION and COGNITO_USER_POOL_ID):
+    raise RuntimeError("Config Cognito incompleta: COGNITO_REGION y COGNITO_USER_POOL_ID son requeridos.")
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    limits = {}
+    for part in (spec or "").split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip().isdigit():
+            limits[name.strip()] = max(1, int(value))
+    return limits
+
+def _boto_client():
+    import boto3
+    from botocore.config import Config
+
+    config = Config(
+        max_pool_connections=COGNITO_MAX_POOL_CONNECTIONS,
+        connect_timeout=COGNITO_CONNECT_TIMEOUT,
+        read_timeout=COGNITO_READ_TIMEOUT,
+        retries={"total_max_attempts": COGNITO_MAX_ATTEMPTS, "mode": "standard"},
+        tcp_keepalive=True,
+    )
+    return boto3.client(
+        "cognito-idp",
+        region_name=COGNITO_REGION,
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        config=config,
+    )
+
+def _stub_client():
+    from app.services.cognitoStub import StubCognitoClient
+    return StubCognitoClient(latency_ms=COGNITO_STUB_LATENCY_MS)
+
+
+class _OpStats:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.latency = LatencyHistogram()
+        self.in_flight = 0
+        self.waiting = 0
+        self.errors = 0
+
+
+class CognitoGateway:
+    """
+    Punto único para las llamadas a Cognito: cliente boto3 compartido (creado al primer uso),
+    pool de hilos dedicado, límite de concurrencia y histograma de latencias por operación.
+    Los errores de Cognito se propagan como `ClientError`, igual que con boto3 directo.
+    """
+
+    def __init__(self, client_factory, threads: int, default_limit: int, limits: Optional[Dict[str, int]] = None):
+        self._client_factory = client_factory
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._threads = max(1, threads)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._default_limit = max(1, default_limit)
+        self._limits = limits or {}
+        self._ops: Dict[str, _OpStats] = {}
+
+    @property
+    def client(self):
+        # se crea dentro del pool: boto3.client() tarda y no debe bloquear el event loop
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    def use_client(self, client) -> None:
+        """Reemplaza el cliente (p. ej. por `StubCognitoClient` en pruebas)."""
+        self._client = client
+
+    async def call(self, operation: str, **params):
+        op = self._op(operation)
+        loop = asyncio.get_running_loop()
+        op.waiting += 1
+        async with op.semaphore:
+            op.waiting -= 1
+            op.in_flight += 1
+            t0 = time.perf_counter()
+            try:
+                return await loop.run_in_executor(self._get_executor(), partial(self._invoke, operation, params))
+            except ClientError:
+                op.errors += 1
+                raise
+            finally:
+                op.latency.observe(time.perf_counter() - t0)
+                op.in_flight -= 1
+
+    # --- operaciones usadas por la API ---
+
+    async def admin_create_user(self, **params):
+        return await self.call("admin_create_user", UserPoolId=COGNITO_USER_POOL_ID, **params)
+
+    async def admin_set_user_password(self, **params):
+        return await self.call("admin_set_user_password", UserPoolId=COGNITO_USER_POOL_ID, **params)
+
+    async def admin_delete_user(self, **params):
+        return await self.call("admin_delete_user", UserPoolId=COGNITO_USER_POOL_ID, **params)
+
+    async def initiate_auth(self, **params):
+        return await self.call("initiate_auth", **params)
+
+    def stats(self) -> Dict:
+        return {
+            "backend": "stub" if COGNITO_STUB else "boto3",
+            "client_ready": self._client is not None,
+            "threads": self._threads,
+            "max_pool_connections": COGNITO_MAX_POOL_CONNECTIONS,
+            "operations": {
+                name: {
+                    "limit": op.limit,
+                    "in_flight": op.in_flight,
+                    "waiting": op.waiting,
+                    "errors": op.errors,
+                    "latency": op.latency.snapshot(),
+                }
+                for name, op in self._ops.items()
+            },
+        }
+
+    def operations(self) -> Dict[str, _OpStats]:
+        return dict(self._ops)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _invoke(self, operation: str, params: Dict):
+        return getattr(self.client, operation)(**params)
+
+    def _op(self, operation: str) -> _OpStats:
+        op = self._ops.get(operation)
+        if op is None:
+            op = self._ops[operation] = _OpStats(self._limits.get(operation, self._default_limit))
+        return op
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._threads, thread_name_prefix="cognito")
+        return self._executor
+
+
+cognito_gateway = CognitoGateway(
+    _stub_client if COGNITO_STUB else _boto_client,
+    COGNITO_THREADS,
+    COGNITO_DEFAULT_CONCURRENCY,
+    _parse_limits(COGNITO_OP_CONCURRENCY),
+)
@@ -0,0 +1,79 @@
+# app/services/cognitoStub.py
+import secrets
+import threading
+import time
+from typing import Dict
+
+from botocore.exceptions import ClientError
+
+
+def _error(code: str, message: str, operation: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+class StubCognitoClient:
+    """
+    Sustituto en memoria del cliente boto3 `cognito-idp` para pruebas de carga y desarrollo:
+    implementa solo las operaciones que usa la API, con latencia simulada opcional
+    (bloqueante, como una llamada real dentro del pool de hilos).
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000.0
+        self._users: Dict[str, Dict] = {}
+        self._refresh_tokens: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _wait(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+
+    def admin_create_user(self, UserPoolId: str, Username: str, UserAttributes=(), MessageAction=None, **_) -> Dict:
+        self._wait()
+        with self._lock:
+            if Username in self._users:
+                raise _error("UsernameExistsException", "User account already exists.", "AdminCreateUser")
+            self._users[Username] = {"password": None, "attributes": list(UserAttributes)}
+        return {"User": {"Username": Username, "Attributes": list(UserAttributes), "Enabled": True}}
+
+    def admin_set_user_password(self, UserPoolId: str, Username: str, Password: str, Permanent: bool = False, **_) -> Dict:
+        self._wait()
+        with self._lock:
+            user = self._users.get(Username)
+            if user is None:
+                raise _error("UserNotFoundException", "User does not exist.", "AdminSetUserPassword")
+            user["password"] = Password
+        return {}
+
+    def admin_delete_user(self, UserPoolId: str, Username: str, **_) -> Dict:
+        self._wait()
+        with self._lock:
+            if self._users.pop(Username, None) is None:
+                raise _error("UserNotFoundException", "User does not exist.", "AdminDeleteUser")
+        return {}
+
+    def initiate_auth(self, ClientId: str, AuthFlow: str, AuthParameters: Dict, **_) -> Dict:
+        self._wait()
+        with self._lock:
+            if AuthFlow == "USER_PASSWORD_AUTH":
+                username = AuthParameters.get("USERNAME")
+                user = self._users.get(username)
+                if user is None or user["password"] != AuthParameters.get("PASSWORD"):
+                    raise _error("NotAuthorizedException", "Incorrect username or password.", "InitiateAuth")
+                refresh = secrets.token_urlsafe(32)
+                self._refresh_tokens[refresh] = username
+            elif AuthFlow == "REFRESH_TOKEN_AUTH":
+                refresh = None
+                if AuthParameters.get("REFRESH_TOKEN") not in self._refresh_tokens:
+                    raise _error("NotAuthorizedException", "Invalid Refresh Token", "InitiateAuth")
+            else:
+                raise _error("InvalidParameterException", f"Unsupported AuthFlow {AuthFlow}", "InitiateAuth")
+        result = {
+            "AccessToken": "stub-access-" + secrets.token_urlsafe(16),
+            "IdToken": "stub-id-" + secrets.token_urlsafe(16),
+            "ExpiresIn": 3600,
+            "TokenType": "Bearer",
+        }
+        if refresh:
+            result["RefreshToken"] = refresh
+        return {"AuthenticationResult": result}
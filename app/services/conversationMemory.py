@@ -0,0 +1,173 @@
+# app/services/conversationMemory.py
+import os
+import socket
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+import anyio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chatDetails import ChatDetails
+from app.models.chats import Chats
+from app.services.vectorStore import VECTOR_STORE_DIR
+from app.shared.invalidationLog import InvalidationLog
+from app.shared.ttlCache import TTLCache
+from app.util.env import env_bool, env_int
+from app.util.tokens import count_tokens_many
+
+MEMORY_MAX_TURNS = env_int("MEMORY_MAX_TURNS", 20)          # turnos (mensajes) que se leen de la BD
+MEMORY_TOKEN_BUDGET = env_int("MEMORY_TOKEN_BUDGET", 1500)  # tokens de historial enviados al LLM
+MEMORY_CACHE_SESSIONS = env_int("MEMORY_CACHE_SESSIONS", 2000)
+MEMORY_CACHE_TTL_SECONDS = env_int("MEMORY_CACHE_TTL_SECONDS", 1800)
+# Una sesión puede caer en distintos workers: cada turno persistido se anuncia en un registro
+# compartido y los demás descartan su ventana antes de la siguiente lectura
+MEMORY_SHARED_INVALIDATION = env_bool("MEMORY_SHARED_INVALIDATION", True)
+MEMORY_LOG_MAX_BYTES = env_int("MEMORY_LOG_MAX_BYTES", 1024 * 1024)
+
+_DETAIL_MAX = ChatDetails.__table__.c.detail.type.length  # igual que lo que guarda chatService
+
+# ChatDetails.type -> rol del LLM
+_ROLES = {"user": "user", "bot": "assistant", "assistant": "assistant", "system": "system"}
+
+
+@dataclass(frozen=True)
+class Turn:
+    role: str
+    content: str
+    tokens: int
+
+
+def _trim(turns: Sequence[Turn], budget: int) -> List[Turn]:
+    """Los turnos más recientes que caben en `budget`, en orden cronológico, empezando por el usuario."""
+    kept: List[Turn] = []
+    used = 0
+    for turn in reversed(turns):
+        if used + turn.tokens > budget:
+            break
+        kept.append(turn)
+        used += turn.tokens
+    kept.reverse()
+    while kept and kept[0].role != "user":
+        kept.pop(0)
+    return kept
+
+
+class ConversationMemory:
+    """
+    Ventanas recientes de conversación por (usuario, `Chats.session_id`), ya tokenizadas.
+    El primer turno de una sesión lee los últimos `max_turns` detalles con una consulta indexada;
+    los siguientes se sirven de la caché LRU, a la que el chat agrega cada intercambio persistido.
+    Los intercambios se publican en el registro compartido: los otros workers olvidan esa sesión
+    y la releen de la BD, en vez de responder con una ventana a la que le faltan turnos.
+    """
+
+    def __init__(self, max_turns: int, token_budget: int, cache_sessions: int, ttl_seconds: int,
+                 log: Optional[InvalidationLog] = None):
+        self.max_turns = max(1, max_turns)
+        self.token_budget = token_budget
+        self._cache = TTLCache(cache_sessions, ttl_seconds)
+        self._log = log
+        self._log_lock = threading.Lock()
+        self.loads = 0
+        self.remote_invalidations = 0
+
+    async def history(self, db: AsyncSession, idUser: int, session_id: str,
+                      token_budget: Optional[int] = None) -> List[Dict]:
+        """Mensajes `{"role", "content"}` listos para `build_messages(..., history=...)`."""
+        window = await self._window(db, idUser, session_id)
+        budget = self.token_budget if token_budget is None else token_budget
+        return [{"role": t.role, "content": t.content} for t in _trim(list(window), budget)]
+
+    async def append(self, idUser: int, session_id: str, details: Sequence[Tuple[str, str]]) -> None:
+        """Agrega turnos ya persistidos; si la sesión no está en caché, la próxima lectura irá a la BD."""
+        self._publish(idUser, session_id)
+        found, window = self._cache.get((idUser, session_id))
+        if not found:
+            return
+        details = [(kind, text[:_DETAIL_MAX]) for kind, text in details]
+        tokens = await anyio.to_thread.run_sync(count_tokens_many, [text for _, text in details])
+        window.extend(Turn(_ROLES.get(kind, "user"), text, n) for (kind, text), n in zip(details, tokens))
+
+    def invalidate(self, idUser: int, session_id: str) -> None:
+        self._cache.delete((idUser, session_id))
+        self._publish(idUser, session_id)
+
+    def stats(self) -> Dict:
+        return {
+            **self._cache.stats(),
+            "db_loads": self.loads,
+            "shared_invalidation": self._log is not None,
+            "remote_invalidations": self.remote_invalidations,
+            "max_turns": self.max_turns,
+            "token_budget": self.token_budget,
+        }
+
+    def _publish(self, idUser: int, session_id: str) -> None:
+        if self._log is None:
+            return
+        try:
+            self._log.publish({"origin": _origin(), "sessions": [[int(idUser), session_id]]})
+        except OSError as e:
+            print(f"Error publishing conversation memory invalidation: {e}")
+
+    def _sync(self) -> None:
+        if self._log is None:
+            return
+        with self._log_lock:
+            try:
+                reset, messages = self._log.poll()
+            except (OSError, ValueError):
+                # registro ilegible: no sabemos qué sesiones cambiaron, vaciamos todo
+                self._log.skip_to_end()
+                reset, messages = True, []
+        if reset:
+            self._cache.clear()
+        origin = _origin()
+        for message in messages:
+            if message.get("origin") == origin:
+                continue  # nuestra propia escritura: la ventana local ya la tiene
+            for idUser, session_id in message.get("sessions", ()):
+                self._cache.delete((idUser, session_id))
+            self.remote_invalidations += 1
+
+    async def _window(self, db: AsyncSession, idUser: int, session_id: str) -> Deque[Turn]:
+        self._sync()
+        key = (idUser, session_id)
+        found, window = self._cache.get(key)
+        if found:
+            return window
+        # chats(session_id, id) + chat_details(idChat, order): solo se leen las filas de la ventana
+        result = await db.execute(
+            select(ChatDetails.type, ChatDetails.detail)
+            .join(Chats, Chats.id == ChatDetails.idChat)
+            .where(Chats.session_id == session_id, Chats.idUser == idUser, Chats.swt == True)  # noqa: E712
+            .order_by(ChatDetails.idChat.desc(), ChatDetails.order.desc())
+            .limit(self.max_turns)
+        )
+        rows = list(reversed(result.all()))
+        tokens = await anyio.to_thread.run_sync(count_tokens_many, [r.detail for r in rows])
+        window = deque(
+            (Turn(_ROLES.get(r.type, "user"), r.detail, n) for r, n in zip(rows, tokens)),
+            maxlen=self.max_turns,
+        )
+        self.loads += 1
+        self._cache.set(key, window)
+        return window
+
+
+def _origin() -> str:
+    # por proceso, calculado al publicar: los workers forkeados no heredan el del padre
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+conversation_memory = ConversationMemory(
+    MEMORY_MAX_TURNS,
+    MEMORY_TOKEN_BUDGET,
+    MEMORY_CACHE_SESSIONS,
+    MEMORY_CACHE_TTL_SECONDS,
+    InvalidationLog(os.path.join(VECTOR_STORE_DIR, "conversations.invalidations"), MEMORY_LOG_MAX_BYTES)
+    if MEMORY_SHARED_INVALIDATION else None,
+)
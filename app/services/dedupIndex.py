@@ -0,0 +1,380 @@
+# app/services/dedupIndex.py
+import hashlib
+import os
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from filelock import FileLock, Timeout
+
+from app.services import deltaLog, vectorStore
+from app.services.snapshotStore import SnapshotWriter, open_snapshot
+from app.util.chunking import normalize_text
+from app.util.env import env_bool, env_float, env_int
+
+# Chunks casi duplicados (encabezados, pies legales, páginas copiadas): firma MinHash de los
+# shingles de palabras y LSH por bandas. Un chunk cuya similitud de Jaccard estimada con otro ya
+# indexado llega al umbral no se embebe ni entra a los índices: queda enlazado a ese chunk
+# canónico (`DocumentChunks.duplicate_of`).
+DEDUP_ENABLED = env_bool("DEDUP_ENABLED", True)
+DEDUP_THRESHOLD = env_float("DEDUP_THRESHOLD", 0.8)         # Jaccard estimada mínima para enlazar
+DEDUP_SHINGLE_WORDS = env_int("DEDUP_SHINGLE_WORDS", 3)
+DEDUP_MIN_WORDS = env_int("DEDUP_MIN_WORDS", 8)              # chunks más cortos no se deduplican
+DEDUP_MAX_CANDIDATES = env_int("DEDUP_MAX_CANDIDATES", 64)   # por banda: acota cubetas muy pobladas
+
+NUM_PERM = 64
+# 16 bandas x 4 filas: un par con Jaccard 0.8 es candidato con probabilidad ~0.9998 (0.5 -> ~0.64);
+# los candidatos se confirman con la firma completa contra DEDUP_THRESHOLD
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_SIGNATURE_BATCH = 256
+_SHIFT = np.uint64(32)
+_FNV_PRIME = np.uint64(0x100000001B3)
+
+
+def _params(tag: str) -> np.ndarray:
+    # deterministas entre procesos y versiones de numpy: las firmas guardadas siguen valiendo
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(f"{tag}{i}".encode(), digest_size=8).digest(), "little") for i in range(NUM_PERM)],
+        dtype=np.uint64,
+    )
+
+# permutaciones multiply-shift: bits altos de (a·x + b) mod 2^64, con a impar
+_A = _params("minhash-a") | np.uint64(1)
+_B = _params("minhash-b")
+_BAND_SALT = np.array([((i + 1) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF for i in range(BANDS)], dtype=np.uint64)
+
+
+def _meta() -> Dict:
+    return {"num_perm": NUM_PERM, "bands": BANDS, "shingle_words": DEDUP_SHINGLE_WORDS}
+
+def dedup_path(client_id: int) -> str:
+    """Firmas de los chunks canónicos del cliente (snapshot, ver snapshotStore)."""
+    return os.path.join(vectorStore.VECTOR_STORE_DIR, f"client_{int(client_id)}.dedup")
+
+
+def signatures(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Firmas MinHash (n, NUM_PERM) uint32 sobre shingles de `DEDUP_SHINGLE_WORDS` palabras y la
+    máscara de chunks con al menos `DEDUP_MIN_WORDS` palabras (los demás no se deduplican).
+    """
+    sigs = np.full((len(texts), NUM_PERM), 0xFFFFFFFF, dtype=np.uint32)
+    eligible = np.zeros(len(texts), dtype=bool)
+    k = max(1, DEDUP_SHINGLE_WORDS)
+    for start in range(0, len(texts), _SIGNATURE_BATCH):
+        hashes: List[int] = []
+        lengths: List[int] = []
+        rows: List[int] = []
+        for i in range(start, min(start + _SIGNATURE_BATCH, len(texts))):
+            words = normalize_text(texts[i]).lower().split(" ")
+            if len(words) < max(DEDUP_MIN_WORDS, 1):
+                continue
+            shingles = {zlib.crc32(" ".join(words[j:j + k]).encode("utf-8")) for j in range(max(1, len(words) - k + 1))}
+            hashes.extend(shingles)
+            lengths.append(len(shingles))
+            rows.append(i)
+        if not rows:
+            continue
+        h = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        permuted = (h[:, None] * _A + _B) >> _SHIFT
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        sigs[rows] = np.minimum.reduceat(permuted, offsets, axis=0).astype(np.uint32)
+        eligible[rows] = True
+    return sigs, eligible
+
+def band_keys(sigs: np.ndarray) -> np.ndarray:
+    """Clave LSH de cada banda (n, BANDS) uint64; la banda va mezclada en la clave."""
+    rows = np.asarray(sigs, dtype=np.uint32).astype(np.uint64).reshape(len(sigs), BANDS, ROWS)
+    keys = np.broadcast_to(_BAND_SALT, (len(sigs), BANDS)).copy()
+    for r in range(ROWS):
+        keys = (keys ^ rows[:, :, r]) * _FNV_PRIME
+    return keys
+
+
+class DedupIndex:
+    """
+    Firmas de los chunks canónicos de un cliente con las claves de banda ordenadas (búsqueda por
+    `searchsorted`). Se abre del snapshot en mmap, como los vectores: no se arma nada al abrir.
+    Con delta (ver deltaLog), los documentos reemplazados desde el snapshot se ignoran en el base y
+    sus firmas nuevas están en `delta`, un DedupIndex chico en memoria; las filas [0, base_size)
+    son del base y las siguientes del delta.
+    """
+
+    def __init__(self, ids: np.ndarray, sigs: np.ndarray, keys: np.ndarray, rows: np.ndarray,
+                 delta: Optional["DedupIndex"] = None, removed_docs: Optional[np.ndarray] = None,
+                 generation: int = 0):
+        self.ids = ids
+        self.sigs = sigs
+        self.keys = keys
+        self.rows = rows
+        self.delta = delta if delta is not None and delta.size else None
+        self.removed_docs = removed_docs if removed_docs is not None else np.empty(0, dtype=np.int64)
+        self.generation = generation
+
+    @classmethod
+    def from_arrays(cls, ids: np.ndarray, sigs: np.ndarray) -> "DedupIndex":
+        keys = band_keys(sigs).ravel()
+        order = np.argsort(keys, kind="stable")
+        return cls(np.asarray(ids, dtype=np.int64), np.asarray(sigs, dtype=np.uint32), keys[order], order // BANDS)
+
+    @property
+    def base_size(self) -> int:
+        return int(self.ids.shape[0])
+
+    @property
+    def size(self) -> int:
+        """Firmas vivas (recorre los ids del base si hay documentos reemplazados)."""
+        return self.base_size - int(self._hidden(self.ids).sum()) + (self.delta.size if self.delta is not None else 0)
+
+    def document_rows(self, doc_ids: np.ndarray) -> int:
+        """Cantidad de firmas vivas de `doc_ids`."""
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        base = np.isin(vectorStore.vector_doc_ids(self.ids), doc_ids) & ~self._hidden(self.ids)
+        return int(base.sum()) + (self.delta.document_rows(doc_ids) if self.delta is not None else 0)
+
+    def candidates(self, keys: np.ndarray) -> List[np.ndarray]:
+        """Filas candidatas para cada fila de `keys` (m, BANDS)."""
+        lo = np.searchsorted(self.keys, keys.ravel(), "left").reshape(keys.shape)
+        hi = np.searchsorted(self.keys, keys.ravel(), "right").reshape(keys.shape)
+        out = []
+        for starts, ends in zip(lo, hi):
+            parts = [self.rows[a:min(b, a + DEDUP_MAX_CANDIDATES)] for a, b in zip(starts, ends) if b > a]
+            found = np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+            out.append(found[~self._hidden(self.ids[found])] if self.removed_docs.size else found)
+        if self.delta is not None:
+            out = [np.concatenate([base, self.base_size + extra]) for base, extra in zip(out, self.delta.candidates(keys))]
+        return out
+
+    def ids_at(self, rows: np.ndarray) -> np.ndarray:
+        if self.delta is None:
+            return self.ids[rows]
+        base = rows < self.base_size
+        return np.where(base, self.ids[np.where(base, rows, 0)] if self.base_size else -1,
+                        self.delta.ids[np.where(base, 0, rows - self.base_size)])
+
+    def sigs_at(self, rows: np.ndarray) -> np.ndarray:
+        if self.delta is None:
+            return self.sigs[rows]
+        out = np.empty((len(rows), NUM_PERM), dtype=np.uint32)
+        base = rows < self.base_size
+        out[base] = self.sigs[rows[base]]
+        out[~base] = self.delta.sigs[rows[~base] - self.base_size]
+        return out
+
+    def _hidden(self, ids: np.ndarray) -> np.ndarray:
+        if not self.removed_docs.size:
+            return np.zeros(len(ids), dtype=bool)
+        return np.isin(vectorStore.vector_doc_ids(ids), self.removed_docs)
+
+
+def delta_path(client_id: int) -> str:
+    return dedup_path(client_id) + ".delta"
+
+def _open(client_id: int) -> Optional[DedupIndex]:
+    try:
+        snapshot = open_snapshot(dedup_path(client_id))
+    except FileNotFoundError:
+        return None
+    generation = int(snapshot.meta.get("generation", 0))
+    if {key: snapshot.meta.get(key) for key in _meta()} != _meta():
+        return None
+    delta = deltaLog.read(delta_path(client_id), generation, np.uint32)
+    layer = removed = None
+    if delta is not None:
+        ids, sigs, removed = delta.resolve(vectorStore.vector_doc_ids)
+        if sigs is not None:
+            layer = DedupIndex.from_arrays(ids, sigs)
+    return DedupIndex(snapshot["ids"], snapshot["sigs"], snapshot["keys"], snapshot["rows"], layer, removed, generation)
+
+def open_index(client_id: int) -> Optional[DedupIndex]:
+    """
+    Índice del cliente; None si no existe o se escribió con otros parámetros de firma. Sin lock,
+    como `vectorStore.open_vectors`: si una compactación cambia el base mientras se abre, se reintenta.
+    """
+    for _ in range(3):
+        try:
+            return _open(client_id)
+        except deltaLog.DeltaAhead:
+            continue
+    with vectorStore.client_lock(client_id):
+        return _open(client_id)
+
+class Deduplicator:
+    """
+    Deduplicación de una ingestión. `match` recibe los chunks en orden y devuelve por chunk el
+    vector_id del canónico del que es casi duplicado (-1 si es canónico). Compara primero contra el
+    índice del cliente, sin los documentos que se están reemplazando y solo con chunks que siguen
+    en los vectores, y después contra los canónicos anteriores de la misma ingestión (boilerplate
+    repetido dentro de un documento o del lote). `canonical()` entrega lo que hay que agregar al
+    índice al terminar.
+    """
+
+    def __init__(self, client_id: int, replaced_doc_ids: Iterable[int], enabled: bool = DEDUP_ENABLED):
+        self.enabled = enabled
+        self.index = open_index(client_id) if enabled else None
+        self.flat = vectorStore.open_vectors(client_id) if self.index is not None and self._indexed() else None
+        self._replaced = np.asarray(list(replaced_doc_ids), dtype=np.int64)
+        self._buckets: Dict[int, List[int]] = {}
+        self._ids: List[int] = []
+        self._sigs: List[np.ndarray] = []
+        self.chunks = 0
+        self.duplicates = 0
+
+    def match(self, ids: np.ndarray, texts: Sequence[str]) -> np.ndarray:
+        ids = np.asarray(ids, dtype=np.int64)
+        duplicate_of = np.full(len(ids), -1, dtype=np.int64)
+        self.chunks += len(ids)
+        if not self.enabled or not len(ids):
+            return duplicate_of
+        sigs, eligible = signatures(texts)
+        keys = band_keys(sigs)
+        stored = self._match_stored(sigs, keys, eligible)
+        for i in np.flatnonzero(eligible):
+            target = stored[i] if stored[i] >= 0 else self._match_run(sigs[i], keys[i])
+            if target >= 0:
+                duplicate_of[i] = target
+                continue
+            position = len(self._ids)
+            self._ids.append(int(ids[i]))
+            self._sigs.append(sigs[i])
+            for key in keys[i].tolist():
+                self._buckets.setdefault(key, []).append(position)
+        self.duplicates += int((duplicate_of >= 0).sum())
+        return duplicate_of
+
+    def canonical(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(vector_ids, firmas) de los chunks canónicos deduplicables vistos en esta ingestión."""
+        if not self._ids:
+            return np.empty(0, dtype=np.int64), np.empty((0, NUM_PERM), dtype=np.uint32)
+        return np.asarray(self._ids, dtype=np.int64), np.stack(self._sigs)
+
+    def _indexed(self) -> bool:
+        return bool(self.index.base_size or self.index.delta is not None)
+
+    def _match_stored(self, sigs: np.ndarray, keys: np.ndarray, eligible: np.ndarray) -> np.ndarray:
+        out = np.full(len(sigs), -1, dtype=np.int64)
+        if self.flat is None or not eligible.any():
+            return out
+        rows = np.flatnonzero(eligible)
+        for i, candidates in zip(rows, self.index.candidates(keys[rows])):
+            if not len(candidates):
+                continue
+            similarity = (self.index.sigs_at(candidates) == sigs[i]).mean(axis=1)
+            ok = similarity >= DEDUP_THRESHOLD
+            if not ok.any():
+                continue
+            ids = self.index.ids_at(candidates)
+            ok &= ~np.isin(vectorStore.vector_doc_ids(ids), self._replaced)
+            ok &= self.flat.locate(ids) >= 0  # el índice pudo quedar atrás de los vectores
+            if ok.any():
+                out[i] = ids[np.argmax(np.where(ok, similarity, -1.0))]
+        return out
+
+    def _match_run(self, sig: np.ndarray, keys: np.ndarray) -> int:
+        positions = {p for key in keys.tolist() for p in self._buckets.get(key, ())[:DEDUP_MAX_CANDIDATES]}
+        if not positions:
+            return -1
+        positions = sorted(positions)
+        similarity = (np.stack([self._sigs[p] for p in positions]) == sig).mean(axis=1)
+        best = int(np.argmax(similarity))
+        return self._ids[positions[best]] if similarity[best] >= DEDUP_THRESHOLD else -1
+
+
+_BLOCK_ROWS = 65_536
+
+
+def _publish(client_id: int, parts, generation: int = 0, commit: bool = True):
+    """
+    Snapshot nuevo con [(ids, firmas, máscara o None)]; las claves se recalculan por bloques. La
+    compactación pide `commit=False` y publica después con el lock (devuelve el writer sin confirmar).
+    """
+    ids = np.concatenate([np.asarray(p_ids, dtype=np.int64) for p_ids, _, _ in parts])
+    keys = np.empty((len(ids), BANDS), dtype=np.uint64)
+    layout = {
+        "ids": (np.int64, ids.shape),
+        "sigs": (np.uint32, (len(ids), NUM_PERM)),
+        "keys": (np.uint64, (len(ids) * BANDS,)),
+        "rows": (np.int64, (len(ids) * BANDS,)),
+    }
+    writer = SnapshotWriter(dedup_path(client_id), layout, dict(_meta(), generation=generation))
+    try:
+        writer.write("ids", ids)
+        at = 0
+        for _, sigs, keep in parts:
+            for i in range(0, len(sigs), _BLOCK_ROWS):
+                block = np.asarray(sigs[i:i + _BLOCK_ROWS], dtype=np.uint32)
+                if keep is not None:
+                    block = block[keep[i:i + _BLOCK_ROWS]]
+                writer.write("sigs", block)
+                keys[at:at + len(block)] = band_keys(block)
+                at += len(block)
+        flat_keys = keys.ravel()
+        order = np.argsort(flat_keys, kind="stable")
+        writer.write("keys", flat_keys[order])
+        writer.write("rows", order // BANDS)
+    except BaseException:
+        writer.abort()
+        raise
+    if not commit:
+        return writer
+    writer.commit()
+    return len(ids)
+
+def update_documents(client_id: int, doc_ids: Iterable[int], ids: np.ndarray, sigs: np.ndarray) -> int:
+    """
+    Reemplaza las firmas de `doc_ids` por las de sus chunks canónicos nuevos (`Deduplicator.canonical`).
+    Se llama después de publicar los vectores. Con un snapshot publicado agrega un frame al delta
+    (sin reordenar las claves de todo el cliente); la fusión la hace `compact` en segundo plano.
+    Devuelve el total de firmas del cliente.
+    """
+    doc_ids = np.asarray(list(doc_ids), dtype=np.int64)
+    ids = np.asarray(ids, dtype=np.int64)
+    sigs = np.ascontiguousarray(sigs, dtype=np.uint32).reshape(-1, NUM_PERM)
+    with vectorStore.client_lock(client_id):
+        current = _open(client_id)
+        if current is None:
+            if not len(ids) and not os.path.exists(dedup_path(client_id)):
+                return 0
+            # primera escritura (o firmas con otros parámetros): el snapshot es solo lo nuevo
+            if os.path.exists(delta_path(client_id)):
+                os.remove(delta_path(client_id))
+            return _publish(client_id, [(ids, sigs, None)])
+        hidden = current.document_rows(doc_ids)
+        if not hidden and not len(ids):
+            return current.size
+        delta = deltaLog.append(delta_path(client_id), current.generation, doc_ids, ids, sigs, hidden)
+        total = current.size - hidden + len(ids)
+    if vectorStore.needs_compaction(current.base_size, delta):
+        vectorStore.compactor.schedule(client_id, compact)
+    return total
+
+def remove_documents(client_id: int, doc_ids: Iterable[int]) -> int:
+    return update_documents(client_id, doc_ids, np.empty(0, dtype=np.int64), np.empty((0, NUM_PERM), dtype=np.uint32))
+
+def compact(client_id: int) -> Optional[int]:
+    """Fusiona base + delta de firmas en un snapshot nuevo; mismo protocolo que `vectorStore.compact`."""
+    lock = FileLock(dedup_path(client_id) + ".compact.lock")
+    try:
+        lock.acquire(timeout=0)
+    except Timeout:
+        return None
+    try:
+        with vectorStore.client_lock(client_id):
+            current = _open(client_id)
+            delta = deltaLog.read(delta_path(client_id), current.generation, np.uint32) if current is not None else None
+        if delta is None or not delta.frames:
+            return None
+        keep = ~current._hidden(current.ids)
+        parts = [(current.ids[keep], current.sigs, keep)]
+        if current.delta is not None:
+            parts.append((current.delta.ids, current.delta.sigs, None))
+        writer = _publish(client_id, parts, current.generation + 1, commit=False)
+        with vectorStore.client_lock(client_id):
+            if not deltaLog.rebase(delta_path(client_id), current.generation, current.generation + 1, delta.end, np.uint32):
+                writer.abort()
+                return None
+            writer.commit()
+        return sum(len(p[0]) for p in parts)
+    finally:
+        lock.release()
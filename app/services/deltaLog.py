@@ -0,0 +1,200 @@
+# app/services/deltaLog.py
+import os
+import struct
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+# Segmento delta append-only junto a un snapshot base (ver snapshotStore). Cada escritura agrega un
+# frame "los documentos R se reemplazan por estas filas" en vez de reescribir el snapshot entero;
+# una compactación en segundo plano fusiona base + delta en un snapshot nuevo.
+#
+# Formato: MAGIC | generación del base | filas agregadas | filas del base ocultadas (estimado),
+# seguido de frames: (nº documentos borrados, nº filas, ancho, filas ocultadas) | docs | ids | filas.
+# El delta solo vale para el snapshot con su misma generación: la compactación publica primero un
+# delta con la generación nueva (los frames que llegaron mientras tanto) y después el base.
+MAGIC = b"RAGDLT01"
+_HEADER = struct.Struct("<8sQQQ")
+_FRAME = struct.Struct("<QQQQ")
+
+
+class DeltaAhead(Exception):
+    """El delta es de una generación posterior al snapshot abierto: hay que reabrir el base."""
+
+
+@dataclass
+class Frame:
+    removed: np.ndarray  # Documents.id cuyas filas anteriores (base y frames previos) se descartan
+    ids: np.ndarray
+    rows: np.ndarray
+
+
+@dataclass
+class Delta:
+    generation: int
+    frames: List[Frame]
+    end: int    # bytes con frames completos (un frame a medio escribir queda fuera)
+    rows: int   # contadores del encabezado: deciden cuándo compactar
+    hidden: int
+
+    def resolve(self, doc_ids_of):
+        """
+        (ids, filas o None, documentos borrados) del delta ya aplicado: filas vivas en orden de
+        escritura y los documentos cuyas filas del base quedan ocultas. `doc_ids_of` mapea ids a
+        Documents.id.
+        """
+        removed: set = set()
+        ids: List[np.ndarray] = []
+        rows: List[np.ndarray] = []
+        for frame in reversed(self.frames):
+            keep = ~np.isin(doc_ids_of(frame.ids), np.fromiter(removed, dtype=np.int64, count=len(removed)))
+            ids.append(frame.ids[keep])
+            rows.append(frame.rows[keep])
+            removed.update(frame.removed.tolist())
+        ids.reverse()
+        rows.reverse()
+        rows = [r for r in rows if len(r)]
+        return (
+            np.concatenate(ids) if ids else np.empty(0, dtype=np.int64),
+            np.concatenate(rows) if rows else None,
+            np.fromiter(sorted(removed), dtype=np.int64, count=len(removed)),
+        )
+
+
+def _read_header(f) -> Optional[tuple]:
+    raw = f.read(_HEADER.size)
+    if len(raw) < _HEADER.size:
+        return None
+    magic, generation, rows, hidden = _HEADER.unpack(raw)
+    return (generation, rows, hidden) if magic == MAGIC else None
+
+
+def _parse(data: memoryview, offset: int, dtype: np.dtype) -> tuple:
+    """Frames completos desde `offset`; devuelve (frames, fin del último frame completo)."""
+    frames: List[Frame] = []
+    while offset + _FRAME.size <= len(data):
+        n_removed, n, width, _ = _FRAME.unpack_from(data, offset)
+        size = _frame_size(n_removed, n, width, dtype.itemsize)
+        if offset + size > len(data):
+            break
+        at = offset + _FRAME.size
+        removed = np.frombuffer(data, dtype=np.int64, count=n_removed, offset=at).copy()
+        at += n_removed * 8
+        ids = np.frombuffer(data, dtype=np.int64, count=n, offset=at).copy()
+        at += n * 8
+        rows = np.frombuffer(data, dtype=dtype, count=n * width, offset=at).reshape(n, width).copy()
+        frames.append(Frame(removed, ids, rows))
+        offset += size
+    return frames, offset
+
+
+def _frame_size(n_removed: int, n: int, width: int, itemsize: int) -> int:
+    return _FRAME.size + (n_removed + n) * 8 + n * width * itemsize
+
+def _complete_end(f, itemsize: int) -> int:
+    """Fin del último frame completo, leyendo solo los encabezados de frame."""
+    size = os.fstat(f.fileno()).st_size
+    offset = _HEADER.size
+    while offset + _FRAME.size <= size:
+        f.seek(offset)
+        n_removed, n, width, _ = _FRAME.unpack(f.read(_FRAME.size))
+        frame = _frame_size(n_removed, n, width, itemsize)
+        if offset + frame > size:
+            break
+        offset += frame
+    return offset
+
+
+def read(path: str, generation: int, dtype) -> Optional[Delta]:
+    """
+    Delta del snapshot de generación `generation`; None si no hay (o es de un base anterior,
+    ya fusionado). Lanza `DeltaAhead` si es de un base más nuevo que el que tiene quien lee.
+    """
+    dtype = np.dtype(dtype)
+    try:
+        with open(path, "rb") as f:
+            header = _read_header(f)
+            if header is None:
+                return None
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    delta_generation, rows, hidden = header
+    if delta_generation < generation:
+        return None
+    if delta_generation > generation:
+        raise DeltaAhead(path)
+    frames, end = _parse(memoryview(data), 0, dtype)
+    return Delta(generation, frames, _HEADER.size + end, rows, hidden)
+
+
+def append(path: str, generation: int, removed: np.ndarray, ids: np.ndarray, rows: np.ndarray, hidden: int) -> Delta:
+    """
+    Agrega un frame (con el lock del cliente tomado). `hidden`: filas del base que el frame oculta,
+    para el contador que dispara la compactación. Devuelve los contadores actualizados (sin frames).
+    """
+    removed = np.ascontiguousarray(removed, dtype=np.int64)
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    rows = np.ascontiguousarray(rows)
+    width = int(rows.shape[1]) if rows.ndim == 2 else 0
+    mode = "r+b" if os.path.exists(path) else "w+b"
+    with open(path, mode) as f:
+        header = _read_header(f)
+        if header is None or header[0] != generation:
+            # delta de un base anterior (o ilegible): ya no aplica, se empieza de cero
+            f.seek(0)
+            f.truncate()
+            header = (generation, 0, 0)
+            f.write(_HEADER.pack(MAGIC, *header))
+        # un frame a medio escribir (proceso caído) se descarta: si no, el siguiente quedaría detrás
+        # de bytes basura y ningún lector lo vería
+        end = _complete_end(f, rows.dtype.itemsize)
+        if end != os.fstat(f.fileno()).st_size:
+            f.truncate(end)
+        f.seek(end)
+        # el frame primero y los contadores después: un lector nunca ve un frame a medias como completo
+        f.write(_FRAME.pack(len(removed), len(ids), width, int(hidden)))
+        f.write(memoryview(removed).cast("B"))
+        f.write(memoryview(ids).cast("B"))
+        if rows.nbytes:
+            f.write(memoryview(rows).cast("B"))
+        end = f.tell()
+        counters = (generation, header[1] + len(ids), header[2] + int(hidden))
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, *counters))
+    return Delta(generation, [], end, counters[1], counters[2])
+
+
+def rebase(path: str, generation: int, new_generation: int, offset: int, dtype) -> bool:
+    """
+    Tras fusionar el delta hasta `offset` en el base `new_generation`, deja en el delta solo los
+    frames posteriores, bajo la generación nueva. Con el lock del cliente tomado y antes de
+    publicar el base. False si el delta ya no es el que se fusionó.
+    """
+    dtype = np.dtype(dtype)
+    try:
+        with open(path, "rb") as f:
+            header = _read_header(f)
+            data = f.read() if header is not None else b""
+    except FileNotFoundError:
+        header, data = None, b""
+    if header is not None and header[0] != generation:
+        return False
+    tail = memoryview(data)[max(0, offset - _HEADER.size):] if header is not None else memoryview(b"")
+    rows = hidden = 0
+    at = 0
+    while at + _FRAME.size <= len(tail):
+        n_removed, n, width, frame_hidden = _FRAME.unpack_from(tail, at)
+        size = _frame_size(n_removed, n, width, dtype.itemsize)
+        if at + size > len(tail):
+            break
+        rows += n
+        hidden += frame_hidden
+        at += size
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, new_generation, rows, hidden))
+        f.write(tail[:at])
+    os.replace(tmp, path)
+    return True
@@ -0,0 +1,71 @@
+# app/services/documentChanges.py
+import os
+from typing import Dict, Iterable, Set, Tuple
+
+from filelock import FileLock
+
+from app.services.vectorStore import VECTOR_STORE_DIR
+from app.util.env import env_int
+
+# Registro append-only de documentos modificados por cliente, compartido entre workers.
+# Al superar el tamaño máximo se trunca; los lectores lo detectan y descartan todo su estado.
+DOCUMENT_CHANGES_MAX_BYTES = env_int("DOCUMENT_CHANGES_MAX_BYTES", 1024 * 1024)
+
+
+def _path(client_id: int) -> str:
+    return os.path.join(VECTOR_STORE_DIR, f"client_{int(client_id)}.changes")
+
+def publish(client_id: int, doc_ids: Iterable[int]) -> None:
+    """Anuncia a todos los workers que cambiaron los chunks de `doc_ids`."""
+    line = " ".join(str(int(d)) for d in doc_ids)
+    if not line:
+        return
+    os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
+    path = _path(client_id)
+    with FileLock(path + ".lock"):
+        mode = "a"
+        try:
+            if os.path.getsize(path) > DOCUMENT_CHANGES_MAX_BYTES:
+                mode = "w"
+        except FileNotFoundError:
+            pass
+        with open(path, mode, encoding="ascii") as f:
+            f.write(line + "\n")
+
+
+class ChangeFeed:
+    """Lector incremental del registro: cada consumidor guarda su propio offset por cliente."""
+
+    def __init__(self):
+        self._offsets: Dict[int, int] = {}
+
+    def poll(self, client_id: int) -> Tuple[bool, Set[int]]:
+        """
+        Devuelve (reset, doc_ids) con los cambios desde la última llamada.
+        `reset` es True si el registro se truncó y el consumidor debe descartar todo.
+        """
+        path = _path(client_id)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return False, set()
+        offset = self._offsets.get(client_id)
+        if offset is None:
+            # primer vistazo: lo anterior a este proceso no nos afecta
+            self._offsets[client_id] = size
+            return False, set()
+        if size == offset:
+            return False, set()
+        if size < offset:
+            self._offsets[client_id] = size
+            return True, set()
+        with open(path, "r", encoding="ascii") as f:
+            f.seek(offset)
+            data = f.read(size - offset)
+        # solo consumimos líneas completas
+        end = data.rfind("\n") + 1
+        self._offsets[client_id] = offset + end
+        return False, {int(tok) for tok in data[:end].split()}
+
+    def forget(self, client_id: int) -> None:
+        self._offsets.pop(client_id, None)
@@ -0,0 +1,132 @@
+from typing import Dict, List, Optional, Tuple
+import anyio
+from sqlalchemy import select, func
+from sqlalchemy.exc import SQLAlchemyError
+from app.models.documents import Documents
+from app.models.documentChunks import DocumentChunks
+from app.schemas.documentsDto import CreateDocumentsDto, UpdateDocumentsDto
+from app.services.jobQueue import job_queue
+from app.services import uploadStore, vectorStore
+from app.shared.pagination import keyset_page
+from sqlalchemy.ext.asyncio import AsyncSession
+
+class DocumentService:
+    def __init__(self, db_session: AsyncSession):
+        self.db = db_session
+
+    async def get_document(self, document_id: int) -> Optional[Documents]:
+        result = await self.db.execute(select(Documents).where(Documents.id == document_id))
+        return result.scalar_one_or_none()
+
+    async def get_documents(
+        self, client_id: Optional[int] = None, cursor: Optional[str] = None, limit: int = 100, swt: Optional[bool] = None,
+    ) -> Tuple[List[Documents], Optional[str]]:
+        stmt = select(Documents)
+        if client_id is not None:
+            stmt = stmt.where(Documents.idClient == client_id)
+        if swt is not None:
+            stmt = stmt.where(Documents.swt == swt)
+        return await keyset_page(self.db, stmt, Documents.id, cursor, limit)
+
+    async def get_document_dedup(self, document_id: int) -> Optional[Dict]:
+        """Chunks del documento enlazados como casi duplicados en la última ingestión (ver dedupIndex)."""
+        if await self.get_document(document_id) is None:
+            return None
+        result = await self.db.execute(
+            select(DocumentChunks.duplicate_of).where(DocumentChunks.idDocument == document_id)
+        )
+        targets = result.scalars().all()
+        duplicates = [t for t in targets if t is not None]
+        return {
+            "document_id": document_id,
+            "chunks": len(targets),
+            "duplicate_chunks": len(duplicates),
+            "dedup_ratio": round(len(duplicates) / len(targets), 4) if targets else 0.0,
+            "duplicate_of_documents": sorted({vectorStore.split_vector_id(t)[0] for t in duplicates}),
+        }
+
+    async def get_client_dedup(self, client_id: int, top: int = 10) -> Dict:
+        """Totales de deduplicación del cliente y los `top` documentos con mayor proporción de duplicados."""
+        result = await self.db.execute(
+            select(DocumentChunks.idDocument, func.count(DocumentChunks.id), func.count(DocumentChunks.duplicate_of))
+            .where(DocumentChunks.idClient == client_id)
+            .group_by(DocumentChunks.idDocument)
+        )
+        per_document = [
+            {"document_id": doc_id, "chunks": chunks, "duplicate_chunks": duplicates,
+             "dedup_ratio": round(duplicates / chunks, 4) if chunks else 0.0}
+            for doc_id, chunks, duplicates in result.all()
+        ]
+        chunks = sum(d["chunks"] for d in per_document)
+        duplicates = sum(d["duplicate_chunks"] for d in per_document)
+        ranked = sorted((d for d in per_document if d["duplicate_chunks"]), key=lambda d: (-d["dedup_ratio"], d["document_id"]))
+        return {
+            "client_id": client_id,
+            "documents": len(per_document),
+            "chunks": chunks,
+            "duplicate_chunks": duplicates,
+            "dedup_ratio": round(duplicates / chunks, 4) if chunks else 0.0,
+            "top_documents": ranked[:top],
+        }
+
+    async def create_document(self, document_in: CreateDocumentsDto, index: bool = True,
+                              file_path: Optional[str] = None) -> Optional[Documents]:
+        """
+        `index=False`: quien llama encola la ingestión por su cuenta (p. ej. un job de upload).
+        `file_path` solo lo pasa el controlador de subidas: no es un campo del DTO público.
+        """
+        document = Documents(**document_in.dict(exclude={"createDate"}), file_path=file_path)
+        self.db.add(document)
+        try:
+            if index:
+                await self.db.flush()  # id para el job, que entra en la misma transacción
+                await job_queue.add_document_changes(self.db, document.idClient, [document.id])
+            await self.db.commit()
+            await self.db.refresh(document)
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            print(f"Error creating document: {e}")
+            return None
+        if index:
+            job_queue.notify()
+        return document
+
+    async def update_document(self, document_id: int, document_in: UpdateDocumentsDto) -> Optional[Documents]:
+        document = await self.get_document(document_id)
+        if not document:
+            return None
+        changes = document_in.dict(exclude_unset=True)
+        for field, value in changes.items():
+            setattr(document, field, value)
+        # solo el contenido y el flag lógico afectan al índice
+        reindex = "content" in changes or "swt" in changes
+        try:
+            if reindex:
+                await job_queue.add_document_changes(self.db, document.idClient, [document.id])
+            await self.db.commit()
+            await self.db.refresh(document)
+        except SQLAlchemyError:
+            await self.db.rollback()
+            return None
+        if reindex:
+            job_queue.notify()
+        return document
+
+    async def delete_document(self, document_id: int) -> bool:
+        document = await self.get_document(document_id)
+        if not document:
+            return False
+        client_id = document.idClient
+        file_path = document.file_path
+        try:
+            await self.db.delete(document)
+            # el job encuentra el documento borrado y lo quita de los índices
+            await job_queue.add_document_changes(self.db, client_id, [document_id])
+            await self.db.commit()
+        except SQLAlchemyError:
+            await self.db.rollback()
+            return False
+        job_queue.notify()
+        if uploadStore.is_upload(file_path, client_id):
+            await anyio.to_thread.run_sync(uploadStore.delete_file, file_path)
+        return True
@@ -0,0 +1,212 @@
+# app/services/embeddingCache.py
+import hashlib
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import anyio
+import numpy as np
+from filelock import FileLock
+
+from app.services.embeddingService import EMBEDDING_MODEL, embed_documents
+from app.util.chunking import normalize_text
+from app.util.env import env, env_bool, env_int
+
+EMBED_CACHE_ENABLED = env_bool("EMBED_CACHE_ENABLED", True)
+EMBED_CACHE_DIR = env("EMBED_CACHE_DIR", "data/embed_cache")
+EMBED_CACHE_MAX_ENTRIES = env_int("EMBED_CACHE_MAX_ENTRIES", 500_000)
+
+_INITIAL_CAPACITY = 4096
+_EMPTY = b""
+
+
+class EmbeddingCache:
+    """
+    Caché de embeddings direccionada por contenido: clave = hash(modelo + texto normalizado).
+    - vectors.f16: matriz float16 (capacidad x dim) abierta con np.memmap.
+    - index.npz: clave y último uso de cada fila; se reemplaza atómicamente en cada escritura.
+    Al llenarse (`max_entries`) desaloja ~10% de las filas menos usadas.
+    Lecturas y escrituras toman el lock de archivo: una escritura de otro proceso puede reutilizar
+    una fila desalojada antes de publicar su index.npz, y leerla en ese intervalo devolvería el
+    vector de otro texto.
+    """
+
+    def __init__(self, directory: str, model_name: str, max_entries: int):
+        slug = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:12]
+        self.dir = os.path.join(directory, slug)
+        self.model_name = model_name
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._dim: Optional[int] = None
+        self._keys = np.zeros(0, dtype="S32")
+        self._last_used = np.zeros(0, dtype=np.int64)
+        self._slots: Dict[bytes, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._index_mtime: Optional[int] = None
+        self._tick = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # --- rutas ---
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.dir, "vectors.f16")
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.dir, "index.npz")
+
+    def key(self, text: str) -> bytes:
+        payload = f"{self.model_name}\x00{normalize_text(text)}".encode("utf-8")
+        return hashlib.blake2b(payload, digest_size=16).hexdigest().encode("ascii")
+
+    # --- API ---
+
+    def get_many(self, keys: Sequence[bytes]) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        """Devuelve (vectores float32 de los aciertos, máscara de aciertos) en el orden de `keys`."""
+        os.makedirs(self.dir, exist_ok=True)
+        # mismo orden que put_many (archivo, luego hilo): índice y filas se leen sin escritores a la vez
+        with FileLock(os.path.join(self.dir, ".lock")), self._lock:
+            self._refresh()
+            slots = np.fromiter((self._slots.get(k, -1) for k in keys), dtype=np.int64, count=len(keys))
+            hit = slots >= 0
+            n_hit = int(hit.sum())
+            self.hits += n_hit
+            self.misses += len(keys) - n_hit
+            if n_hit == 0:
+                return None, hit
+            self._tick += 1
+            self._last_used[slots[hit]] = self._tick
+            return np.asarray(self._vectors[slots[hit]], dtype=np.float32), hit
+
+    def put_many(self, keys: Sequence[bytes], vectors: np.ndarray) -> None:
+        if len(keys) == 0:
+            return
+        os.makedirs(self.dir, exist_ok=True)
+        with FileLock(os.path.join(self.dir, ".lock")), self._lock:
+            self._refresh()
+            if self._dim is None:
+                self._dim = int(vectors.shape[1])
+            new = [(k, i) for i, k in enumerate(keys) if k not in self._slots]
+            if not new:
+                return
+            new = new[: self.max_entries]
+            slots = self._allocate(len(new), protect={k for k, _ in new})
+            self._tick += 1
+            for (k, _), slot in zip(new, slots):
+                self._keys[slot] = k
+                self._slots[k] = int(slot)
+                self._last_used[slot] = self._tick
+            rows = np.fromiter((i for _, i in new), dtype=np.int64, count=len(new))
+            self._vectors[slots] = vectors[rows].astype(np.float16)
+            self._vectors.flush()
+            self._save_index()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._slots),
+                "capacity": int(self._keys.shape[0]),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    # --- internos (con self._lock tomado) ---
+
+    def _refresh(self) -> None:
+        """Recarga el índice si otro proceso lo reescribió."""
+        try:
+            mtime = os.stat(self._index_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._index_mtime:
+            return
+        with np.load(self._index_path) as data:
+            self._keys = data["keys"].copy()
+            self._last_used = data["last_used"].copy()
+            self._dim = int(data["dim"])
+        self._tick = max(self._tick, int(self._last_used.max(initial=0)))
+        self._slots = {k: i for i, k in enumerate(self._keys.tolist()) if k != _EMPTY}
+        self._open_vectors(self._keys.shape[0])
+        self._index_mtime = mtime
+
+    def _open_vectors(self, capacity: int) -> None:
+        needed = capacity * self._dim * 2
+        mode = "r+b" if os.path.exists(self._vectors_path) else "w+b"
+        with open(self._vectors_path, mode) as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < needed:
+                f.truncate(needed)  # archivo disperso: no ocupa disco hasta escribirse
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float16, mode="r+", shape=(capacity, self._dim))
+
+    def _allocate(self, n: int, protect: set) -> np.ndarray:
+        free = np.flatnonzero(self._keys == _EMPTY)
+        capacity = self._keys.shape[0]
+        if free.size < n and capacity < self.max_entries:
+            new_capacity = min(self.max_entries, max(capacity * 2, capacity + n - free.size, _INITIAL_CAPACITY))
+            self._keys = np.concatenate([self._keys, np.zeros(new_capacity - capacity, dtype="S32")])
+            self._last_used = np.concatenate([self._last_used, np.zeros(new_capacity - capacity, dtype=np.int64)])
+            self._open_vectors(new_capacity)
+            free = np.flatnonzero(self._keys == _EMPTY)
+        if free.size < n:
+            free = np.concatenate([free, self._evict(max(n - free.size, self.max_entries // 10), protect)])
+        return free[:n]
+
+    def _evict(self, n: int, protect: set) -> np.ndarray:
+        used = np.flatnonzero(self._keys != _EMPTY)
+        used = used[[self._keys[i] not in protect for i in used]] if protect else used
+        n = min(n, used.size)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        victims = used[np.argpartition(self._last_used[used], n - 1)[:n]]
+        for slot in victims:
+            self._slots.pop(self._keys[slot], None)
+            self._keys[slot] = _EMPTY
+        self.evictions += n
+        return victims
+
+    def _save_index(self) -> None:
+        tmp = f"{self._index_path}.tmp.{os.getpid()}"
+        with open(tmp, "wb") as f:
+            np.savez(f, keys=self._keys, last_used=self._last_used, dim=np.int64(self._dim))
+        os.replace(tmp, self._index_path)
+        self._index_mtime = os.stat(self._index_path).st_mtime_ns
+
+
+embedding_cache = EmbeddingCache(EMBED_CACHE_DIR, EMBEDDING_MODEL, EMBED_CACHE_MAX_ENTRIES)
+
+
+async def embed_cached(texts: List[str]) -> np.ndarray:
+    """
+    Igual que `embed_documents`, pero consulta primero la caché y solo embebe los textos
+    que faltan (deduplicados). Los nuevos vectores se guardan en la caché.
+    """
+    if not texts or not EMBED_CACHE_ENABLED:
+        return await embed_documents(texts)
+
+    keys = [embedding_cache.key(t) for t in texts]
+    cached, hit = await anyio.to_thread.run_sync(embedding_cache.get_many, keys)
+
+    first_by_key: Dict[bytes, int] = {}
+    for i in np.flatnonzero(~hit):
+        first_by_key.setdefault(keys[i], int(i))
+    miss_keys = list(first_by_key)
+    fresh = await embed_documents([texts[i] for i in first_by_key.values()])
+    if miss_keys:
+        await anyio.to_thread.run_sync(embedding_cache.put_many, miss_keys, fresh)
+
+    dim = cached.shape[1] if cached is not None else fresh.shape[1]
+    out = np.empty((len(texts), dim), dtype=np.float32)
+    if cached is not None:
+        out[hit] = cached
+    if miss_keys:
+        row_by_key = {k: r for r, k in enumerate(miss_keys)}
+        miss = np.flatnonzero(~hit)
+        out[miss] = fresh[[row_by_key[keys[i]] for i in miss]]
+    return out
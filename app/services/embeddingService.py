@@ -0,0 +1,118 @@
+# app/services/embeddingService.py
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from app.util.env import env, env_bool, env_float, env_int
+
+# --- Config ---
+EMBEDDING_MODEL = env("EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+# Modelo determinista sin torch para pruebas de carga (ver embeddingStub.py)
+EMBEDDING_STUB = env_bool("EMBEDDING_STUB", False)
+EMBEDDING_STUB_DIM = env_int("EMBEDDING_STUB_DIM", 384)
+EMBEDDING_STUB_LATENCY_MS = env_float("EMBEDDING_STUB_LATENCY_MS", 0.0)
+if EMBEDDING_STUB:
+    # otro nombre de modelo: la caché de embeddings no mezcla vectores del stub con los reales
+    EMBEDDING_MODEL = f"stub/hashing-{EMBEDDING_STUB_DIM}"
+# Inferencia en un único proceso servidor (ver modelServer.py): los workers no cargan el modelo
+# y le envían los textos por este socket Unix; vacío = modelo en cada proceso
+EMBEDDING_SERVER_SOCKET = env("EMBEDDING_SERVER_SOCKET")
+EMBED_BATCH_SIZE = env_int("EMBED_BATCH_SIZE", 256)          # textos por tarea enviada al pool
+EMBED_WORKERS = env_int("EMBED_WORKERS", os.cpu_count() or 1)  # procesos del pool de ingestión
+# hilos de torch por proceso: repartimos los cores entre los procesos para no sobre-suscribir la CPU
+EMBED_TORCH_THREADS = env_int("EMBED_TORCH_THREADS", max(1, (os.cpu_count() or 1) // max(1, EMBED_WORKERS)))
+
+_model = None
+_model_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_model():
+    """Carga perezosa del SentenceTransformer (una sola vez por proceso)."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None and EMBEDDING_STUB:
+                from app.services.embeddingStub import StubEmbeddingModel
+                _model = StubEmbeddingModel(EMBEDDING_STUB_DIM, EMBEDDING_STUB_LATENCY_MS)
+            elif _model is None:
+                from sentence_transformers import SentenceTransformer  # import pesado (torch)
+                _model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+    return _model
+
+def _server():
+    from app.services.modelServer import model_client
+    return model_client(EMBEDDING_SERVER_SOCKET)
+
+def embedding_dim() -> int:
+    if EMBEDDING_SERVER_SOCKET:
+        return int(_server().info()["dim"])
+    return int(get_model().get_sentence_embedding_dimension())
+
+def encode(texts: Sequence[str]) -> np.ndarray:
+    """Vectores float32 normalizados (producto interno = coseno), en el servidor de modelo si hay uno."""
+    if EMBEDDING_SERVER_SOCKET:
+        return _server().encode(texts)
+    return encode_local(texts)
+
+def encode_local(texts: Sequence[str]) -> np.ndarray:
+    """Embebe en el proceso actual."""
+    vectors = get_model().encode(
+        list(texts),
+        batch_size=64,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+# --- Pool de procesos para ingestión ---
+
+def _init_worker() -> None:
+    if not EMBEDDING_STUB:
+        import torch
+        torch.set_num_threads(EMBED_TORCH_THREADS)
+    get_model()
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: no heredamos el estado de torch/hilos del proceso de uvicorn
+                _pool = ProcessPoolExecutor(
+                    max_workers=max(1, EMBED_WORKERS),
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+    return _pool
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+async def embed_documents(texts: List[str], batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """
+    Embebe un corpus grande repartiendo lotes de `batch_size` textos entre los procesos del pool.
+    Devuelve una matriz (len(texts), dim) en el mismo orden de entrada.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    loop = asyncio.get_running_loop()
+    # con servidor de modelo no hay pool de procesos: los lotes viajan por el socket desde hilos
+    pool = None if EMBEDDING_SERVER_SOCKET else get_pool()
+    futures = [
+        loop.run_in_executor(pool, encode, texts[i:i + batch_size])
+        for i in range(0, len(texts), batch_size)
+    ]
+    parts = await asyncio.gather(*futures)
+    return np.vstack(parts)
@@ -0,0 +1,43 @@
+# app/services/embeddingStub.py
+import hashlib
+import re
+import time
+from functools import lru_cache
+from typing import Sequence
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class StubEmbeddingModel:
+    """
+    Sustituto determinista del SentenceTransformer para pruebas de carga sin torch ni descargas:
+    cada palabra se proyecta a un vector pseudoaleatorio fijo (semilla = hash de la palabra) y el
+    texto es la suma normalizada. Textos que comparten palabras quedan cerca, así que la búsqueda
+    densa devuelve resultados con sentido. Latencia simulada opcional por llamada a `encode`.
+    """
+
+    def __init__(self, dim: int = 384, latency_ms: float = 0.0):
+        self.dim = dim
+        self.latency = latency_ms / 1000.0
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    @lru_cache(maxsize=65536)
+    def _token_vector(self, token: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+        return np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+
+    def encode(self, texts: Sequence[str], normalize_embeddings: bool = True, **_) -> np.ndarray:
+        if self.latency:
+            time.sleep(self.latency)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in _TOKEN_RE.findall(text.lower()):
+                out[i] += self._token_vector(token)
+        if normalize_embeddings:
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            out /= np.where(norms == 0, 1.0, norms)
+        return out
@@ -0,0 +1,139 @@
+# app/services/exportService.py
+import json
+from datetime import date, datetime, timezone
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chatDetails import ChatDetails
+from app.models.chats import Chats
+from app.models.documents import Documents
+from app.models.users import Users
+from app.util.env import env_int
+
+try:  # opcional: ~5x más rápido que json y devuelve bytes directamente
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+EXPORT_YIELD_PER = env_int("EXPORT_YIELD_PER", 2000)                  # filas por fetch del cursor
+EXPORT_DOCUMENT_YIELD_PER = env_int("EXPORT_DOCUMENT_YIELD_PER", 100)  # documentos: `content` puede ser grande
+EXPORT_FLUSH_BYTES = env_int("EXPORT_FLUSH_BYTES", 256 * 1024)        # tamaño de cada chunk HTTP
+
+USERS = "users"
+DOCUMENTS = "documents"
+CHATS = "chats"
+DATASETS = (USERS, DOCUMENTS, CHATS)
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
+
+def _json_line(record: Dict) -> bytes:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8") + b"\n"
+
+def _orjson_line(record: Dict) -> bytes:
+    return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS)
+
+dumps_line: Callable[[Dict], bytes] = _orjson_line if orjson is not None else _json_line
+
+
+class ExportService:
+    """
+    Volcado NDJSON de un cliente (una línea JSON por registro) en streaming: cada conjunto se lee
+    con un cursor del lado del servidor (`AsyncSession.stream` + `yield_per`), así que la memoria
+    depende del tamaño de lote y no del total de filas. Se seleccionan columnas (sin entidades ORM,
+    que pasarían por el identity map) y los chats salen con sus `details` agrupados a partir de un
+    único JOIN ordenado. La primera línea describe el export y la última trae los conteos.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.counts: Dict[str, int] = {}
+
+    async def export_client(self, client_id: int, datasets: Iterable[str] = DATASETS) -> AsyncIterator[bytes]:
+        datasets = [d for d in DATASETS if d in set(datasets)]
+        buffer = bytearray(dumps_line({
+            "type": "export",
+            "client_id": client_id,
+            "datasets": datasets,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+        }))
+        for dataset in datasets:
+            self.counts[dataset] = 0
+            async for record in self._records(dataset, client_id):
+                buffer += dumps_line(record)
+                self.counts[dataset] += 1
+                if len(buffer) >= EXPORT_FLUSH_BYTES:
+                    yield bytes(buffer)
+                    buffer.clear()
+        buffer += dumps_line({"type": "summary", "client_id": client_id, "counts": self.counts})
+        yield bytes(buffer)
+
+    def _records(self, dataset: str, client_id: int) -> AsyncIterator[Dict]:
+        if dataset == USERS:
+            return self._rows("user", select(
+                Users.id, Users.username, Users.email, Users.full_name, Users.swt, Users.createDate, Users.updateDate,
+            ).where(Users.idClient == client_id).order_by(Users.id), EXPORT_YIELD_PER)
+        if dataset == DOCUMENTS:
+            return self._rows("document", select(
+                Documents.id, Documents.title, Documents.content, Documents.file_path, Documents.swt,
+                Documents.createDate, Documents.updateDate,
+            ).where(Documents.idClient == client_id).order_by(Documents.id), EXPORT_DOCUMENT_YIELD_PER)
+        return self._chats(client_id)
+
+    async def _rows(self, kind: str, stmt, yield_per: int) -> AsyncIterator[Dict]:
+        result = await self.db.stream(stmt.execution_options(yield_per=yield_per))
+        try:
+            async for row in result.mappings():
+                yield {"type": kind, **row}
+        finally:
+            await result.close()  # cliente desconectado a mitad: libera el cursor
+
+    async def _chats(self, client_id: int) -> AsyncIterator[Dict]:
+        stmt = (
+            select(
+                Chats.id, Chats.idUser, Chats.session_id, Chats.message, Chats.response, Chats.source_documents,
+                Chats.createDate,
+                ChatDetails.id.label("detail_id"), ChatDetails.type.label("detail_type"),
+                ChatDetails.order.label("detail_order"), ChatDetails.detail,
+            )
+            .join(Users, Users.id == Chats.idUser)
+            .outerjoin(ChatDetails, ChatDetails.idChat == Chats.id)
+            .where(Users.idClient == client_id)
+            .order_by(Chats.id, ChatDetails.order, ChatDetails.id)
+        )
+        result = await self.db.stream(stmt.execution_options(yield_per=EXPORT_YIELD_PER))
+        try:
+            async for chat in self._group_chats(result):
+                yield chat
+        finally:
+            await result.close()
+
+    @staticmethod
+    async def _group_chats(result) -> AsyncIterator[Dict]:
+        chat: Optional[Dict] = None
+        details: List[Dict] = []
+        async for row in result:
+            if chat is None or row.id != chat["id"]:
+                if chat is not None:
+                    yield chat
+                details = []
+                chat = {
+                    "type": "chat",
+                    "id": row.id,
+                    "idUser": row.idUser,
+                    "session_id": row.session_id,
+                    "message": row.message,
+                    "response": row.response,
+                    "source_documents": row.source_documents,
+                    "createDate": row.createDate,
+                    "details": details,
+                }
+            if row.detail_id is not None:
+                details.append({"id": row.detail_id, "type": row.detail_type, "order": row.detail_order, "detail": row.detail})
+        if chat is not None:
+            yield chat
@@ -0,0 +1,184 @@
+# app/services/indexRegistry.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.services.annIndex import ClientIndex, index_builder, open_client_index
+from app.services.vectorStore import ann_path, delta_path, index_path, legacy_index_path, open_vectors
+from app.util.env import env_bool, env_int
+
+# Presupuesto de memoria por worker para índices abiertos (tamaño en disco como estimación)
+INDEX_MEMORY_BUDGET_MB = env_int("INDEX_MEMORY_BUDGET_MB", 1024)
+INDEX_USE_MMAP = env_bool("INDEX_USE_MMAP", True)
+
+
+@dataclass
+class _Entry:
+    index: ClientIndex
+    size_bytes: int
+    version: Tuple
+
+
+def _version(client_id: int) -> Optional[Tuple]:
+    """mtime del plano, del ANN y del delta del plano: cualquiera que cambie obliga a reabrir."""
+    try:
+        flat = os.stat(index_path(client_id))
+    except FileNotFoundError:
+        if not os.path.exists(legacy_index_path(client_id)):
+            return None
+        open_vectors(client_id)  # convierte el índice FAISS plano de versiones anteriores
+        try:
+            flat = os.stat(index_path(client_id))
+        except FileNotFoundError:
+            return None
+    try:
+        delta = os.stat(delta_path(client_id))
+        changes = (delta.st_mtime_ns, delta.st_size)
+    except FileNotFoundError:
+        changes = (None, 0)
+    try:
+        ann = os.stat(ann_path(client_id))
+    except FileNotFoundError:
+        return (flat.st_mtime_ns, flat.st_size, None, 0) + changes
+    return (flat.st_mtime_ns, flat.st_size, ann.st_mtime_ns, ann.st_size) + changes
+
+
+class IndexRegistry:
+    """
+    Registro de índices de solo lectura por `Clients.id` (snapshot de vectores + ANN FAISS opcional).
+    - Carga perezosa en la primera consulta, con mmap para que el SO comparta páginas entre workers.
+    - Desalojo LRU cuando la suma de tamaños supera el presupuesto.
+    - Recarga automática si el archivo cambió en disco (otro worker o una ingestión).
+    - Si el tipo de índice ya no corresponde al tamaño (o el ANN acumuló demasiados cambios)
+      agenda su reconstrucción en segundo plano (ver annIndex).
+    """
+
+    def __init__(self, budget_bytes: int, use_mmap: bool = True):
+        self.budget_bytes = budget_bytes
+        self.use_mmap = use_mmap
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[int, threading.Lock] = {}
+        self._resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds_total = 0.0
+        self.load_seconds_max = 0.0
+
+    # --- API ---
+
+    def get(self, client_id: int) -> Optional[ClientIndex]:
+        """Devuelve el índice del cliente o None si aún no tiene vectores."""
+        version = _version(client_id)
+        if version is None:
+            self.invalidate(client_id)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(client_id)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(client_id)
+                self.hits += 1
+                return entry.index
+            self.misses += 1
+            load_lock = self._load_locks.setdefault(client_id, threading.Lock())
+
+        # un solo hilo carga cada cliente; el resto espera y reutiliza el resultado
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(client_id)
+                if entry is not None and entry.version == version:
+                    self._entries.move_to_end(client_id)
+                    return entry.index
+            started = time.perf_counter()
+            index = open_client_index(client_id, self.use_mmap)
+            elapsed = time.perf_counter() - started
+            if index is None:
+                self.invalidate(client_id)
+                return None
+            # con ANN, el plano queda en disco (mmap) y solo se tocan sus ids: cuenta el ANN
+            size = (version[3] if index.ann is not None else version[1]) + version[5]
+            with self._lock:
+                self.loads += 1
+                self.load_seconds_total += elapsed
+                self.load_seconds_max = max(self.load_seconds_max, elapsed)
+                self._drop(client_id)
+                self._entries[client_id] = _Entry(index, size, version)
+                self._resident_bytes += size
+                self._evict(keep=client_id)
+            if index.needs_rebuild():
+                index_builder.schedule(client_id)
+            return index
+
+    def search(
+        self, client_id: int, queries: np.ndarray, k: int, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """`nprobe` (IVF-PQ) y `ef_search` (HNSW) ajustan recall/latencia por consulta; el plano los ignora."""
+        index = self.get(client_id)
+        if index is None or index.ntotal == 0:
+            return None
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+        return index.search(queries, min(k, index.ntotal), nprobe=nprobe, ef_search=ef_search)
+
+    def describe(self, client_id: int) -> Optional[Dict]:
+        index = self.get(client_id)
+        return index.describe() if index is not None else None
+
+    def invalidate(self, client_id: int) -> None:
+        with self._lock:
+            self._drop(client_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._resident_bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "resident_indexes": len(self._entries),
+                "resident_by_type": _count_types(e.index.kind for e in self._entries.values()),
+                "resident_bytes": self._resident_bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "load_seconds_total": round(self.load_seconds_total, 4),
+                "load_seconds_avg": round(self.load_seconds_total / self.loads, 4) if self.loads else 0.0,
+                "load_seconds_max": round(self.load_seconds_max, 4),
+            }
+
+    # --- internos (llamar con self._lock tomado) ---
+
+    def _drop(self, client_id: int) -> None:
+        entry = self._entries.pop(client_id, None)
+        if entry is not None:
+            self._resident_bytes -= entry.size_bytes
+
+    def _evict(self, keep: int) -> None:
+        while self._resident_bytes > self.budget_bytes and len(self._entries) > 1:
+            client_id = next(iter(self._entries))
+            if client_id == keep:
+                break
+            self._drop(client_id)
+            self.evictions += 1
+
+
+def _count_types(kinds) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for kind in kinds:
+        counts[kind] = counts.get(kind, 0) + 1
+    return counts
+
+
+index_registry = IndexRegistry(INDEX_MEMORY_BUDGET_MB * 1024 * 1024, INDEX_USE_MMAP)
@@ -0,0 +1,340 @@
+import itertools
+import os
+import tempfile
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import anyio
+import numpy as np
+from sqlalchemy import select, insert, delete, update, or_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.documents import Documents
+from app.models.documentChunks import DocumentChunks
+from app.services.embeddingCache import embed_cached
+from app.services.bm25Index import bm25_store
+from app.services.indexRegistry import index_registry
+from app.services import dedupIndex, documentChanges, uploadStore, vectorStore
+from app.util import parsing
+from app.util.chunking import chunk_text, iter_chunks
+from app.util.env import env_int
+
+# filas por sentencia INSERT multi-fila
+INSERT_BATCH_SIZE = env_int("INGEST_INSERT_BATCH_SIZE", 1000)
+# chunks por lote (parseo -> embeddings -> INSERT) al ingerir archivos subidos
+STREAM_BATCH_SIZE = env_int("INGEST_STREAM_BATCH_SIZE", 2048)
+# documentos por consulta al buscar enlaces de duplicados que apuntan a ellos
+_LINK_QUERY_DOCS = 200
+
+# vector_id -> (texto del chunk canónico, documentos con chunks enlazados a él)
+Links = Dict[int, Tuple[Optional[str], Set[int]]]
+
+
+def _take(chunks: Iterator[str], n: int) -> List[str]:
+    return list(itertools.islice(chunks, n))
+
+def _ratio(duplicates: int, chunks: int) -> float:
+    return round(duplicates / chunks, 4) if chunks else 0.0
+
+def _points_into(doc_ids: Sequence[int]):
+    """`duplicate_of` cae en el rango de vector_ids de alguno de `doc_ids` (usa el índice de la columna)."""
+    last = vectorStore.MAX_CHUNKS_PER_DOCUMENT - 1
+    return or_(*(
+        DocumentChunks.duplicate_of.between(vectorStore.make_vector_id(d, 0), vectorStore.make_vector_id(d, last))
+        for d in doc_ids
+    ))
+
+def _combine(client_id: int, results: List[Dict], started: float) -> Dict:
+    chunks = sum(r["chunks"] for r in results)
+    duplicates = sum(r["duplicate_chunks"] for r in results)
+    return {
+        "client_id": client_id,
+        "documents": sum(r["documents"] for r in results),
+        "chunks": chunks,
+        "duplicate_chunks": duplicates,
+        "dedup_ratio": _ratio(duplicates, chunks),
+        "index_size": results[-1]["index_size"],
+        "embed_seconds": round(sum(r["embed_seconds"] for r in results), 4),
+        "total_seconds": round(time.perf_counter() - started, 4),
+        "dependents": sorted(set().union(*(r.get("dependents", ()) for r in results))),
+    }
+
+
+class IngestionService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def ingest_client(self, client_id: int, document_ids: Optional[List[int]] = None) -> Optional[Dict]:
+        """
+        Chunkea y embebe los documentos activos del cliente (o solo `document_ids`). Después vuelve
+        a ingerir los documentos con chunks enlazados a uno de estos que cambió de texto o ya no
+        es canónico, para que ningún duplicado quede apuntando a un vector que no existe.
+        """
+        started = time.perf_counter()
+        results = []
+        seen: Set[int] = set()
+        pending = document_ids
+        while True:
+            result = await self._ingest(client_id, pending)
+            if result is None:
+                return None
+            results.append(result)
+            seen.update(pending or ())
+            pending = [d for d in result.pop("dependents") if d not in seen]
+            if not pending:
+                break
+        if len(results) == 1:
+            return results[0]
+        combined = _combine(client_id, results, started)
+        del combined["dependents"]
+        return combined
+
+    async def _ingest(self, client_id: int, document_ids: Optional[List[int]]) -> Optional[Dict]:
+        stmt = select(Documents.id, Documents.content, Documents.file_path).where(
+            Documents.idClient == client_id, Documents.swt == True  # noqa: E712
+        )
+        if document_ids:
+            stmt = stmt.where(Documents.id.in_(document_ids))
+        rows = (await self.db.execute(stmt)).all()
+        if document_ids:
+            # pedidos que ya no existen o están inactivos (swt=False): se retiran del índice
+            gone = set(document_ids) - {r.id for r in rows}
+            if gone and await self.remove_documents(client_id, list(gone)) is None:
+                return None
+        # los documentos subidos se leen del archivo en streaming; el resto, de `content`
+        files = [(r.id, r.file_path) for r in rows if uploadStore.is_upload(r.file_path, client_id)]
+        texts = [(r.id, r.content) for r in rows if not uploadStore.is_upload(r.file_path, client_id)]
+        if not files:
+            return await self.index_documents(client_id, texts)
+
+        started = time.perf_counter()
+        results = [await self.index_documents(client_id, texts)] if texts else []
+        for doc_id, path in files:
+            results.append(await self.index_file_document(client_id, doc_id, path))
+        if any(r is None for r in results):
+            return None
+        return _combine(client_id, results, started)
+
+    async def remove_documents(self, client_id: int, document_ids: List[int]) -> Optional[int]:
+        """
+        Borra los chunks y vectores de `document_ids`. Devuelve la cantidad de vectores retirados.
+        Los documentos con duplicados enlazados a estos chunks se vuelven a ingerir.
+        """
+        try:
+            links = await self._links_into(client_id, document_ids)
+            await self.db.execute(delete(DocumentChunks).where(DocumentChunks.idDocument.in_(document_ids)))
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            print(f"Error removing document chunks: {e}")
+            return None
+        removed = await anyio.to_thread.run_sync(vectorStore.remove_documents, client_id, document_ids)
+        await anyio.to_thread.run_sync(dedupIndex.remove_documents, client_id, document_ids)
+        await self._publish(client_id, document_ids)
+        dependents = sorted(set().union(*(docs for _, docs in links.values())))
+        if dependents and await self.ingest_client(client_id, dependents) is None:
+            return None
+        return removed or 0
+
+    async def index_documents(self, client_id: int, docs: Sequence[Tuple[int, str]]) -> Optional[Dict]:
+        """
+        Flujo:
+        1) Chunkear todos los documentos en memoria.
+        2) Enlazar los chunks casi duplicados de otro ya indexado (o de uno anterior del lote) a su
+           canónico (ver dedupIndex): no se embeben ni entran a los índices.
+        3) Embeber los chunks canónicos que no están en la caché, en lotes grandes sobre el pool de procesos.
+        4) Reemplazar las filas de `document_chunks` con INSERT multi-fila en una sola transacción.
+        5) Reemplazar los vectores y las firmas de esos documentos en los índices del cliente.
+        """
+        started = time.perf_counter()
+        doc_ids = [doc_id for doc_id, _ in docs]
+        rows: List[Dict] = []
+        texts: List[str] = []
+        for doc_id, content in docs:
+            for i, chunk in enumerate(chunk_text(content)):
+                rows.append({
+                    "idDocument": doc_id,
+                    "idClient": client_id,
+                    "chunk_index": i,
+                    "vector_id": vectorStore.make_vector_id(doc_id, i),
+                    "content": chunk,
+                })
+                texts.append(chunk)
+
+        ids = np.fromiter((r["vector_id"] for r in rows), dtype=np.int64, count=len(rows))
+        dedup = await anyio.to_thread.run_sync(dedupIndex.Deduplicator, client_id, doc_ids)
+        duplicate_of = await anyio.to_thread.run_sync(dedup.match, ids, texts)
+        canonical = duplicate_of < 0
+        for row, target in zip(rows, duplicate_of.tolist()):
+            row["duplicate_of"] = target if target >= 0 else None
+
+        t_embed = time.perf_counter()
+        vectors = await embed_cached([text for text, keep in zip(texts, canonical) if keep])
+        embed_seconds = time.perf_counter() - t_embed
+
+        try:
+            links = await self._links_into(client_id, doc_ids)
+            if doc_ids:
+                await self.db.execute(delete(DocumentChunks).where(DocumentChunks.idDocument.in_(doc_ids)))
+            for i in range(0, len(rows), INSERT_BATCH_SIZE):
+                await self.db.execute(insert(DocumentChunks), rows[i:i + INSERT_BATCH_SIZE])
+            dependents = await self._broken_links(client_id, links)
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            print(f"Error ingesting documents: {e}")
+            return None
+
+        # La BD es la fuente de verdad: los índices se actualizan después del commit
+        total = await anyio.to_thread.run_sync(
+            vectorStore.upsert_document_vectors, client_id, doc_ids, ids[canonical], vectors
+        )
+        await anyio.to_thread.run_sync(dedupIndex.update_documents, client_id, doc_ids, *dedup.canonical())
+        await self._publish(client_id, doc_ids)
+        return {
+            "client_id": client_id,
+            "documents": len(doc_ids),
+            "chunks": len(rows),
+            "duplicate_chunks": dedup.duplicates,
+            "dedup_ratio": _ratio(dedup.duplicates, len(rows)),
+            "index_size": total,
+            "embed_seconds": round(embed_seconds, 4),
+            "total_seconds": round(time.perf_counter() - started, 4),
+            "dependents": sorted(dependents),
+        }
+
+    async def index_file_document(self, client_id: int, doc_id: int, path: str) -> Optional[Dict]:
+        """
+        Ingesta en streaming de un documento subido (`Documents.file_path`): el parser incremental
+        alimenta `iter_chunks` y cada lote de `STREAM_BATCH_SIZE` chunks se deduplica, se embebe e
+        inserta antes de leer el siguiente. Los vectores canónicos se acumulan en un archivo
+        temporal en disco y entran al índice de una vez tras el commit, así que la memoria no
+        depende del tamaño del archivo (salvo las firmas MinHash, 256 bytes por chunk canónico).
+        """
+        started = time.perf_counter()
+        embed_seconds = 0.0
+        n = 0
+        dim = 0
+        canonical_ids: List[np.ndarray] = []
+        os.makedirs(vectorStore.VECTOR_STORE_DIR, exist_ok=True)
+        dedup = await anyio.to_thread.run_sync(dedupIndex.Deduplicator, client_id, [doc_id])
+        with tempfile.TemporaryFile(dir=vectorStore.VECTOR_STORE_DIR, suffix=".vectors") as spill:
+            try:
+                chunks = iter_chunks(parsing.iter_document(path))
+                links = await self._links_into(client_id, [doc_id])
+                await self.db.execute(delete(DocumentChunks).where(DocumentChunks.idDocument == doc_id))
+                while True:
+                    # lectura y parseo (disco, pypdf) fuera del event loop
+                    batch = await anyio.to_thread.run_sync(_take, chunks, STREAM_BATCH_SIZE)
+                    if not batch:
+                        break
+                    if n + len(batch) > vectorStore.MAX_CHUNKS_PER_DOCUMENT:
+                        raise parsing.ParseError(
+                            f"El documento supera {vectorStore.MAX_CHUNKS_PER_DOCUMENT} chunks."
+                        )
+                    ids = vectorStore.document_vector_ids(doc_id, n + len(batch))[n:]
+                    duplicate_of = await anyio.to_thread.run_sync(dedup.match, ids, batch)
+                    canonical = duplicate_of < 0
+                    t_embed = time.perf_counter()
+                    vectors = await embed_cached([text for text, keep in zip(batch, canonical) if keep])
+                    embed_seconds += time.perf_counter() - t_embed
+
+                    rows = [
+                        {
+                            "idDocument": doc_id,
+                            "idClient": client_id,
+                            "chunk_index": i,
+                            "vector_id": vectorStore.make_vector_id(doc_id, i),
+                            "content": chunk,
+                            "duplicate_of": target if target >= 0 else None,
+                        }
+                        for i, chunk, target in zip(itertools.count(n), batch, duplicate_of.tolist())
+                    ]
+                    for i in range(0, len(rows), INSERT_BATCH_SIZE):
+                        await self.db.execute(insert(DocumentChunks), rows[i:i + INSERT_BATCH_SIZE])
+                    if n == 0:
+                        # extracto legible en `content` (el texto completo vive en el archivo y en los chunks)
+                        await self.db.execute(update(Documents).where(Documents.id == doc_id).values(content=batch[0]))
+                    if len(vectors):
+                        dim = int(vectors.shape[1])
+                        canonical_ids.append(ids[canonical])
+                        await anyio.to_thread.run_sync(spill.write, np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                    n += len(batch)
+                dependents = await self._broken_links(client_id, links)
+                await self.db.commit()
+            except (SQLAlchemyError, OSError, parsing.ParseError) as e:
+                await self.db.rollback()
+                print(f"Error ingesting file for document {doc_id}: {e}")
+                return None
+
+            spill.flush()
+            ids = np.concatenate(canonical_ids) if canonical_ids else np.empty(0, dtype=np.int64)
+            if len(ids):
+                vectors = np.memmap(spill, dtype=np.float32, mode="r", shape=(len(ids), dim))
+            else:
+                vectors = np.zeros((0, 1), dtype=np.float32)
+            total = await anyio.to_thread.run_sync(
+                vectorStore.upsert_document_vectors, client_id, [doc_id], ids, vectors
+            )
+            del vectors
+        await anyio.to_thread.run_sync(dedupIndex.update_documents, client_id, [doc_id], *dedup.canonical())
+        await self._publish(client_id, [doc_id])
+        return {
+            "client_id": client_id,
+            "documents": 1,
+            "chunks": n,
+            "duplicate_chunks": dedup.duplicates,
+            "dedup_ratio": _ratio(dedup.duplicates, n),
+            "index_size": total,
+            "embed_seconds": round(embed_seconds, 4),
+            "total_seconds": round(time.perf_counter() - started, 4),
+            "dependents": sorted(dependents),
+        }
+
+    async def _links_into(self, client_id: int, doc_ids: Sequence[int]) -> Links:
+        """Chunks canónicos de `doc_ids` a los que enlazan duplicados de otros documentos."""
+        doc_ids = list(doc_ids)
+        linked: Dict[int, Set[int]] = {}
+        for i in range(0, len(doc_ids), _LINK_QUERY_DOCS):
+            result = await self.db.execute(
+                select(DocumentChunks.duplicate_of, DocumentChunks.idDocument).where(
+                    DocumentChunks.idClient == client_id,
+                    _points_into(doc_ids[i:i + _LINK_QUERY_DOCS]),
+                    DocumentChunks.idDocument.not_in(doc_ids),
+                )
+            )
+            for target, doc_id in result.all():
+                linked.setdefault(target, set()).add(doc_id)
+        contents = await self._canonical_contents(client_id, list(linked))
+        return {target: (contents.get(target), docs) for target, docs in linked.items()}
+
+    async def _broken_links(self, client_id: int, links: Links) -> Set[int]:
+        """
+        Documentos a re-ingerir: enlazan a un chunk que, con las filas nuevas (aún sin commit), ya
+        no existe, quedó como duplicado o cambió de texto.
+        """
+        contents = await self._canonical_contents(client_id, list(links))
+        broken: Set[int] = set()
+        for target, (content, docs) in links.items():
+            if content is None or contents.get(target) != content:
+                broken |= docs
+        return broken
+
+    async def _canonical_contents(self, client_id: int, vector_ids: List[int]) -> Dict[int, str]:
+        contents: Dict[int, str] = {}
+        for i in range(0, len(vector_ids), INSERT_BATCH_SIZE):
+            result = await self.db.execute(
+                select(DocumentChunks.vector_id, DocumentChunks.content).where(
+                    DocumentChunks.idClient == client_id,
+                    DocumentChunks.vector_id.in_(vector_ids[i:i + INSERT_BATCH_SIZE]),
+                    DocumentChunks.duplicate_of.is_(None),
+                )
+            )
+            contents.update(result.tuples().all())
+        return contents
+
+    async def _publish(self, client_id: int, doc_ids: List[int]) -> None:
+        index_registry.invalidate(client_id)
+        bm25_store.invalidate(client_id)
+        await anyio.to_thread.run_sync(documentChanges.publish, client_id, doc_ids)
@@ -0,0 +1,471 @@
+# app/services/jobQueue.py
+import asyncio
+import json
+import os
+import socket
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.db.session import AsyncSessionLocal
+from app.models.documents import Documents
+from app.models.jobs import Jobs
+from app.services.ingestionService import IngestionService
+from app.util.env import env_float, env_int
+
+JOB_WORKERS = env_int("JOB_WORKERS", 2)                                # jobs en paralelo por proceso (0 = solo encola)
+JOB_MAX_QUEUED = env_int("JOB_MAX_QUEUED", 1000)                       # en cola, todos los clientes: más -> 429
+JOB_MAX_QUEUED_PER_CLIENT = env_int("JOB_MAX_QUEUED_PER_CLIENT", 100)  # en cola por cliente: más -> 429
+JOB_MAX_RUNNING_PER_CLIENT = env_int("JOB_MAX_RUNNING_PER_CLIENT", 1)  # un cliente no ocupa todos los workers
+JOB_BATCH_SIZE = env_int("JOB_BATCH_SIZE", 32)                         # documentos por paso (progreso y reanudación)
+JOB_POLL_SECONDS = env_float("JOB_POLL_SECONDS", 2.0)                  # jobs encolados por otros procesos
+JOB_LEASE_SECONDS = env_float("JOB_LEASE_SECONDS", 120.0)              # sin renovar en este plazo -> huérfano
+JOB_MAX_ATTEMPTS = env_int("JOB_MAX_ATTEMPTS", 3)
+JOB_MAX_DOCUMENT_CHANGES = env_int("JOB_MAX_DOCUMENT_CHANGES", 500)   # documentos por job de cambios de CRUD
+
+INGEST = "ingest"
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class QueueFull(Exception):
+    """Cola llena (global o del cliente): el controlador responde 429 con `Retry-After`."""
+
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class JobLost(Exception):
+    """El job dejó de pertenecer a este worker (cancelado, o su concesión venció y otro lo tomó)."""
+
+
+def utcnow() -> datetime:
+    # naive en UTC: MySQL DATETIME no guarda zona y así la comparación es la misma en SQLite
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@dataclass
+class ClaimedJob:
+    id: int
+    client_id: int
+    kind: str
+    payload: Dict
+    progress_done: int
+    progress_total: int
+    attempts: int
+    lost: bool = False  # la renovación de la concesión no encontró el job: ya no es nuestro
+
+
+class JobQueue:
+    """
+    Cola persistente de trabajos de ingestión sobre la tabla `jobs`: encolar es un INSERT y la
+    request responde enseguida con el id; un pool de workers asyncio por proceso los ejecuta.
+
+    - Equidad: se toma el job más antiguo del cliente con menos jobs en ejecución (y, a igualdad,
+      el atendido hace más tiempo), con un tope de jobs simultáneos por cliente.
+    - Contrapresión: con demasiados jobs en cola (global o del cliente) `enqueue` lanza `QueueFull`.
+    - Reanudación: el job en ejecución tiene una concesión (`lease_until`) que se renueva al avanzar;
+      si el proceso muere, al vencer vuelve a la cola y retoma desde `progress_done`.
+
+    La toma es un UPDATE condicional (`WHERE status='queued'` y el cliente por debajo del tope de
+    jobs en ejecución) y gana quien lo ve afectar una fila, así que varios procesos pueden compartir
+    la tabla sin `SELECT ... FOR UPDATE SKIP LOCKED`. Si la concesión se pierde (cancelado, o venció
+    y otro worker lo tomó), el heartbeat cancela el handler en vez de dejarlo correr en paralelo.
+    """
+
+    def __init__(self, workers: int, max_queued: int, max_queued_per_client: int, max_running_per_client: int):
+        self.workers = max(0, workers)
+        self.max_queued = max(1, max_queued)
+        self.max_queued_per_client = max(1, max_queued_per_client)
+        self.max_running_per_client = max(1, max_running_per_client)
+        self.owner = ""
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._running: Dict[int, int] = {}        # job_id -> client_id (en este proceso)
+        self._last_served: Dict[int, float] = {}  # client_id -> monotonic
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.rejected = 0
+        self.recovered = 0
+        self.lost = 0
+
+    # --- API usada por los controladores ---
+
+    async def check_capacity(self, db: AsyncSession, client_id: int) -> None:
+        """Lanza `QueueFull` si no hay lugar; se llama antes de trabajo caro (p. ej. guardar un upload)."""
+        queued = dict((await db.execute(
+            select(Jobs.idClient, func.count()).where(Jobs.status == QUEUED).group_by(Jobs.idClient)
+        )).all())
+        retry_after = max(1, int(JOB_POLL_SECONDS * 5))
+        if queued.get(client_id, 0) >= self.max_queued_per_client:
+            self.rejected += 1
+            raise QueueFull(f"Too many queued jobs for client {client_id}.", retry_after)
+        if sum(queued.values()) >= self.max_queued:
+            self.rejected += 1
+            raise QueueFull("Job queue is full.", retry_after)
+
+    async def enqueue(self, db: AsyncSession, client_id: int, kind: str, payload: Dict, total: int = 0,
+                      check: bool = True) -> Jobs:
+        if check:
+            await self.check_capacity(db, client_id)
+        job = Jobs(
+            idClient=client_id, kind=kind, status=QUEUED, payload=json.dumps(payload),
+            progress_done=0, progress_total=total, attempts=0,
+        )
+        db.add(job)
+        try:
+            await db.commit()
+            await db.refresh(job)
+        except Exception:
+            await db.rollback()
+            raise
+        self.notify()
+        return job
+
+    async def add_document_changes(self, db: AsyncSession, client_id: int, document_ids: List[int]) -> None:
+        """
+        Re-ingesta de documentos creados, cambiados o borrados vía `DocumentService`. No hace commit:
+        la fila del job entra en la misma transacción que el cambio, así que no se pierde si el
+        proceso cae justo después. Quien llama hace commit y luego `notify()`.
+
+        Una ráfaga de cambios se junta en el job de cambios del cliente que sigue en cola sin
+        empezar; la ingestión lee el contenido al correr, así que repetir un id no hace falta, y un
+        documento borrado o inactivo sale de los índices. Sin tope de cola: un CRUD no responde 429.
+        """
+        ids = sorted(set(document_ids))
+        pending = (await db.execute(
+            select(Jobs.id, Jobs.payload)
+            .where(Jobs.idClient == client_id, Jobs.kind == INGEST, Jobs.status == QUEUED, Jobs.progress_done == 0)
+            .order_by(Jobs.id.desc()).limit(5)
+        )).all()
+        for job_id, raw in pending:
+            payload = json.loads(raw or "{}")
+            if not payload.get("document_changes"):
+                continue  # re-ingestas pedidas por el cliente: su resultado es suyo
+            merged = sorted(set(payload.get("document_ids") or []) | set(ids))
+            if len(merged) > JOB_MAX_DOCUMENT_CHANGES:
+                continue
+            # compare-and-swap sobre el payload: si un worker lo tomó u otra request lo amplió, no se pisa
+            updated = await db.execute(
+                update(Jobs).where(Jobs.id == job_id, Jobs.status == QUEUED, Jobs.payload == raw)
+                .values(payload=json.dumps({**payload, "document_ids": merged}), progress_total=len(merged))
+            )
+            if updated.rowcount == 1:
+                return
+        db.add(Jobs(
+            idClient=client_id, kind=INGEST, status=QUEUED,
+            payload=json.dumps({"document_ids": ids, "document_changes": True}),
+            progress_done=0, progress_total=len(ids), attempts=0,
+        ))
+
+    def notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self._tasks or self.workers == 0:
+            return
+        # por proceso (cada worker de uvicorn tiene su pid)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"[:100]
+        self._stopping = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(loop.create_task(self._recover_loop()))
+
+    async def stop(self) -> None:
+        """Detiene los workers; los jobs en curso se interrumpen y vuelven a la cola con su progreso."""
+        tasks, self._tasks = self._tasks, []
+        if self._stopping is not None:
+            self._stopping.set()
+        self.notify()
+        # los ociosos salen solos (sin cortar una consulta a medias); el resto se cancela
+        pending = set()
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=1.0)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {
+            "owner": self.owner,
+            "workers": self.workers if self._tasks else 0,
+            "running": len(self._running),
+            "running_clients": sorted(set(self._running.values())),
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "rejected": self.rejected,
+            "recovered": self.recovered,
+            "lost": self.lost,
+        }
+
+    # --- workers ---
+
+    async def _worker(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = await self._claim()
+            except Exception as e:
+                print(f"Error claiming job: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            await self._execute(job)
+
+    async def _claim(self) -> Optional[ClaimedJob]:
+        async with AsyncSessionLocal() as db:
+            running = dict((await db.execute(
+                select(Jobs.idClient, func.count()).where(Jobs.status == RUNNING).group_by(Jobs.idClient)
+            )).all())
+            heads = (await db.execute(
+                select(Jobs.idClient, func.min(Jobs.id)).where(Jobs.status == QUEUED).group_by(Jobs.idClient)
+            )).all()
+            candidates = sorted(
+                (running.get(client_id, 0), self._last_served.get(client_id, 0.0), job_id, client_id)
+                for client_id, job_id in heads
+                if running.get(client_id, 0) < self.max_running_per_client
+            )
+            for _, _, job_id, client_id in candidates:
+                now = utcnow()
+                # el tope por cliente va en el mismo UPDATE: el SELECT de arriba solo ordena y dos
+                # workers que lo leyeron a la vez no pueden pasarse. Tabla derivada porque MySQL no
+                # deja leer en una subconsulta la tabla que se actualiza (error 1093).
+                others = aliased(Jobs)
+                counted = (
+                    select(func.count().label("n"))
+                    .where(others.idClient == client_id, others.status == RUNNING)
+                    .subquery("running_now")
+                )
+                claimed = await db.execute(
+                    update(Jobs)
+                    .where(
+                        Jobs.id == job_id, Jobs.status == QUEUED,
+                        select(counted.c.n).scalar_subquery() < self.max_running_per_client,
+                    )
+                    .values(
+                        status=RUNNING, owner=self.owner, attempts=Jobs.attempts + 1,
+                        lease_until=now + timedelta(seconds=JOB_LEASE_SECONDS),
+                        startedAt=func.coalesce(Jobs.startedAt, now),
+                    )
+                )
+                await db.commit()
+                if claimed.rowcount != 1:
+                    continue  # otro worker lo tomó primero, o el cliente llegó al tope
+                self._last_served[client_id] = time.monotonic()
+                job = (await db.execute(select(Jobs).where(Jobs.id == job_id))).scalar_one()
+                return ClaimedJob(
+                    id=job.id, client_id=job.idClient, kind=job.kind, payload=json.loads(job.payload or "{}"),
+                    progress_done=job.progress_done, progress_total=job.progress_total, attempts=job.attempts,
+                )
+        return None
+
+    async def _execute(self, job: ClaimedJob) -> None:
+        self._running[job.id] = job.client_id
+        loop = asyncio.get_running_loop()
+        heartbeat = None
+        try:
+            handler = self._handlers().get(job.kind)
+            if handler is None:
+                raise ValueError(f"Unknown job kind: {job.kind}")
+            # el handler corre en su propia tarea para que el heartbeat pueda cortarlo
+            work = loop.create_task(handler(job))
+            heartbeat = loop.create_task(self._heartbeat(job, work))
+            result = await work
+            if await self._finish(job, DONE, result=result):
+                self.completed += 1
+        except JobLost:
+            self.lost += 1
+        except asyncio.CancelledError:
+            if job.lost and not asyncio.current_task().cancelling():
+                self.lost += 1  # lo cortó el heartbeat: el job ya es de otro, no hay nada que liberar
+                return
+            # apagado del proceso: libera el job para que lo retome otro worker
+            await asyncio.shield(self._release(job))
+            raise
+        except Exception as e:
+            print(f"Error running job {job.id} ({job.kind}, client {job.client_id}): {e}")
+            if job.attempts >= JOB_MAX_ATTEMPTS:
+                if await self._finish(job, FAILED, error=str(e)):
+                    self.failed += 1
+            elif await self._requeue(job, str(e)):
+                self.retried += 1
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            self._running.pop(job.id, None)
+
+    def _handlers(self) -> Dict:
+        return {INGEST: self._run_ingest}
+
+    async def _run_ingest(self, job: ClaimedJob) -> Dict:
+        ids = job.payload.get("document_ids")
+        if not ids:
+            # "todos los activos": se fija la lista al empezar para que la reanudación sea estable
+            async with AsyncSessionLocal() as db:
+                ids = list((await db.execute(
+                    select(Documents.id).where(Documents.idClient == job.client_id, Documents.swt == True)  # noqa: E712
+                    .order_by(Documents.id)
+                )).scalars().all())
+            job.payload = {**job.payload, "document_ids": ids}
+            await self._progress(job, 0, len(ids), payload=job.payload)
+
+        totals = {"documents": 0, "chunks": 0, "duplicate_chunks": 0, "index_size": 0, "embed_seconds": 0.0,
+                  **(job.payload.get("partial") or {})}
+        started = time.perf_counter()
+        for offset in range(job.progress_done, len(ids), max(1, JOB_BATCH_SIZE)):
+            batch = ids[offset: offset + max(1, JOB_BATCH_SIZE)]
+            async with AsyncSessionLocal() as db:
+                result = await IngestionService(db).ingest_client(job.client_id, batch)
+            if result is None:
+                raise RuntimeError(f"ingestion failed for documents {batch[0]}..{batch[-1]}")
+            totals = {
+                "documents": totals["documents"] + result["documents"],
+                "chunks": totals["chunks"] + result["chunks"],
+                "duplicate_chunks": totals["duplicate_chunks"] + result["duplicate_chunks"],
+                "index_size": result["index_size"],
+                "embed_seconds": round(totals["embed_seconds"] + result["embed_seconds"], 4),
+            }
+            # el parcial viaja en el payload: al reanudar el resultado final suma lo ya hecho
+            job.payload = {**job.payload, "partial": totals}
+            await self._progress(job, offset + len(batch), len(ids), payload=job.payload)
+        return {
+            "client_id": job.client_id,
+            **totals,
+            "dedup_ratio": round(totals["duplicate_chunks"] / totals["chunks"], 4) if totals["chunks"] else 0.0,
+            "total_seconds": round(time.perf_counter() - started, 4),
+        }
+
+    # --- estado en la tabla (siempre condicionado a que el job siga siendo nuestro) ---
+
+    def _owned(self, job: ClaimedJob):
+        return (Jobs.id == job.id, Jobs.status == RUNNING, Jobs.owner == self.owner)
+
+    async def _progress(self, job: ClaimedJob, done: int, total: int, payload: Optional[Dict] = None) -> None:
+        values = {
+            "progress_done": done,
+            "progress_total": total,
+            "lease_until": utcnow() + timedelta(seconds=JOB_LEASE_SECONDS),
+        }
+        if payload is not None:
+            values["payload"] = json.dumps(payload)
+        async with AsyncSessionLocal() as db:
+            updated = await db.execute(update(Jobs).where(*self._owned(job)).values(**values))
+            await db.commit()
+        if updated.rowcount != 1:
+            raise JobLost()
+        job.progress_done, job.progress_total = done, total
+
+    async def _heartbeat(self, job: ClaimedJob, work: asyncio.Task) -> None:
+        # renueva la concesión aunque un lote tarde más que el plazo; si ya no es nuestra, corta el
+        # handler: seguir escribiendo el índice en paralelo con el nuevo dueño lo corrompería
+        while True:
+            await asyncio.sleep(max(1.0, JOB_LEASE_SECONDS / 3))
+            try:
+                async with AsyncSessionLocal() as db:
+                    renewed = await db.execute(
+                        update(Jobs).where(*self._owned(job))
+                        .values(lease_until=utcnow() + timedelta(seconds=JOB_LEASE_SECONDS))
+                    )
+                    await db.commit()
+            except Exception as e:
+                print(f"Error renewing lease of job {job.id}: {e}")
+                continue
+            if renewed.rowcount == 0:
+                print(f"Job {job.id} lost its lease; cancelling it on this worker")
+                job.lost = True
+                work.cancel()
+                return
+
+    async def _finish(self, job: ClaimedJob, status: str, result: Optional[Dict] = None,
+                      error: Optional[str] = None) -> bool:
+        now = utcnow()
+        values = {"status": status, "owner": None, "lease_until": None, "finishedAt": now}
+        if result is not None:
+            values["result"] = json.dumps(result)
+            values["progress_done"] = job.progress_total
+        if error is not None:
+            values["error"] = error[:1000]
+        try:
+            async with AsyncSessionLocal() as db:
+                updated = await db.execute(update(Jobs).where(*self._owned(job)).values(**values))
+                await db.commit()
+        except Exception as e:
+            print(f"Error finishing job {job.id}: {e}")
+            return False  # la concesión vencerá y el job se reintentará
+        return updated.rowcount == 1
+
+    async def _requeue(self, job: ClaimedJob, error: Optional[str], refund: bool = False) -> bool:
+        values = {"status": QUEUED, "owner": None, "lease_until": None}
+        if error is not None:
+            values["error"] = error[:1000]
+        if refund:
+            values["attempts"] = Jobs.attempts - 1  # no fue culpa del job
+        try:
+            async with AsyncSessionLocal() as db:
+                updated = await db.execute(update(Jobs).where(*self._owned(job)).values(**values))
+                await db.commit()
+        except Exception as e:
+            print(f"Error requeueing job {job.id}: {e}")
+            return False
+        self.notify()
+        return updated.rowcount == 1
+
+    async def _release(self, job: ClaimedJob) -> None:
+        await self._requeue(job, None, refund=True)
+
+    async def _recover_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await self.recover_expired()
+            except Exception as e:
+                print(f"Error recovering expired jobs: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), max(1.0, JOB_LEASE_SECONDS / 2))
+            except asyncio.TimeoutError:
+                pass
+
+    async def recover_expired(self) -> int:
+        """Devuelve a la cola los jobs cuya concesión venció (proceso caído); agotados los intentos, fallan."""
+        now = utcnow()
+        async with AsyncSessionLocal() as db:
+            expired = (Jobs.status == RUNNING, Jobs.lease_until < now)
+            failed = await db.execute(
+                update(Jobs).where(*expired, Jobs.attempts >= JOB_MAX_ATTEMPTS).values(
+                    status=FAILED, owner=None, lease_until=None, finishedAt=now,
+                    error="Worker lost the job too many times (lease expired).",
+                )
+            )
+            requeued = await db.execute(
+                update(Jobs).where(*expired).values(status=QUEUED, owner=None, lease_until=None)
+            )
+            await db.commit()
+        self.failed += failed.rowcount
+        self.recovered += requeued.rowcount
+        if requeued.rowcount:
+            print(f"Recovered {requeued.rowcount} job(s) with expired lease")
+            self.notify()
+        return requeued.rowcount
+
+
+job_queue = JobQueue(JOB_WORKERS, JOB_MAX_QUEUED, JOB_MAX_QUEUED_PER_CLIENT, JOB_MAX_RUNNING_PER_CLIENT)
@@ -0,0 +1,70 @@
+import json
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.jobs import Jobs
+from app.services.jobQueue import CANCELLED, DONE, QUEUED, RUNNING, utcnow
+from app.shared.pagination import keyset_page
+
+def to_job_dict(job: Jobs) -> Dict:
+    total = job.progress_total or 0
+    if job.status == DONE:
+        progress = 1.0
+    else:
+        progress = min(1.0, job.progress_done / total) if total else 0.0
+    return {
+        "id": job.id,
+        "idClient": job.idClient,
+        "kind": job.kind,
+        "status": job.status,
+        "progress_done": job.progress_done,
+        "progress_total": total,
+        "progress": round(progress, 4),
+        "attempts": job.attempts,
+        "error": job.error,
+        "result": json.loads(job.result) if job.result else None,
+        "createDate": job.createDate,
+        "startedAt": job.startedAt,
+        "finishedAt": job.finishedAt,
+    }
+
+class JobService:
+    def __init__(self, db_session: AsyncSession):
+        self.db = db_session
+
+    async def get_job(self, job_id: int) -> Optional[Dict]:
+        job = (await self.db.execute(select(Jobs).where(Jobs.id == job_id))).scalar_one_or_none()
+        return to_job_dict(job) if job else None
+
+    async def get_jobs(
+        self, client_id: Optional[int] = None, status: Optional[str] = None, cursor: Optional[str] = None, limit: int = 100,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        stmt = select(Jobs)
+        if client_id is not None:
+            stmt = stmt.where(Jobs.idClient == client_id)
+        if status is not None:
+            stmt = stmt.where(Jobs.status == status)
+        jobs, next_cursor = await keyset_page(self.db, stmt, Jobs.id, cursor, limit)
+        return [to_job_dict(j) for j in jobs], next_cursor
+
+    async def cancel_job(self, job_id: int) -> Optional[Dict]:
+        """
+        Cancela un job en cola o en ejecución. El worker que lo ejecuta lo nota al registrar el
+        siguiente avance (su UPDATE ya no afecta filas) y deja de procesarlo.
+        """
+        try:
+            await self.db.execute(
+                update(Jobs).where(Jobs.id == job_id, Jobs.status.in_((QUEUED, RUNNING)))
+                .values(status=CANCELLED, owner=None, lease_until=None, finishedAt=utcnow())
+            )
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            print(f"Error cancelling job: {e}")
+            return None
+        return await self.get_job(job_id)
+
+    async def status_counts(self) -> Dict[str, int]:
+        rows = (await self.db.execute(select(Jobs.status, func.count()).group_by(Jobs.status))).all()
+        return {status: n for status, n in rows}
@@ -0,0 +1,66 @@
+# app/services/llmService.py
+import threading
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.util.env import env, env_bool, env_float, env_int
+
+LLM_MODEL = env("LLM_MODEL", "gpt-4o-mini")
+LLM_TEMPERATURE = env_float("LLM_TEMPERATURE", 0.2)
+LLM_MAX_TOKENS = env_int("LLM_MAX_TOKENS", 700)
+LLM_TIMEOUT_SECONDS = env_float("LLM_TIMEOUT_SECONDS", 60.0)
+# Generador local sin proveedor para pruebas de carga (ver llmStub.py)
+LLM_STUB = env_bool("LLM_STUB", False)
+LLM_STUB_TOKEN_MS = env_float("LLM_STUB_TOKEN_MS", 0.0)  # latencia simulada por token
+
+SYSTEM_PROMPT = (
+    "Eres un asistente que responde en español usando únicamente el contexto proporcionado. "
+    "Si la respuesta no está en el contexto, dilo explícitamente."
+)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Cliente OpenAI asíncrono, creado una sola vez (reutiliza el pool HTTP)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import AsyncOpenAI
+                _client = AsyncOpenAI(timeout=LLM_TIMEOUT_SECONDS)  # OPENAI_API_KEY desde el entorno
+    return _client
+
+def build_messages(question: str, context_chunks: List[str], history: Optional[List[Dict]] = None) -> List[Dict]:
+    context = "\n\n".join(f"[{i}] {c}" for i, c in enumerate(context_chunks, start=1))
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    messages.extend(history or [])
+    messages.append({"role": "user", "content": f"Contexto:\n{context}\n\nPregunta: {question}"})
+    return messages
+
+async def stream_completion(messages: List[Dict]) -> AsyncIterator[str]:
+    """
+    Genera la respuesta token a token. Si el consumidor se cancela (cliente desconectado),
+    el `finally` cierra el stream HTTP y el proveedor deja de generar.
+    """
+    if LLM_STUB:
+        from app.services.llmStub import stream_stub_completion
+        async for token in stream_stub_completion(messages, LLM_MAX_TOKENS, LLM_STUB_TOKEN_MS):
+            yield token
+        return
+    stream = await get_client().chat.completions.create(
+        model=LLM_MODEL,
+        messages=messages,
+        temperature=LLM_TEMPERATURE,
+        max_tokens=LLM_MAX_TOKENS,
+        stream=True,
+    )
+    try:
+        async for event in stream:
+            if not event.choices:
+                continue
+            delta = event.choices[0].delta.content
+            if delta:
+                yield delta
+    finally:
+        await stream.close()
@@ -0,0 +1,19 @@
+# app/services/llmStub.py
+import asyncio
+import re
+from typing import AsyncIterator, Dict, List
+
+_WORD_RE = re.compile(r"\S+")
+
+
+async def stream_stub_completion(messages: List[Dict], max_tokens: int, latency_ms: float = 0.0) -> AsyncIterator[str]:
+    """
+    Sustituto del stream del proveedor LLM para pruebas de carga: "genera" hasta `max_tokens`
+    palabras tomadas del último mensaje (contexto + pregunta), una cada `latency_ms`.
+    """
+    words = _WORD_RE.findall(messages[-1]["content"] if messages else "") or ["ok"]
+    delay = latency_ms / 1000.0
+    for i in range(max(1, max_tokens)):
+        if delay:
+            await asyncio.sleep(delay)
+        yield ("" if i == 0 else " ") + words[i % len(words)]
@@ -0,0 +1,254 @@
+# app/services/modelServer.py
+"""
+Servidor de embeddings: un único proceso carga el modelo y atiende por un socket Unix a todos los
+workers de uvicorn, que así no cargan cada uno su copia (ver `EMBEDDING_SERVER_SOCKET`).
+
+    python -m app.services.modelServer --socket /run/rag/embedding.sock
+    EMBEDDING_STUB=true python -m app.services.modelServer --socket /tmp/embedding.sock   # sustituto
+
+Protocolo: cada mensaje es `<largo encabezado, largo cuerpo>` (2 x uint32 LE), un encabezado JSON y
+un cuerpo binario. Pedidos `{"op": "encode", "texts": [...]}` e `{"op": "info"}`; la respuesta a
+`encode` trae `shape`/`dtype` en el encabezado y los vectores float32 crudos en el cuerpo.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services import embeddingService
+from app.util.env import env_float
+
+EMBEDDING_SERVER_TIMEOUT = env_float("EMBEDDING_SERVER_TIMEOUT", 60.0)  # segundos por pedido
+
+_FRAME = struct.Struct("<II")
+
+
+def _encode_frame(header: Dict, payload: bytes = b"") -> bytes:
+    encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    return _FRAME.pack(len(encoded), len(payload)) + encoded + payload
+
+def _recv_exact(sock: socket.socket, n: int) -> bytearray:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        read = sock.recv_into(view[got:])
+        if read == 0:
+            raise ConnectionError("model server closed the connection")
+        got += read
+    return buf
+
+def _recv_frame(sock: socket.socket) -> Tuple[Dict, bytearray]:
+    header_len, payload_len = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    header = json.loads(_recv_exact(sock, header_len).decode("utf-8"))
+    return header, _recv_exact(sock, payload_len)
+
+async def _read_frame(reader: asyncio.StreamReader) -> Tuple[Dict, bytes]:
+    header_len, payload_len = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+    header = json.loads((await reader.readexactly(header_len)).decode("utf-8"))
+    return header, await reader.readexactly(payload_len)
+
+
+# --- Cliente (workers de la API) ---
+
+class ModelServerClient:
+    """
+    Cliente bloqueante con una conexión por hilo: lo usan el hilo del micro-batcher de consultas y
+    los hilos de los lotes de ingestión. Ante un error de conexión reconecta y reintenta una vez
+    (`encode` es idempotente).
+    """
+
+    def __init__(self, path: str, timeout: float = EMBEDDING_SERVER_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._info: Optional[Dict] = None
+        self.requests = 0
+        self.reconnects = 0
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        self._check_model()
+        header, payload = self._call({"op": "encode", "texts": list(texts)})
+        return np.frombuffer(payload, dtype=header["dtype"]).reshape(header["shape"])
+
+    def info(self) -> Dict:
+        if self._info is None:
+            self._info = self._call({"op": "info"})[0]
+        return self._info
+
+    def _check_model(self) -> None:
+        # la caché de embeddings usa el nombre del modelo como clave: no se mezclan vectores de otro
+        model = self.info().get("model")
+        if model != embeddingService.EMBEDDING_MODEL:
+            raise RuntimeError(
+                f"Model server at {self.path} serves {model!r}, expected {embeddingService.EMBEDDING_MODEL!r}."
+            )
+
+    def _call(self, request: Dict) -> Tuple[Dict, bytearray]:
+        frame = _encode_frame(request)
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None)
+            try:
+                if sock is None:
+                    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    sock.settimeout(self.timeout)
+                    sock.connect(self.path)
+                    self._local.sock = sock
+                sock.sendall(frame)
+                header, payload = _recv_frame(sock)
+            except OSError as e:
+                if sock is not None:
+                    sock.close()
+                self._local.sock = None
+                if attempt:
+                    raise ConnectionError(f"Model server at {self.path} unavailable: {e}") from e
+                self.reconnects += 1
+                continue
+            self.requests += 1
+            if not header.get("ok"):
+                raise RuntimeError(f"Model server error: {header.get('error')}")
+            return header, payload
+        raise AssertionError("unreachable")
+
+
+_client: Optional[ModelServerClient] = None
+_client_lock = threading.Lock()
+
+def model_client(path: str) -> ModelServerClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ModelServerClient(path)
+    return _client
+
+
+# --- Servidor ---
+
+class ModelServer:
+    """Atiende conexiones concurrentes; la inferencia se serializa en un hilo (torch ya usa todos los núcleos)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-server")
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.started_at = time.time()
+        self.requests = 0
+        self.texts = 0
+        self.encode_seconds = 0.0
+        self.connections = 0
+
+    async def start(self) -> None:
+        embeddingService.get_model()  # carga antes de aceptar conexiones
+        self._remove_stale_socket()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        os.chmod(self.path, 0o660)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        print(f"Model server ({embeddingService.EMBEDDING_MODEL}) listening on {self.path}")
+        await stop.wait()
+        await self.close()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            # sin wait_closed: los workers mantienen sus conexiones abiertas
+            self._server.close()
+            self._server = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def info(self) -> Dict:
+        return {
+            "ok": True,
+            "model": embeddingService.EMBEDDING_MODEL,
+            "dim": int(embeddingService.get_model().get_sentence_embedding_dimension()),
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "connections": self.connections,
+            "requests": self.requests,
+            "texts": self.texts,
+            "encode_seconds": round(self.encode_seconds, 4),
+        }
+
+    def _remove_stale_socket(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            os.remove(self.path)  # quedó de un proceso que terminó sin limpiar
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"Another model server is already listening on {self.path}")
+
+    def _encode(self, texts: Sequence[str]) -> np.ndarray:
+        started = time.perf_counter()
+        vectors = embeddingService.encode_local(texts)
+        self.encode_seconds += time.perf_counter() - started
+        return vectors
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    request, _ = await _read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                self.requests += 1
+                op = request.get("op")
+                if op == "encode":
+                    texts = request.get("texts") or []
+                    self.texts += len(texts)
+                    try:
+                        vectors = await loop.run_in_executor(self._executor, self._encode, texts)
+                    except Exception as e:
+                        print(f"Model server encode failed: {e}")
+                        writer.write(_encode_frame({"ok": False, "error": f"{e.__class__.__name__}: {e}"}))
+                    else:
+                        writer.write(_encode_frame(
+                            {"ok": True, "shape": list(vectors.shape), "dtype": vectors.dtype.str}, vectors.tobytes(),
+                        ))
+                elif op == "info":
+                    writer.write(_encode_frame(self.info()))
+                else:
+                    writer.write(_encode_frame({"ok": False, "error": f"unknown op {op!r}"}))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass  # cliente desconectado o servidor cerrándose con la conexión abierta
+        finally:
+            self.connections -= 1
+            writer.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=embeddingService.EMBEDDING_SERVER_SOCKET, help="ruta del socket Unix")
+    args = parser.parse_args()
+    if not args.socket:
+        parser.error("indique --socket o EMBEDDING_SERVER_SOCKET")
+    asyncio.run(ModelServer(args.socket).serve_forever())
+
+if __name__ == "__main__":
+    main()
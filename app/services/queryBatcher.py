@@ -0,0 +1,127 @@
+# app/services/queryBatcher.py
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.embeddingService import encode
+from app.util.env import env_float, env_int
+
+QUERY_BATCH_MAX_SIZE = env_int("QUERY_BATCH_MAX_SIZE", 32)
+QUERY_BATCH_MAX_WAIT_MS = env_float("QUERY_BATCH_MAX_WAIT_MS", 5.0)
+QUERY_EMBED_THREADS = env_int("QUERY_EMBED_THREADS", 0)  # 0 = no tocar la config de torch
+
+
+def _init_encoder_thread() -> None:
+    if QUERY_EMBED_THREADS > 0:
+        import torch
+        torch.set_num_threads(QUERY_EMBED_THREADS)
+
+
+class QueryEmbeddingBatcher:
+    """
+    Agrupa las consultas de requests concurrentes en un solo `encode`.
+    Cada lote se cierra al llegar a `max_batch` textos o tras `max_wait_ms` desde el primero,
+    y se ejecuta en un executor dedicado de un hilo (sin competir por los hilos de torch).
+    """
+
+    def __init__(self, encode_fn: Callable[[Sequence[str]], np.ndarray], max_batch: int, max_wait_ms: float):
+        self.encode_fn = encode_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-embed", initializer=_init_encoder_thread)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.items = 0
+        self.full_batches = 0
+        self.queue_wait_seconds = 0.0
+        self.encode_seconds = 0.0
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Vector (dim,) de una consulta; espera a que su lote se procese."""
+        self._ensure_started()
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, fut, time.perf_counter()))
+        return await fut
+
+    async def embed_many(self, texts: Sequence[str]) -> np.ndarray:
+        return np.vstack(await asyncio.gather(*(self.embed(t) for t in texts)))
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        avg = self.items / self.batches if self.batches else 0.0
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(avg, 3),
+            "fill_rate": round(avg / self.max_batch, 4),
+            "full_batches": self.full_batches,
+            "avg_queue_wait_ms": round(self.queue_wait_seconds / self.items * 1000, 3) if self.items else 0.0,
+            "avg_encode_ms": round(self.encode_seconds / self.batches * 1000, 3) if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+    # --- internos ---
+
+    def _ensure_started(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future, float]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            # primero lo que ya está encolado, sin esperar
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            live = [item for item in batch if not item[1].done()]  # descarta requests cancelados
+            if not live:
+                continue
+            started = time.perf_counter()
+            try:
+                vectors = await loop.run_in_executor(self._executor, self.encode_fn, [t for t, _, _ in live])
+            except Exception as e:
+                for _, fut, _ in live:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(live)
+            self.full_batches += len(live) >= self.max_batch
+            self.encode_seconds += time.perf_counter() - started
+            self.queue_wait_seconds += sum(started - queued_at for _, _, queued_at in live)
+            for (_, fut, _), vec in zip(live, vectors):
+                if not fut.done():
+                    fut.set_result(vec)
+
+
+query_batcher = QueryEmbeddingBatcher(encode, QUERY_BATCH_MAX_SIZE, QUERY_BATCH_MAX_WAIT_MS)
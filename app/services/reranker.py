@@ -0,0 +1,146 @@
+# app/services/reranker.py
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.shared.metrics import LatencyHistogram
+from app.util.env import env, env_bool, env_float, env_int
+
+# Cross-encoder multilingüe (el corpus es en español); solo CPU
+RERANK_ENABLED = env_bool("RERANK_ENABLED", False)  # valor por defecto; cada request puede pedirlo o no
+RERANK_MODEL = env("RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANK_MAX_CANDIDATES = env_int("RERANK_MAX_CANDIDATES", 30)
+RERANK_MAX_LENGTH = env_int("RERANK_MAX_LENGTH", 256)      # tokens por par (consulta + chunk)
+RERANK_BATCH_SIZE = env_int("RERANK_BATCH_SIZE", 16)       # pares por forward pass
+# Presupuesto total de la recuperación (desde que empieza) dentro del cual debe terminar el re-ranking
+RERANK_DEADLINE_MS = env_float("RERANK_DEADLINE_MS", 400.0)
+RERANK_TORCH_THREADS = env_int("RERANK_TORCH_THREADS", 0)  # 0 = no tocar la config de torch
+
+# recorte previo en caracteres: evita tokenizar chunks enteros que luego se truncan igual
+_CHARS_PER_TOKEN = 4
+
+
+def _load_cross_encoder():
+    from sentence_transformers import CrossEncoder  # import pesado (torch)
+    if RERANK_TORCH_THREADS > 0:
+        import torch
+        torch.set_num_threads(RERANK_TORCH_THREADS)
+    return CrossEncoder(RERANK_MODEL, max_length=RERANK_MAX_LENGTH, device="cpu")
+
+
+class Reranker:
+    """
+    Re-ranking con un cross-encoder en CPU sobre los candidatos de la primera etapa.
+    Puntúa en forward passes de `batch_size` pares ordenados por longitud (menos padding), en un
+    executor dedicado de un hilo. Si el plazo vence, la request sigue con el orden original y el
+    hilo abandona ese trabajo al terminar el lote en curso (un forward pass no se puede interrumpir).
+    """
+
+    def __init__(self, model_factory: Callable, max_candidates: int, max_length: int, batch_size: int):
+        self._model_factory = model_factory
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.max_candidates = max(1, max_candidates)
+        self.max_length = max(8, max_length)
+        self.batch_size = max(1, batch_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self.latency = LatencyHistogram()
+        self.calls = 0
+        self.pairs = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.errors = 0
+        self.abandoned_batches = 0
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._model_factory()
+        return self._model
+
+    async def rerank(self, query: str, passages: Sequence[str], timeout: float) -> Tuple[Optional[np.ndarray], str]:
+        """
+        Devuelve (puntajes en el orden de `passages`, "ok") o (None, motivo) si no se pudo dentro de
+        `timeout` segundos: "deadline" (no quedaba presupuesto), "timeout" o "error".
+        Solo se puntúan los primeros `max_candidates`.
+        """
+        if timeout <= 0:
+            self.skipped += 1
+            return None, "deadline"
+        passages = list(passages[: self.max_candidates])
+        cancel = threading.Event()
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        future = loop.run_in_executor(self._executor, self._score, query, passages, cancel)
+        try:
+            scores = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            cancel.set()
+            self.timeouts += 1
+            return None, "timeout"
+        except asyncio.CancelledError:
+            cancel.set()
+            raise
+        except Exception as e:
+            self.errors += 1
+            print(f"Error re-ranking: {e}")
+            return None, "error"
+        finally:
+            self.latency.observe(time.perf_counter() - started)
+        self.calls += 1
+        self.pairs += len(passages)
+        return scores, "ok"
+
+    async def warm(self) -> None:
+        """Carga el modelo y hace un forward pass en el hilo del executor."""
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._score, "warmup", ["warmup"], threading.Event()
+        )
+
+    def stats(self) -> Dict:
+        return {
+            "model": RERANK_MODEL,
+            "loaded": self._model is not None,
+            "default_enabled": RERANK_ENABLED,
+            "max_candidates": self.max_candidates,
+            "max_length": self.max_length,
+            "batch_size": self.batch_size,
+            "calls": self.calls,
+            "pairs": self.pairs,
+            "timeouts": self.timeouts,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "abandoned_batches": self.abandoned_batches,
+            "latency": self.latency.snapshot(),
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- en el hilo del executor ---
+
+    def _score(self, query: str, passages: List[str], cancel: threading.Event) -> np.ndarray:
+        model = self.model
+        max_chars = self.max_length * _CHARS_PER_TOKEN
+        query = query[:max_chars]
+        order = sorted(range(len(passages)), key=lambda i: len(passages[i]))
+        scores = np.zeros(len(passages), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            if cancel.is_set():
+                # la request ya siguió con el orden de la primera etapa
+                self.abandoned_batches += 1
+                break
+            idx = order[start:start + self.batch_size]
+            pairs = [(query, passages[i][:max_chars]) for i in idx]
+            batch_scores = model.predict(pairs, batch_size=len(pairs), show_progress_bar=False, convert_to_numpy=True)
+            scores[idx] = np.asarray(batch_scores, dtype=np.float32).reshape(-1)
+        return scores
+
+
+reranker = Reranker(_load_cross_encoder, RERANK_MAX_CANDIDATES, RERANK_MAX_LENGTH, RERANK_BATCH_SIZE)
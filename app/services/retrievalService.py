@@ -0,0 +1,126 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+import anyio
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.documentChunks import DocumentChunks
+from app.services.bm25Index import bm25_store, reciprocal_rank_fusion
+from app.services.queryBatcher import query_batcher
+from app.services.indexRegistry import index_registry
+from app.services.reranker import RERANK_DEADLINE_MS, RERANK_ENABLED, reranker
+from app.util.env import env_int
+
+RRF_K = env_int("RRF_K", 60)
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+class RetrievalService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _vector_stage(
+        self, client_id: int, query: str, n: int, timings: Dict[str, float], query_vec: Optional[np.ndarray] = None,
+        nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+    ) -> List[int]:
+        if query_vec is None:
+            t = time.perf_counter()
+            query_vec = await query_batcher.embed(query)
+            timings["embed"] = _ms(time.perf_counter() - t)
+        t = time.perf_counter()
+        found = await anyio.to_thread.run_sync(index_registry.search, client_id, query_vec, n, nprobe, ef_search)
+        timings["vector_search"] = _ms(time.perf_counter() - t)
+        if found is None:
+            return []
+        _, ids = found
+        return [int(i) for i in ids[0] if i != -1]
+
+    async def _lexical_stage(self, client_id: int, query: str, n: int, timings: Dict[str, float]) -> List[int]:
+        t = time.perf_counter()
+        index = await bm25_store.get(client_id)
+        timings["lexical_load"] = _ms(time.perf_counter() - t)
+        t = time.perf_counter()
+        ids, _ = index.search(query, n)
+        timings["lexical_search"] = _ms(time.perf_counter() - t)
+        return [int(i) for i in ids]
+
+    async def retrieve(
+        self, client_id: int, query: str, k: int = 5, candidates: int = 50, mode: str = "hybrid",
+        query_vec: Optional[np.ndarray] = None, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+        rerank: Optional[bool] = None, rerank_candidates: Optional[int] = None, deadline_ms: Optional[float] = None,
+    ) -> Dict:
+        """
+        Recuperación híbrida: FAISS (denso) y BM25 (léxico) en paralelo, fusionados con RRF.
+        Devuelve los chunks del top-k y el tiempo de cada etapa en milisegundos.
+        `query_vec` permite reutilizar un embedding ya calculado (p. ej. por la caché semántica).
+        `nprobe`/`ef_search` ajustan la búsqueda si el cliente tiene índice IVF-PQ/HNSW.
+        Con `rerank`, los primeros `rerank_candidates` fusionados se re-ordenan con el cross-encoder
+        si da tiempo dentro de `deadline_ms` (contado desde el inicio); si no, queda el orden RRF.
+        """
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        n = max(k, candidates)
+        rerank = RERANK_ENABLED if rerank is None else rerank
+        # con re-ranking se leen más candidatos de la fusión que los k que se devuelven
+        keep = max(k, min(rerank_candidates or reranker.max_candidates, reranker.max_candidates)) if rerank else k
+
+        stages = []
+        if mode in ("hybrid", "vector"):
+            stages.append(self._vector_stage(client_id, query, n, timings, query_vec, nprobe, ef_search))
+        if mode in ("hybrid", "lexical"):
+            stages.append(self._lexical_stage(client_id, query, n, timings))
+        rankings = await asyncio.gather(*stages)
+
+        t = time.perf_counter()
+        fused = reciprocal_rank_fusion(rankings, k=RRF_K)[:keep]
+        timings["fusion"] = _ms(time.perf_counter() - t)
+
+        vector_ranks = {vid: r for r, vid in enumerate(rankings[0], start=1)} if mode in ("hybrid", "vector") else {}
+        lexical_ranks = {vid: r for r, vid in enumerate(rankings[-1], start=1)} if mode in ("hybrid", "lexical") else {}
+
+        t = time.perf_counter()
+        rows = {}
+        if fused:
+            result = await self.db.execute(
+                select(DocumentChunks.vector_id, DocumentChunks.idDocument, DocumentChunks.chunk_index, DocumentChunks.content)
+                .where(DocumentChunks.idClient == client_id, DocumentChunks.vector_id.in_([vid for vid, _ in fused]))
+            )
+            rows = {r.vector_id: r for r in result.all()}
+        timings["fetch"] = _ms(time.perf_counter() - t)
+
+        results = []
+        for vid, score in fused:
+            row = rows.get(vid)
+            if row is None:
+                continue  # el chunk se borró entre la búsqueda y la lectura
+            results.append({
+                "vector_id": vid,
+                "idDocument": row.idDocument,
+                "chunk_index": row.chunk_index,
+                "content": row.content,
+                "score": round(score, 6),
+                "vector_rank": vector_ranks.get(vid),
+                "lexical_rank": lexical_ranks.get(vid),
+            })
+        rerank_status = None
+        if rerank and results:
+            budget = (RERANK_DEADLINE_MS if deadline_ms is None else deadline_ms) / 1000
+            t = time.perf_counter()
+            scores, rerank_status = await reranker.rerank(
+                query, [r["content"] for r in results], budget - (t - started)
+            )
+            timings["rerank"] = _ms(time.perf_counter() - t)
+            if scores is not None:
+                for r, s in zip(results, scores):
+                    r["rerank_score"] = round(float(s), 6)
+                # los que quedaron fuera del tope del cross-encoder van detrás, en su orden RRF
+                results.sort(key=lambda r: -r.get("rerank_score", float("-inf")))
+        results = results[:k]
+        timings["total"] = _ms(time.perf_counter() - started)
+        return {"results": results, "timings_ms": timings, "rerank_status": rerank_status}
@@ -0,0 +1,214 @@
+# app/services/semanticCache.py
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import exists, select
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chats import Chats
+from app.models.users import Users
+from app.services.documentChanges import ChangeFeed
+from app.util.env import env_bool, env_float, env_int
+
+SEMANTIC_CACHE_ENABLED = env_bool("SEMANTIC_CACHE_ENABLED", True)
+SEMANTIC_CACHE_THRESHOLD = env_float("SEMANTIC_CACHE_THRESHOLD", 0.92)  # similitud coseno mínima
+SEMANTIC_CACHE_TTL_SECONDS = env_int("SEMANTIC_CACHE_TTL_SECONDS", 24 * 3600)
+SEMANTIC_CACHE_MAX_ENTRIES = env_int("SEMANTIC_CACHE_MAX_ENTRIES", 2000)  # por cliente
+
+# `persist_exchange` recorta pregunta y respuesta al largo de la columna: una fila que lo alcanza
+# puede estar cortada y no se usa para precargar
+_MESSAGE_LIMIT = Chats.__table__.c.message.type.length
+_RESPONSE_LIMIT = Chats.__table__.c.response.type.length
+# lo mismo con la lista de fuentes: a menos de un id de llenarse pudo perder ids (ver `sources_json`)
+_SOURCES_LIMIT = Chats.__table__.c.source_documents.type.length - len(", -9223372036854775808")
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    doc_ids: FrozenSet[int]
+    created_at: float
+    similarity: float = 0.0
+
+
+def _source_ids(raw: Optional[str]) -> Optional[List[int]]:
+    """Ids de `Chats.source_documents`; None si no es una lista de ids completa."""
+    if raw is not None and len(raw) > _SOURCES_LIMIT:
+        return None
+    try:
+        ids = json.loads(raw or "[]")
+    except ValueError:
+        return None
+    if not isinstance(ids, list) or not all(isinstance(d, int) for d in ids):
+        return None
+    return ids
+
+
+class _ClientCache:
+    """Matriz de embeddings (filas = preguntas) + metadatos; la búsqueda es un solo producto matriz-vector."""
+
+    def __init__(self, dim: int, capacity: int):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.created = np.zeros(capacity, dtype=np.float64)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.entries: List[Optional[CachedAnswer]] = [None] * capacity
+
+    def free_slot(self) -> int:
+        free = np.flatnonzero(~self.alive)
+        if free.size:
+            return int(free[0])
+        return int(np.argmin(self.last_used))  # LRU
+
+    def drop(self, slots: Iterable[int]) -> int:
+        n = 0
+        for slot in slots:
+            if self.alive[slot]:
+                self.alive[slot] = False
+                self.entries[slot] = None
+                n += 1
+        return n
+
+
+class SemanticCache:
+    """
+    Caché semántica de respuestas por cliente: si una pregunta nueva está a más de `threshold`
+    de similitud de una ya respondida, se devuelve esa respuesta sin recuperar ni llamar al LLM.
+    Las entradas caducan por TTL y se invalidan cuando cambian sus documentos fuente
+    (también los cambios hechos por otros workers, vía `documentChanges`).
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: int, max_entries: int):
+        self.threshold = threshold
+        self.ttl = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._clients: Dict[int, _ClientCache] = {}
+        self._feed = ChangeFeed()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def lookup(self, client_id: int, query_vec: np.ndarray) -> Optional[CachedAnswer]:
+        with self._lock:
+            self._sync_changes(client_id)
+            cache = self._clients.get(client_id)
+            if cache is None or not cache.alive.any():
+                self.misses += 1
+                return None
+            now = time.time()
+            expired = cache.alive & (cache.created < now - self.ttl)
+            if expired.any():
+                cache.drop(np.flatnonzero(expired))
+            sims = cache.vectors @ np.asarray(query_vec, dtype=np.float32).ravel()
+            sims[~cache.alive] = -1.0
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            cache.last_used[best] = now
+            entry = cache.entries[best]
+            return CachedAnswer(entry.question, entry.answer, entry.doc_ids, entry.created_at, float(sims[best]))
+
+    def add(self, client_id: int, query_vec: np.ndarray, question: str, answer: str, doc_ids: Iterable[int]) -> None:
+        if not answer:
+            return
+        vec = np.asarray(query_vec, dtype=np.float32).ravel()
+        with self._lock:
+            self._sync_changes(client_id)
+            cache = self._clients.get(client_id)
+            if cache is None:
+                cache = self._clients[client_id] = _ClientCache(vec.shape[0], self.max_entries)
+            slot = cache.free_slot()
+            now = time.time()
+            cache.vectors[slot] = vec
+            cache.alive[slot] = True
+            cache.created[slot] = now
+            cache.last_used[slot] = now
+            cache.entries[slot] = CachedAnswer(question, answer, frozenset(int(d) for d in doc_ids), now)
+
+    def invalidate_documents(self, client_id: int, doc_ids: Iterable[int]) -> int:
+        with self._lock:
+            return self._invalidate_documents(client_id, set(int(d) for d in doc_ids))
+
+    def invalidate_client(self, client_id: int) -> None:
+        with self._lock:
+            cache = self._clients.pop(client_id, None)
+            if cache is not None:
+                self.invalidations += int(cache.alive.sum())
+
+    async def warm(self, client_id: int, db: AsyncSession, embed_many, limit: int = 500) -> int:
+        """
+        Precarga la caché con los últimos pares pregunta/respuesta del cliente. Solo primeros
+        turnos de sesión: una respuesta que dependía del historial no vale para otra pregunta. Se
+        omiten las filas recortadas al largo de la columna (no se sirve una respuesta incompleta).
+        """
+        earlier = aliased(Chats)
+        result = await db.execute(
+            select(Chats.message, Chats.response, Chats.source_documents)
+            .join(Users, Users.id == Chats.idUser)
+            .where(Users.idClient == client_id, Chats.response.is_not(None), Chats.swt == True)  # noqa: E712
+            .where(~exists().where(
+                earlier.session_id == Chats.session_id, earlier.idUser == Chats.idUser, earlier.id < Chats.id
+            ))
+            .order_by(Chats.id.desc())
+            .limit(min(limit, self.max_entries))
+        )
+        rows = [
+            r for r in result.all()
+            if r.response and len(r.response) < _RESPONSE_LIMIT and len(r.message or "") < _MESSAGE_LIMIT
+        ]
+        if not rows:
+            return 0
+        # sin la lista completa de fuentes la entrada no se invalidaría al cambiar sus documentos
+        rows = [(r, ids) for r in rows if (ids := _source_ids(r.source_documents)) is not None]
+        if not rows:
+            return 0
+        vectors = await embed_many([r.message for r, _ in rows])
+        for (r, doc_ids), vec in zip(reversed(rows), vectors[::-1]):
+            self.add(client_id, vec, r.message, r.response, doc_ids)
+        return len(rows)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "clients": len(self._clients),
+                "entries": int(sum(c.alive.sum() for c in self._clients.values())),
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+    # --- internos (con self._lock tomado) ---
+
+    def _sync_changes(self, client_id: int) -> None:
+        reset, doc_ids = self._feed.poll(client_id)
+        if reset:
+            cache = self._clients.pop(client_id, None)
+            if cache is not None:
+                self.invalidations += int(cache.alive.sum())
+        elif doc_ids:
+            self._invalidate_documents(client_id, doc_ids)
+
+    def _invalidate_documents(self, client_id: int, doc_ids: set) -> int:
+        cache = self._clients.get(client_id)
+        if cache is None or not doc_ids:
+            return 0
+        stale = [i for i, e in enumerate(cache.entries) if e is not None and e.doc_ids & doc_ids]
+        n = cache.drop(stale)
+        self.invalidations += n
+        return n
+
+
+semantic_cache = SemanticCache(SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL_SECONDS, SEMANTIC_CACHE_MAX_ENTRIES)
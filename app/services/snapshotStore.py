@@ -0,0 +1,160 @@
+# app/services/snapshotStore.py
+import json
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Formato: MAGIC | largo del encabezado (uint64 LE) | encabezado JSON | arreglos alineados a página.
+# Un snapshot publicado no se modifica nunca: una versión nueva es otro archivo que reemplaza al
+# anterior con un rename atómico, y quien tenga mapeado el viejo sigue leyendo su inodo intacto.
+MAGIC = b"RAGSNAP1"
+_ALIGN = mmap.PAGESIZE
+_PREFIX = struct.Struct("<8sQ")
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class SnapshotWriter:
+    """
+    Escribe un snapshot a un temporal y lo publica al cerrar. Los arreglos se declaran de antemano
+    (dtype y forma) y se llenan por bloques de filas con `write`, así que escribir millones de
+    vectores no exige tenerlos todos en memoria.
+
+        with SnapshotWriter(path, {"ids": (np.int64, (n,)), "vectors": (np.float32, (n, d))}) as w:
+            w.write("ids", ids)
+            for block in blocks:
+                w.write("vectors", block)
+    """
+
+    def __init__(self, path: str, layout: Dict[str, Tuple[object, Sequence[int]]], meta: Optional[Dict] = None):
+        self.path = path
+        self._tmp = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        self._arrays: Dict[str, Dict] = {}
+        header = {"meta": meta or {}, "arrays": {}}
+        for name, (dtype, shape) in layout.items():
+            dtype = np.dtype(dtype)
+            shape = tuple(int(s) for s in shape)
+            self._arrays[name] = {
+                "dtype": dtype,
+                "shape": shape,
+                "nbytes": int(np.prod(shape, dtype=np.int64)) * dtype.itemsize,
+                "written": 0,
+            }
+            header["arrays"][name] = {"dtype": dtype.str, "shape": list(shape), "offset": 0}
+        # los offsets dependen del largo del encabezado, que depende de los offsets: se itera hasta fijarlos
+        while True:
+            offset = _aligned(_PREFIX.size + len(json.dumps(header).encode("utf-8")))
+            changed = False
+            for name, spec in self._arrays.items():
+                if header["arrays"][name]["offset"] != offset:
+                    header["arrays"][name]["offset"] = offset
+                    changed = True
+                spec["offset"] = offset
+                offset = _aligned(offset + spec["nbytes"])
+            if not changed:
+                break
+        self.size = max((s["offset"] + s["nbytes"] for s in self._arrays.values()), default=0)
+        encoded = json.dumps(header).encode("utf-8")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(self._tmp, "wb")
+        self._file.write(_PREFIX.pack(MAGIC, len(encoded)))
+        self._file.write(encoded)
+
+    def write(self, name: str, block: np.ndarray) -> None:
+        """Agrega filas al arreglo `name` (en orden)."""
+        spec = self._arrays[name]
+        data = np.ascontiguousarray(block, dtype=spec["dtype"])
+        if spec["written"] + data.nbytes > spec["nbytes"]:
+            raise ValueError(f"snapshot: {name} recibe más datos que su forma declarada {spec['shape']}")
+        if not data.nbytes:
+            return
+        self._file.seek(spec["offset"] + spec["written"])
+        self._file.write(memoryview(data).cast("B"))
+        spec["written"] += data.nbytes
+
+    def commit(self) -> None:
+        incomplete = [n for n, s in self._arrays.items() if s["written"] != s["nbytes"]]
+        if incomplete:
+            raise ValueError(f"snapshot incompleto: {', '.join(incomplete)}")
+        self._file.truncate(self.size)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp, self.path)  # atómico: los lectores ven el snapshot viejo o el nuevo
+
+    def abort(self) -> None:
+        self._file.close()
+        try:
+            os.remove(self._tmp)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+def write_snapshot(path: str, arrays: Dict[str, np.ndarray], meta: Optional[Dict] = None) -> None:
+    """Publica arreglos que ya están en memoria."""
+    arrays = {name: np.asarray(a) for name, a in arrays.items()}
+    with SnapshotWriter(path, {name: (a.dtype, a.shape) for name, a in arrays.items()}, meta) as writer:
+        for name, a in arrays.items():
+            writer.write(name, a)
+
+
+class Snapshot:
+    """
+    Snapshot abierto: cada arreglo es una vista numpy de solo lectura sobre un único mmap del
+    archivo, así que todos los workers que lo abren comparten las mismas páginas del page cache.
+    """
+
+    def __init__(self, path: str, meta: Dict, arrays: Dict[str, np.ndarray], nbytes: int, mapped: bool):
+        self.path = path
+        self.meta = meta
+        self.arrays = arrays
+        self.nbytes = nbytes
+        self.mapped = mapped
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.arrays
+
+
+def open_snapshot(path: str, use_mmap: bool = True) -> Snapshot:
+    """Abre un snapshot de solo lectura; sin mmap lo lee completo a memoria (privada del proceso)."""
+    with open(path, "rb") as f:
+        magic, header_len = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} no es un snapshot")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+        if use_mmap:
+            # el mmap se mantiene vivo mientras alguna vista lo referencie
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            f.seek(0)
+            buffer = f.read()
+    arrays: Dict[str, np.ndarray] = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        count = int(np.prod(shape, dtype=np.int64))
+        if count == 0:
+            array = np.empty(shape, dtype=dtype)
+        else:
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=spec["offset"]).reshape(shape)
+        array.flags.writeable = False
+        arrays[name] = array
+    return Snapshot(path, header.get("meta", {}), arrays, len(buffer), use_mmap)
@@ -1,8 +1,11 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from sqlalchemy import select as Select
 from sqlalchemy.exc import SQLAlchemyError
+from app.models.clients import Clients
 from app.models.tableXClients import TableXClients
-from app.schemas.tablesXclientDto import createTablesXclientDto, updateTablesXclientDto
+from app.schemas.tablesXclientDto import createTablesXclientDto, updateTablesXclientDto, BulkUpdateTablesXclientDto
+from app.shared.bulk import delete_by_id, insert_rows, item_error, item_ok, summarize, update_by_id
+from app.shared.pagination import keyset_page
 from sqlalchemy.ext.asyncio import AsyncSession
 class tablesXclientService:
     def __init__(self, db: AsyncSession):
@@ -12,10 +15,15 @@ class tablesXclientService:
         result = await self.db.execute(Select(TableXClients).where(TableXClients.id == table_id))
         return result.scalar_one_or_none()
 
-    async def get_tables(self, skip: int = 0, limit: int = 100) -> List[TableXClients]:
-        stmt = Select(TableXClients).offset(skip).limit(limit)
-        result = await self.db.execute(stmt)
-        return result.scalars().all()
+    async def get_tables(
+        self, cursor: Optional[str] = None, limit: int = 100, swt: Optional[bool] = None, idClient: Optional[int] = None,
+    ) -> Tuple[List[TableXClients], Optional[str]]:
+        stmt = Select(TableXClients)
+        if swt is not None:
+            stmt = stmt.where(TableXClients.swt == swt)
+        if idClient is not None:
+            stmt = stmt.where(TableXClients.idClient == idClient)
+        return await keyset_page(self.db, stmt, TableXClients.id, cursor, limit)
 
     async def create_table(self, table_data: createTablesXclientDto) -> Optional[TableXClients]:
         table = TableXClients(**table_data.dict())
@@ -53,4 +61,44 @@ class tablesXclientService:
             return True
         except SQLAlchemyError:
             await self.db.rollback()
-            return False
\ No newline at end of file
+            return False
+
+    # --- Operaciones en lote ---
+
+    async def _missing_clients(self, client_ids: List[int]) -> set:
+        ids = {c for c in client_ids if c is not None}
+        if not ids:
+            return set()
+        found = set((await self.db.execute(Select(Clients.id).where(Clients.id.in_(ids)))).scalars().all())
+        return ids - found
+
+    async def create_tables_bulk(self, items: List[createTablesXclientDto]) -> Dict:
+        """Inserta el lote con INSERT multi-fila en una transacción; valida antes que exista cada idClient."""
+        missing = await self._missing_clients([t.idClient for t in items])
+        results = [item_error(i, "Client not found.") for i, t in enumerate(items) if t.idClient in missing]
+        valid = [(i, t) for i, t in enumerate(items) if t.idClient not in missing]
+        try:
+            await insert_rows(self.db, TableXClients, [t.dict(exclude={"createDate"}) for _, t in valid])
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            print(f"Error creating tables in bulk: {e}")
+            results.extend(item_error(i, f"db error: {e.__class__.__name__}") for i, _ in valid)
+            return summarize(results)
+        # sin clave única natural no hay forma portable de recuperar los ids sin RETURNING
+        results.extend(item_ok(i) for i, _ in valid)
+        return summarize(results)
+
+    async def update_tables_bulk(self, items: List[BulkUpdateTablesXclientDto]) -> Dict:
+        missing = await self._missing_clients([t.idClient for t in items if "idClient" in t.dict(exclude_unset=True)])
+        results = [item_error(i, "Client not found.") for i, t in enumerate(items) if t.idClient in missing]
+        bad = {r["index"] for r in results}
+        valid = [(i, t) for i, t in enumerate(items) if i not in bad]
+        updated = await update_by_id(self.db, TableXClients, [t.dict(exclude_unset=True) | {"id": t.id} for _, t in valid])
+        # update_by_id numera sobre la sublista: se traduce al índice original
+        for r in updated:
+            r["index"] = valid[r["index"]][0]
+        return summarize(results + updated)
+
+    async def delete_tables_bulk(self, ids: List[int]) -> Dict:
+        return summarize(await delete_by_id(self.db, TableXClients, ids))
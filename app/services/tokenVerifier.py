@@ -0,0 +1,216 @@
+# app/services/tokenVerifier.py
+import asyncio
+import base64
+import hashlib
+import json
+import time
+from typing import Dict, Optional
+
+import httpx
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey, RSAPublicNumbers
+
+from app.shared.ttlCache import TTLCache
+from app.util.env import env, env_float, env_int
+
+COGNITO_REGION = env("COGNITO_REGION")
+COGNITO_USER_POOL_ID = env("COGNITO_USER_POOL_ID")
+COGNITO_APP_CLIENT_ID = env("COGNITO_APP_CLIENT_ID")
+COGNITO_ISSUER = env(
+    "COGNITO_ISSUER",
+    f"https://cognito-idp.{COGNITO_REGION}.amazonaws.com/{COGNITO_USER_POOL_ID}" if COGNITO_REGION and COGNITO_USER_POOL_ID else None,
+)
+COGNITO_JWKS_URL = env("COGNITO_JWKS_URL", f"{COGNITO_ISSUER}/.well-known/jwks.json" if COGNITO_ISSUER else None)
+# Alternativa local a la URL (pruebas / entornos sin salida a internet)
+COGNITO_JWKS_FILE = env("COGNITO_JWKS_FILE")
+JWKS_REFRESH_SECONDS = env_float("JWKS_REFRESH_SECONDS", 3600.0)
+JWKS_MIN_REFRESH_SECONDS = env_float("JWKS_MIN_REFRESH_SECONDS", 60.0)  # ante kids desconocidos
+JWT_LEEWAY_SECONDS = env_float("JWT_LEEWAY_SECONDS", 30.0)
+TOKEN_CACHE_MAX_ENTRIES = env_int("TOKEN_CACHE_MAX_ENTRIES", 10_000)
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+def _rsa_key(jwk: Dict) -> RSAPublicKey:
+    n = int.from_bytes(_b64decode(jwk["n"]), "big")
+    e = int.from_bytes(_b64decode(jwk["e"]), "big")
+    return RSAPublicNumbers(e, n).public_key()
+
+
+class JWKSCache:
+    """
+    Claves públicas del User Pool por `kid`. Se cargan al arrancar y se refrescan en segundo
+    plano; la verificación nunca espera a la red (un kid desconocido solo agenda un refresco).
+    """
+
+    def __init__(self, url: Optional[str], path: Optional[str], refresh_seconds: float, min_refresh_seconds: float):
+        self.url = url
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self._keys: Dict[str, RSAPublicKey] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._last_attempt = 0.0
+        self.loaded_at = 0.0
+        self.refreshes = 0
+        self.failures = 0
+
+    def load(self, jwks: Dict) -> int:
+        keys = {k["kid"]: _rsa_key(k) for k in jwks.get("keys", []) if k.get("kty") == "RSA" and "kid" in k}
+        self._keys = keys  # reemplazo atómico: los lectores ven el dict viejo o el nuevo
+        self.loaded_at = time.time()
+        return len(keys)
+
+    def get(self, kid: str) -> Optional[RSAPublicKey]:
+        return self._keys.get(kid)
+
+    async def refresh(self) -> int:
+        self._last_attempt = time.monotonic()
+        if self.path:
+            def _read():
+                with open(self.path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            jwks = await asyncio.to_thread(_read)
+        elif self.url:
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                resp = await client.get(self.url)
+                resp.raise_for_status()
+                jwks = resp.json()
+        else:
+            raise RuntimeError("Sin origen de JWKS: defina COGNITO_JWKS_URL o COGNITO_JWKS_FILE.")
+        n = self.load(jwks)
+        self.refreshes += 1
+        return n
+
+    def request_refresh(self) -> None:
+        """Pide un refresco anticipado (rotación de claves), como mucho uno cada `min_refresh_seconds`."""
+        if self._wakeup is not None and time.monotonic() - self._last_attempt >= self.min_refresh_seconds:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        try:
+            await self.refresh()
+        except Exception as e:
+            self.failures += 1
+            print(f"Error loading JWKS: {e}")
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            # sin claves reintentamos pronto; con claves, cada refresh_seconds o cuando lo pidan
+            timeout = self.refresh_seconds if self._keys else self.min_refresh_seconds
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                print(f"Error refreshing JWKS: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "source": self.path or self.url,
+            "keys": sorted(self._keys),
+            "loaded_at": self.loaded_at,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
+
+
+class TokenVerifier:
+    """
+    Verifica localmente tokens de acceso e ID de Cognito (RS256): firma contra el JWKS cacheado,
+    `exp`/`nbf`, `iss`, `token_use` y el app client (`client_id` o `aud`). Los tokens ya verificados
+    se recuerdan por hash hasta su `exp`, así que una petición repetida no vuelve a comprobar la firma.
+    """
+
+    def __init__(self, jwks: JWKSCache, issuer: Optional[str], client_id: Optional[str],
+                 leeway: float = JWT_LEEWAY_SECONDS, cache_entries: int = TOKEN_CACHE_MAX_ENTRIES):
+        self.jwks = jwks
+        self.issuer = issuer
+        self.client_id = client_id
+        self.leeway = leeway
+        self._cache = TTLCache(cache_entries, 0.0)
+        self.rejected = 0
+
+    def verify(self, token: str) -> Dict:
+        key = hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+        found, claims = self._cache.get(key)
+        if found:
+            return dict(claims)
+        try:
+            claims = self._verify(token)
+        except InvalidToken:
+            self.rejected += 1
+            raise
+        ttl = float(claims["exp"]) - time.time()
+        if ttl > 0:
+            self._cache.set(key, claims, ttl=ttl)
+        return dict(claims)
+
+    def _verify(self, token: str) -> Dict:
+        try:
+            header_b64, payload_b64, signature_b64 = token.split(".")
+            header = json.loads(_b64decode(header_b64))
+            claims = json.loads(_b64decode(payload_b64))
+            signature = _b64decode(signature_b64)
+        except (ValueError, TypeError):
+            raise InvalidToken("Token mal formado.")
+        if not isinstance(header, dict) or not isinstance(claims, dict):
+            raise InvalidToken("Token mal formado.")
+        if header.get("alg") != "RS256":
+            raise InvalidToken("Algoritmo no soportado.")
+        public_key = self.jwks.get(header.get("kid"))
+        if public_key is None:
+            self.jwks.request_refresh()
+            raise InvalidToken("Clave de firma desconocida.")
+        try:
+            public_key.verify(signature, f"{header_b64}.{payload_b64}".encode("utf-8"), padding.PKCS1v15(), hashes.SHA256())
+        except InvalidSignature:
+            raise InvalidToken("Firma inválida.")
+
+        now = time.time()
+        if not isinstance(claims.get("exp"), (int, float)) or claims["exp"] < now - self.leeway:
+            raise InvalidToken("Token expirado.")
+        if isinstance(claims.get("nbf"), (int, float)) and claims["nbf"] > now + self.leeway:
+            raise InvalidToken("Token aún no válido.")
+        if self.issuer and claims.get("iss") != self.issuer:
+            raise InvalidToken("Emisor inválido.")
+        token_use = claims.get("token_use")
+        if token_use == "access":
+            audience = claims.get("client_id")
+        elif token_use == "id":
+            audience = claims.get("aud")
+        else:
+            raise InvalidToken("token_use inválido.")
+        if self.client_id and audience != self.client_id:
+            raise InvalidToken("Token emitido para otro cliente.")
+        return claims
+
+    def stats(self) -> Dict:
+        return {"verified_cache": self._cache.stats(), "rejected": self.rejected, "jwks": self.jwks.stats()}
+
+
+jwks_cache = JWKSCache(COGNITO_JWKS_URL, COGNITO_JWKS_FILE, JWKS_REFRESH_SECONDS, JWKS_MIN_REFRESH_SECONDS)
+token_verifier = TokenVerifier(jwks_cache, COGNITO_ISSUER, COGNITO_APP_CLIENT_ID)
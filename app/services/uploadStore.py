@@ -0,0 +1,79 @@
+# app/services/uploadStore.py
+import os
+import re
+import uuid
+from typing import AsyncIterator, Optional, Tuple
+
+import anyio
+
+from app.util.env import env, env_int
+
+# Archivos subidos: <UPLOAD_DIR>/client_<id>/<uuid>_<nombre>; Documents.file_path apunta aquí
+UPLOAD_DIR = env("UPLOAD_DIR", "data/uploads")
+UPLOAD_MAX_BYTES = env_int("UPLOAD_MAX_BYTES", 1024 * 1024 * 1024)
+UPLOAD_WRITE_BUFFER = env_int("UPLOAD_WRITE_BUFFER", 1024 * 1024)  # bytes acumulados por escritura a disco
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def safe_name(filename: str) -> str:
+    stem, ext = os.path.splitext(os.path.basename(filename or ""))
+    stem = _UNSAFE.sub("_", stem).strip("._")[:100] or "file"
+    return stem + _UNSAFE.sub("", ext)[:16].lower()
+
+def client_dir(client_id: int) -> str:
+    return os.path.join(UPLOAD_DIR, f"client_{int(client_id)}")
+
+def is_upload(path: Optional[str], client_id: int) -> bool:
+    """
+    True si `path` es un archivo subido por este cliente (y no una referencia externa ni un
+    archivo de otro tenant): solo esos se leen al ingerir y se borran con el documento.
+    """
+    if not path:
+        return False
+    root = os.path.realpath(client_dir(client_id)) + os.sep
+    return os.path.realpath(path).startswith(root)
+
+async def save_stream(client_id: int, filename: str, chunks: AsyncIterator[bytes],
+                      max_bytes: int = UPLOAD_MAX_BYTES) -> Tuple[str, int]:
+    """
+    Escribe el cuerpo de la petición en disco a medida que llega, en escrituras de
+    `UPLOAD_WRITE_BUFFER` bytes hechas fuera del event loop. La memoria usada no depende del
+    tamaño del archivo. Se escribe a un `.part` y se renombra al terminar; si la subida se corta
+    o excede `max_bytes`, el parcial se borra. Devuelve (ruta, bytes).
+    """
+    directory = client_dir(client_id)
+    path = os.path.join(directory, f"{uuid.uuid4().hex}_{safe_name(filename)}")
+    tmp = path + ".part"
+    await anyio.to_thread.run_sync(lambda: os.makedirs(directory, exist_ok=True))
+    size = 0
+    buf = bytearray()
+    try:
+        async with await anyio.open_file(tmp, "wb") as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"El archivo excede {max_bytes} bytes.")
+                buf += chunk
+                if len(buf) >= UPLOAD_WRITE_BUFFER:
+                    await f.write(buf)
+                    buf.clear()
+            if buf:
+                await f.write(buf)
+        await anyio.to_thread.run_sync(os.replace, tmp, path)
+    except BaseException:
+        with anyio.CancelScope(shield=True):
+            await anyio.to_thread.run_sync(delete_file, tmp)
+        raise
+    return path, size
+
+def delete_file(path: Optional[str]) -> bool:
+    try:
+        os.remove(path)
+    except (FileNotFoundError, TypeError):
+        return False
+    return True
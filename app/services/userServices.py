@@ -1,8 +1,11 @@
-from typing import List, Optional
-from sqlalchemy import select
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, or_
 from sqlalchemy.exc import SQLAlchemyError
+from app.models.clients import Clients
 from app.models.users import Users
-from app.schemas.usersDto import CreateUsersDto, UpdateUsersDto
+from app.schemas.usersDto import CreateUsersDto, UpdateUsersDto, BulkUpdateUsersDto
+from app.shared.bulk import delete_by_id, find_duplicates, insert_rows, summarize, update_by_id
+from app.shared.pagination import keyset_page
 from sqlalchemy.ext.asyncio import AsyncSession
 
 class UserService:
@@ -13,10 +16,15 @@ class UserService:
         result = await self.db.execute(select(Users).where(Users.id == user_id))
         return result.scalar_one_or_none()
 
-    async def get_users(self, skip: int = 0, limit: int = 100) -> List[Users]:
-        stmt = select(Users).offset(skip).limit(limit)
-        result = await self.db.execute(stmt)
-        return result.scalars().all()
+    async def get_users(
+        self, cursor: Optional[str] = None, limit: int = 100, swt: Optional[bool] = None, idClient: Optional[int] = None,
+    ) -> Tuple[List[Users], Optional[str]]:
+        stmt = select(Users)
+        if swt is not None:
+            stmt = stmt.where(Users.swt == swt)
+        if idClient is not None:
+            stmt = stmt.where(Users.idClient == idClient)
+        return await keyset_page(self.db, stmt, Users.id, cursor, limit)
 
     async def create_user(self, user_in: CreateUsersDto) -> Optional[Users]:
         user = Users(**user_in.dict())
@@ -54,4 +62,59 @@ class UserService:
             return True
         except SQLAlchemyError:
             await self.db.rollback()
-            return False
\ No newline at end of file
+            return False
+
+    # --- Operaciones en lote ---
+
+    async def validate_new_users(self, items: List[CreateUsersDto]) -> Dict[int, str]:
+        """Errores por índice (username/email repetidos o ya existentes, cliente inexistente)."""
+        errors: Dict[int, str] = {}
+        for field in ("username", "email"):
+            for i in find_duplicates([getattr(u, field) for u in items]):
+                errors.setdefault(i, f"{field} repetido en el lote")
+        if not items:
+            return errors
+        taken = (await self.db.execute(
+            select(Users.username, Users.email).where(or_(
+                Users.username.in_([u.username for u in items]),
+                Users.email.in_([u.email for u in items]),
+            ))
+        )).all()
+        taken_usernames = {t.username for t in taken}
+        taken_emails = {t.email for t in taken}
+        client_ids = {u.idClient for u in items}
+        found_clients = set((await self.db.execute(select(Clients.id).where(Clients.id.in_(client_ids)))).scalars().all())
+        for i, u in enumerate(items):
+            if u.username in taken_usernames:
+                errors.setdefault(i, "User with this username already exists.")
+            elif u.email in taken_emails:
+                errors.setdefault(i, "User with this email already exists.")
+            elif u.idClient not in found_clients:
+                errors.setdefault(i, "Client not found.")
+        return errors
+
+    async def insert_users_bulk(self, items: List[CreateUsersDto]) -> Tuple[Optional[Dict[str, int]], Optional[str]]:
+        """
+        INSERT multi-fila de usuarios ya validados en una transacción.
+        Devuelve ({username: id}, None) o (None, error) si la transacción falló.
+        """
+        if not items:
+            return {}, None
+        try:
+            await insert_rows(self.db, Users, [u.dict(exclude={"createDate"}) for u in items])
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            print(f"Error creating users in bulk: {e}")
+            return None, f"db error: {e.__class__.__name__}"
+        ids = dict((await self.db.execute(
+            select(Users.username, Users.id).where(Users.username.in_([u.username for u in items]))
+        )).all())
+        return ids, None
+
+    async def update_users_bulk(self, items: List[BulkUpdateUsersDto]) -> Dict:
+        rows = [item.dict(exclude_unset=True) | {"id": item.id} for item in items]
+        return summarize(await update_by_id(self.db, Users, rows))
+
+    async def delete_users_bulk(self, ids: List[int]) -> Dict:
+        return summarize(await delete_by_id(self.db, Users, ids))
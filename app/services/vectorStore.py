@@ -0,0 +1,547 @@
+# app/services/vectorStore.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+from filelock import FileLock, Timeout
+
+from app.services import deltaLog
+from app.services.snapshotStore import SnapshotWriter, open_snapshot
+from app.util.env import env, env_float, env_int
+
+# Vectores por cliente: <VECTOR_STORE_DIR>/client_<id>.vectors (+ índice ANN FAISS opcional)
+VECTOR_STORE_DIR = env("VECTOR_STORE_DIR", "data/indexes")
+# Las escrituras van a un delta (client_<id>.vectors.delta); se compacta en segundo plano cuando las
+# filas agregadas + las ocultadas del base superan el mayor de estos dos umbrales
+VECTOR_COMPACT_MIN_ROWS = env_int("VECTOR_COMPACT_MIN_ROWS", 20_000)
+VECTOR_COMPACT_RATIO = env_float("VECTOR_COMPACT_RATIO", 0.05)
+# Filas del base ocultadas (reemplazadas o borradas) que disparan la compactación por sí solas: la
+# búsqueda tiene que saltearlas. Hasta VECTOR_SEARCH_OVERFETCH se piden de más al buscar.
+VECTOR_COMPACT_MAX_HIDDEN = env_int("VECTOR_COMPACT_MAX_HIDDEN", 2_000)
+VECTOR_SEARCH_OVERFETCH = env_int("VECTOR_SEARCH_OVERFETCH", 256)
+
+# id de vector = (Documents.id << 20) | chunk_index  -> hasta ~1M chunks por documento
+_CHUNK_BITS = 20
+_CHUNK_MASK = (1 << _CHUNK_BITS) - 1
+MAX_CHUNKS_PER_DOCUMENT = 1 << _CHUNK_BITS
+
+
+def make_vector_id(doc_id: int, chunk_index: int) -> int:
+    return (int(doc_id) << _CHUNK_BITS) | int(chunk_index)
+
+def document_vector_ids(doc_id: int, count: int) -> np.ndarray:
+    """ids de los chunks 0..count-1 de un documento."""
+    return (np.int64(doc_id) << np.int64(_CHUNK_BITS)) | np.arange(count, dtype=np.int64)
+
+def document_vector_ids_start(doc_ids: np.ndarray) -> np.ndarray:
+    """Primer id posible de cada documento: los ids de un documento son un rango contiguo."""
+    return np.asarray(doc_ids, dtype=np.int64) << np.int64(_CHUNK_BITS)
+
+def split_vector_id(vector_id: int) -> Tuple[int, int]:
+    vector_id = int(vector_id)
+    return vector_id >> _CHUNK_BITS, vector_id & _CHUNK_MASK
+
+def vector_doc_ids(vector_ids: np.ndarray) -> np.ndarray:
+    """Documents.id de cada id de vector (vectorizado)."""
+    return np.asarray(vector_ids, dtype=np.int64) >> _CHUNK_BITS
+
+def index_path(client_id: int) -> str:
+    """Vectores planos del cliente: snapshot inmutable (ver snapshotStore), fuente exacta del resto."""
+    return os.path.join(VECTOR_STORE_DIR, f"client_{int(client_id)}.vectors")
+
+def delta_path(client_id: int) -> str:
+    """Cambios posteriores al snapshot de vectores (ver deltaLog); los fusiona `compact`."""
+    return index_path(client_id) + ".delta"
+
+def legacy_index_path(client_id: int) -> str:
+    """Índice FAISS plano de versiones anteriores; se convierte a snapshot al abrirlo."""
+    return os.path.join(VECTOR_STORE_DIR, f"client_{int(client_id)}.faiss")
+
+def ann_path(client_id: int) -> str:
+    """Índice ANN derivado del plano (ver annIndex); solo lectura para las consultas."""
+    return os.path.join(VECTOR_STORE_DIR, f"client_{int(client_id)}.ann.faiss")
+
+def ann_dirty_paths(client_id: int) -> Tuple[str, str]:
+    """(documentos cambiados desde el último ANN publicado, ídem durante un build en curso)."""
+    base = os.path.join(VECTOR_STORE_DIR, f"client_{int(client_id)}.ann.dirty")
+    return base, base + ".building"
+
+def client_lock(client_id: int) -> FileLock:
+    # serializa escrituras del mismo cliente entre workers de uvicorn
+    os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
+    return FileLock(index_path(client_id) + ".lock")
+
+def new_index(dim: int):
+    """Índice FAISS plano en memoria (deltas de consulta y benchmarks)."""
+    import faiss
+    return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+
+def open_index(path: str, use_mmap: bool = True):
+    """Abre un índice de solo lectura; con mmap el SO comparte las páginas entre workers."""
+    import faiss
+    if not use_mmap:
+        return faiss.read_index(path)
+    flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
+    try:
+        return faiss.read_index(path, flags)
+    except RuntimeError:
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        # tipos de índice sin soporte de mmap: se cargan en RAM
+        return faiss.read_index(path)
+
+
+class FlatVectors:
+    """
+    Vectores e ids de un cliente (búsqueda exacta por producto interno). Sobre un snapshot los
+    arreglos son vistas de solo lectura del mmap: N workers comparten una sola copia en el page
+    cache, sin el id_map ni el rev_map que FAISS arma en memoria privada de cada proceso. El
+    snapshot trae además los ids ordenados, para ubicar un id sin construir nada al abrir.
+
+    Con delta (ver deltaLog), `ids`/`vectors` son los del snapshot base: las filas de documentos
+    reemplazados o borrados desde entonces (`dead`) se ocultan y las nuevas viven en `delta`, un
+    FlatVectors chico en memoria. Las posiciones [0, base_ntotal) son del base y las siguientes del
+    delta; `take`/`ids_at` leen de ambos.
+    """
+
+    def __init__(self, ids: np.ndarray, vectors: np.ndarray, sorted_ids: np.ndarray, positions: np.ndarray,
+                 nbytes: Optional[int] = None, delta: Optional["FlatVectors"] = None,
+                 removed_docs: Optional[np.ndarray] = None, generation: int = 0):
+        self.ids = ids
+        self.vectors = vectors
+        self.sorted_ids = sorted_ids
+        self.positions = positions
+        self.nbytes = nbytes if nbytes is not None else ids.nbytes + vectors.nbytes + sorted_ids.nbytes + positions.nbytes
+        self.delta = delta if delta is not None and delta.ntotal else None
+        self.generation = generation
+        self.dead = self._dead_positions(removed_docs)
+        if self.delta is not None:
+            self.nbytes += self.delta.nbytes
+
+    @classmethod
+    def from_arrays(cls, ids: np.ndarray, vectors: np.ndarray) -> "FlatVectors":
+        ids = np.ascontiguousarray(ids, dtype=np.int64)
+        positions = np.argsort(ids, kind="stable")
+        return cls(ids, np.ascontiguousarray(vectors, dtype=np.float32), ids[positions], positions)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, delta: Optional[deltaLog.Delta] = None) -> "FlatVectors":
+        layer = removed = None
+        if delta is not None:
+            ids, vectors, removed = delta.resolve(vector_doc_ids)
+            if vectors is not None:
+                layer = cls.from_arrays(ids, vectors)
+        return cls(
+            snapshot["ids"], snapshot["vectors"], snapshot["sorted_ids"], snapshot["positions"], snapshot.nbytes,
+            layer, removed, int(snapshot.meta.get("generation", 0)),
+        )
+
+    def _dead_positions(self, removed_docs: Optional[np.ndarray]) -> np.ndarray:
+        """Posiciones del base de los documentos borrados: rangos contiguos en `sorted_ids`."""
+        if removed_docs is None or not len(removed_docs) or not self.base_ntotal:
+            return np.empty(0, dtype=np.int64)
+        lo = np.searchsorted(self.sorted_ids, document_vector_ids_start(removed_docs), "left")
+        hi = np.searchsorted(self.sorted_ids, document_vector_ids_start(removed_docs + 1), "left")
+        if not (hi > lo).any():
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate([self.positions[a:b] for a, b in zip(lo, hi) if b > a]))
+
+    @property
+    def base_ntotal(self) -> int:
+        return int(self.ids.shape[0])
+
+    @property
+    def ntotal(self) -> int:
+        return self.base_ntotal - int(self.dead.size) + (self.delta.ntotal if self.delta is not None else 0)
+
+    @property
+    def d(self) -> int:
+        if self.base_ntotal == 0 and self.delta is not None:
+            return self.delta.d
+        return int(self.vectors.shape[1])
+
+    @property
+    def layered(self) -> bool:
+        return self.delta is not None or bool(self.dead.size)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k exacto; mismo contrato que `IndexFlatIP.search` (ids -1 si hay menos de k)."""
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+        if not self.layered:
+            return _knn(self.vectors, self.ids, queries, k)
+        D, I = self._search_base(queries, k)
+        if self.delta is not None:
+            Dd, Id = self.delta.search(queries, k)
+            D, I = np.hstack([D, Dd]), np.hstack([I, Id])
+        order = np.argsort(-D, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+    def _search_base(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k del base sin las filas ocultas (ids -1 / -inf si hay menos de k vivas)."""
+        if not self.dead.size:
+            return _knn(self.vectors, self.ids, queries, k)
+        # las filas ocultas pueden ocupar lugares del top: se piden algunas de más (acotado) y las
+        # consultas que aun así quedan cortas se resuelven con un recorrido que las excluye
+        D, pos = _knn(
+            self.vectors, np.arange(self.base_ntotal, dtype=np.int64), queries,
+            k + min(int(self.dead.size), VECTOR_SEARCH_OVERFETCH),
+        )
+        valid = (pos >= 0) & ~self._is_dead(pos)
+        order = np.argsort(~valid, axis=1, kind="stable")[:, :k]
+        D = np.where(np.take_along_axis(valid, order, axis=1), np.take_along_axis(D, order, axis=1), -np.inf)
+        pos = np.where(np.isfinite(D), np.take_along_axis(pos, order, axis=1), -1)
+        short = np.isfinite(D).sum(axis=1) < min(k, self.base_ntotal - int(self.dead.size))
+        if short.any():
+            D[short], pos[short] = self._scan_live(queries[short], k)
+        return D, np.where(pos >= 0, self.ids[np.maximum(pos, 0)], -1)
+
+    def _scan_live(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k exacto de las filas vivas del base por bloques: (puntajes, posiciones)."""
+        keep = np.ones(self.base_ntotal, dtype=bool)
+        keep[self.dead] = False
+        D = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        pos = np.full((len(queries), k), -1, dtype=np.int64)
+        for i in range(0, self.base_ntotal, _BLOCK_ROWS):
+            scores = queries @ np.asarray(self.vectors[i:i + _BLOCK_ROWS]).T
+            scores[:, ~keep[i:i + _BLOCK_ROWS]] = -np.inf
+            top = np.argpartition(-scores, min(k, scores.shape[1]) - 1, axis=1)[:, :k]
+            D = np.hstack([D, np.take_along_axis(scores, top, axis=1)])
+            pos = np.hstack([pos, top + i])
+            order = np.argsort(-D, axis=1, kind="stable")[:, :k]
+            D, pos = np.take_along_axis(D, order, axis=1), np.take_along_axis(pos, order, axis=1)
+        return D, np.where(np.isfinite(D), pos, -1)
+
+    def locate(self, ids: np.ndarray) -> np.ndarray:
+        """Posición de cada id (-1 si no está)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if self.base_ntotal == 0:
+            out = np.full(ids.shape, -1, dtype=np.int64)
+        else:
+            at = np.minimum(np.searchsorted(self.sorted_ids, ids), self.base_ntotal - 1)
+            out = np.where(self.sorted_ids[at] == ids, self.positions[at], -1)
+            out = np.where(self._is_dead(out), -1, out)
+        if self.delta is not None:
+            in_delta = self.delta.locate(ids)
+            out = np.where(in_delta >= 0, self.base_ntotal + in_delta, out)
+        return out
+
+    def document_positions(self, doc_ids: np.ndarray) -> np.ndarray:
+        """Posiciones de todos los vectores de `doc_ids`."""
+        pos = np.flatnonzero(np.isin(vector_doc_ids(self.ids), doc_ids))
+        pos = pos[~self._is_dead(pos)]
+        if self.delta is not None:
+            pos = np.concatenate([pos, self.base_ntotal + self.delta.document_positions(doc_ids)])
+        return pos
+
+    def take(self, positions: np.ndarray) -> np.ndarray:
+        """Vectores en `positions` (del base o del delta), como arreglo contiguo."""
+        positions = np.asarray(positions, dtype=np.int64)
+        if self.delta is None:
+            return np.ascontiguousarray(self.vectors[positions], dtype=np.float32)
+        out = np.empty((len(positions), self.d), dtype=np.float32)
+        base = positions < self.base_ntotal
+        out[base] = self.vectors[positions[base]]
+        out[~base] = self.delta.vectors[positions[~base] - self.base_ntotal]
+        return out
+
+    def ids_at(self, positions: np.ndarray) -> np.ndarray:
+        positions = np.asarray(positions, dtype=np.int64)
+        if self.delta is None:
+            return self.ids[positions]
+        base = positions < self.base_ntotal
+        return np.where(base, self.ids[np.where(base, positions, 0)] if self.base_ntotal else -1,
+                        self.delta.ids[np.where(base, 0, positions - self.base_ntotal)])
+
+    def live_positions(self) -> np.ndarray:
+        pos = np.arange(self.base_ntotal, dtype=np.int64)
+        if self.dead.size:
+            pos = np.delete(pos, self.dead)
+        if self.delta is not None:
+            pos = np.concatenate([pos, self.base_ntotal + np.arange(self.delta.ntotal, dtype=np.int64)])
+        return pos
+
+    def blocks(self, rows: int = 65_536):
+        """(ids, vectores) de las filas vivas por bloques: base sin las ocultas y después el delta."""
+        keep = None
+        if self.dead.size:
+            keep = np.ones(self.base_ntotal, dtype=bool)
+            keep[self.dead] = False
+        for i in range(0, self.base_ntotal, rows):
+            ids, vectors = self.ids[i:i + rows], self.vectors[i:i + rows]
+            if keep is not None:
+                ids, vectors = ids[keep[i:i + rows]], vectors[keep[i:i + rows]]
+            if len(ids):
+                yield ids, vectors
+        if self.delta is not None:
+            yield self.delta.ids, self.delta.vectors
+
+    def _is_dead(self, positions: np.ndarray) -> np.ndarray:
+        if not self.dead.size:
+            return np.zeros(np.shape(positions), dtype=bool)
+        at = np.minimum(np.searchsorted(self.dead, positions), self.dead.size - 1)
+        return self.dead[at] == positions
+
+
+def _knn(vectors: np.ndarray, ids: np.ndarray, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    import faiss
+    n = int(ids.shape[0])
+    if n == 0:
+        return np.full((len(queries), k), -np.inf, dtype=np.float32), np.full((len(queries), k), -1, dtype=np.int64)
+    # faiss.knn recorre los arreglos numpy tal cual (sin copiarlos a un índice)
+    D, pos = faiss.knn(queries, vectors, min(k, n), metric=faiss.METRIC_INNER_PRODUCT)
+    I = np.where(pos >= 0, ids[np.maximum(pos, 0)], -1)
+    if k > n:
+        pad = k - n
+        D = np.hstack([D, np.full((len(queries), pad), -np.inf, dtype=np.float32)])
+        I = np.hstack([I, np.full((len(queries), pad), -1, dtype=np.int64)])
+    return D, I
+
+
+_BLOCK_ROWS = 65_536
+
+
+def _publish_vectors(client_id: int, parts, generation: int = 0, commit: bool = True):
+    """
+    Escribe un snapshot nuevo con la concatenación de `parts` [(ids, bloques, dim)]; `bloques` es
+    una función que entrega los vectores por partes (el plano anterior no se copia entero a RAM).
+    Se llama con el lock del cliente tomado, salvo la compactación, que pide `commit=False` y
+    publica después con el lock (devuelve el writer sin confirmar).
+    """
+    ids = np.concatenate([np.asarray(p_ids, dtype=np.int64) for p_ids, _, _ in parts])
+    dim = parts[0][2]
+    positions = np.argsort(ids, kind="stable")
+    layout = {
+        "ids": (np.int64, ids.shape),
+        "vectors": (np.float32, (len(ids), dim)),
+        "sorted_ids": (np.int64, ids.shape),
+        "positions": (np.int64, ids.shape),
+    }
+    writer = SnapshotWriter(index_path(client_id), layout, {"dim": dim, "generation": generation})
+    try:
+        writer.write("ids", ids)
+        writer.write("sorted_ids", ids[positions])
+        writer.write("positions", positions)
+        for _, blocks, _ in parts:
+            for block in blocks():
+                writer.write("vectors", block)
+    except BaseException:
+        writer.abort()
+        raise
+    if not commit:
+        return writer
+    writer.commit()
+    return len(ids)
+
+def _convert_legacy(client_id: int) -> None:
+    """`client_<id>.faiss` (IndexIDMap2 plano) -> snapshot, por bloques. Con el lock tomado."""
+    import faiss
+    legacy = legacy_index_path(client_id)
+    if os.path.exists(index_path(client_id)) or not os.path.exists(legacy):
+        return
+    index = open_index(legacy, True)
+    flat = faiss.downcast_index(index.index)
+    n = int(index.ntotal)
+
+    def blocks():
+        for i in range(0, n, _BLOCK_ROWS):
+            yield flat.reconstruct_n(i, min(_BLOCK_ROWS, n - i))
+
+    _publish_vectors(client_id, [(faiss.vector_to_array(index.id_map), blocks, int(index.d))])
+    os.remove(legacy)
+
+def _open_layered(client_id: int, use_mmap: bool) -> Optional[FlatVectors]:
+    snapshot = open_snapshot(index_path(client_id), use_mmap)
+    delta = deltaLog.read(delta_path(client_id), int(snapshot.meta.get("generation", 0)), np.float32)
+    return FlatVectors.from_snapshot(snapshot, delta)
+
+def open_vectors_locked(client_id: int, use_mmap: bool = True) -> Optional[FlatVectors]:
+    """Como `open_vectors`, para quien ya tiene el lock del cliente."""
+    _convert_legacy(client_id)
+    try:
+        return _open_layered(client_id, use_mmap)
+    except FileNotFoundError:
+        return None
+
+def _file_version(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+def open_vectors(client_id: int, use_mmap: bool = True) -> Optional[FlatVectors]:
+    """
+    Vectores del cliente para consultas (solo lectura). None si aún no tiene. Sin lock: si una
+    compactación reemplaza el base entre que se abre y se lee el delta, se reintenta.
+    """
+    path = index_path(client_id)
+    for _ in range(3):
+        version = _file_version(path)
+        if version is None:
+            break
+        try:
+            flat = _open_layered(client_id, use_mmap)
+        except (FileNotFoundError, deltaLog.DeltaAhead):
+            continue
+        if _file_version(path) == version:
+            return flat
+    if _file_version(path) is None and not os.path.exists(legacy_index_path(client_id)):
+        return None
+    with client_lock(client_id):
+        return open_vectors_locked(client_id, use_mmap)
+
+def _mark_ann_dirty(client_id: int, doc_ids: Iterable[int]) -> None:
+    """
+    Con un ANN publicado (o en construcción) anota los documentos cambiados: las consultas los
+    toman del plano hasta el próximo build. Se llama con el lock tomado y antes de guardar el plano.
+    """
+    dirty, building = ann_dirty_paths(client_id)
+    line = " ".join(str(int(d)) for d in doc_ids)
+    if line and (os.path.exists(ann_path(client_id)) or os.path.exists(building)):
+        with open(dirty, "a", encoding="ascii") as f:
+            f.write(line + "\n")
+
+def needs_compaction(base_rows: int, delta: deltaLog.Delta, max_hidden: Optional[int] = None) -> bool:
+    """
+    Umbral de compactación de un delta (vectores o firmas de dedup) sobre un base de `base_rows`
+    filas; con `max_hidden`, también cuando las filas ocultadas del base lo superan.
+    """
+    if max_hidden is not None and delta.hidden > max_hidden:
+        return True
+    pending = delta.rows + delta.hidden
+    return pending > max(VECTOR_COMPACT_MIN_ROWS, VECTOR_COMPACT_RATIO * base_rows)
+
+def upsert_document_vectors(client_id: int, doc_ids: Iterable[int], ids: np.ndarray, vectors: np.ndarray) -> int:
+    """
+    Reemplaza en bloque los vectores de `doc_ids` por `vectors`/`ids`. Con un snapshot publicado
+    agrega un frame al delta (costo proporcional al cambio, no al corpus); la fusión la hace la
+    compactación en segundo plano. Devuelve el total de vectores vivos.
+    """
+    doc_ids = np.asarray(list(doc_ids), dtype=np.int64)
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    with client_lock(client_id):
+        current = open_vectors_locked(client_id)
+        if current is None:
+            if len(ids) == 0:
+                return 0
+            # primera escritura: el snapshot es solo lo nuevo
+            return _publish_vectors(client_id, [(ids, lambda: [vectors], int(vectors.shape[1]))])
+        if len(ids) and vectors.shape[1] != current.d:
+            raise ValueError(f"Dimensión {vectors.shape[1]} distinta de la del índice ({current.d}).")
+        hidden = int(current.document_positions(doc_ids).size)
+        _mark_ann_dirty(client_id, set(doc_ids.tolist()) | set(np.unique(vector_doc_ids(ids)).tolist()))
+        delta = deltaLog.append(
+            delta_path(client_id), current.generation, doc_ids, ids, vectors.reshape(len(ids), -1), hidden,
+        )
+        total = current.ntotal - hidden + len(ids)
+    if needs_compaction(current.base_ntotal, delta, VECTOR_COMPACT_MAX_HIDDEN):
+        compactor.schedule(client_id)
+    return total
+
+def remove_documents(client_id: int, doc_ids: Iterable[int]) -> Optional[int]:
+    doc_ids = np.asarray(list(doc_ids), dtype=np.int64)
+    with client_lock(client_id):
+        current = open_vectors_locked(client_id)
+        if current is None:
+            return None
+        removed = int(current.document_positions(doc_ids).size)
+        if not removed:
+            return 0
+        _mark_ann_dirty(client_id, doc_ids.tolist())
+        delta = deltaLog.append(
+            delta_path(client_id), current.generation, doc_ids,
+            np.empty(0, dtype=np.int64), np.empty((0, current.d), dtype=np.float32), removed,
+        )
+    if needs_compaction(current.base_ntotal, delta, VECTOR_COMPACT_MAX_HIDDEN):
+        compactor.schedule(client_id)
+    return removed
+
+def compact(client_id: int) -> Optional[int]:
+    """
+    Fusiona base + delta en un snapshot nuevo (generación +1). La escritura, O(corpus), corre sin
+    el lock del cliente: los frames que lleguen mientras tanto pasan al delta de la generación
+    nueva. None si no había nada que fusionar u otro worker ya lo está haciendo.
+    """
+    lock = FileLock(index_path(client_id) + ".compact.lock")
+    try:
+        lock.acquire(timeout=0)
+    except Timeout:
+        return None
+    try:
+        with client_lock(client_id):
+            current = open_vectors_locked(client_id)
+            delta = deltaLog.read(delta_path(client_id), current.generation, np.float32) if current is not None else None
+        if delta is None or not delta.frames:
+            return None
+        # el base es inmutable y el delta solo crece: lo leído hasta `delta.end` no cambia
+        ids = current.ids_at(current.live_positions())
+        blocks = lambda: (vectors for _, vectors in current.blocks(_BLOCK_ROWS))
+        writer = _publish_vectors(client_id, [(ids, blocks, current.d)], current.generation + 1, commit=False)
+        with client_lock(client_id):
+            if not deltaLog.rebase(delta_path(client_id), current.generation, current.generation + 1, delta.end, np.float32):
+                writer.abort()
+                return None
+            # el delta nuevo ya está publicado: quien abra el base viejo ahora ve DeltaAhead y reintenta
+            writer.commit()
+        return current.ntotal
+    finally:
+        lock.release()
+
+
+class Compactor:
+    """
+    Compactaciones en segundo plano (mismo esquema que annIndex.IndexBuilder): una a la vez por
+    cliente y archivo. `task` es la función que compacta (`compact` de los vectores o de dedupIndex).
+    """
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending: Set[Tuple[str, int]] = set()
+        self.compactions = 0
+        self.failures = 0
+
+    def schedule(self, client_id: int, task: Optional[Callable[[int], Optional[int]]] = None) -> bool:
+        task = task or compact
+        key = (task.__module__.rsplit(".", 1)[-1], int(client_id))
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="compact")
+        self._executor.submit(self._run, key, task)
+        return True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "pending": [{"store": store, "client_id": client_id} for store, client_id in sorted(self._pending)],
+                "compactions": self.compactions,
+                "failures": self.failures,
+            }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _run(self, key: Tuple[str, int], task: Callable[[int], Optional[int]]) -> None:
+        store, client_id = key
+        try:
+            if task(client_id) is not None:
+                with self._lock:
+                    self.compactions += 1
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+            print(f"Error compacting {store} for client {client_id}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+
+compactor = Compactor()
@@ -0,0 +1,150 @@
+# app/services/warmup.py
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+import anyio
+import numpy as np
+from sqlalchemy import func, select
+
+from app.db.session import ReadSessionLocal
+from app.models.chats import Chats
+from app.models.users import Users
+from app.services.bm25Index import bm25_store
+from app.services.indexRegistry import index_registry
+from app.services.queryBatcher import query_batcher
+from app.services.reranker import RERANK_ENABLED, reranker
+from app.util.env import env, env_bool, env_float, env_int
+from app.util.tokens import get_tokenizer
+
+WARMUP_ENABLED = env_bool("WARMUP_ENABLED", True)
+WARMUP_EMBEDDING_MODEL = env_bool("WARMUP_EMBEDDING_MODEL", True)
+# Clientes a precargar: lista explícita "1,2,3" o, si no, los más activos recientemente en el chat
+WARMUP_CLIENT_IDS = env("WARMUP_CLIENT_IDS")
+WARMUP_HOT_CLIENTS = env_int("WARMUP_HOT_CLIENTS", 5)
+WARMUP_RETRY_SECONDS = env_float("WARMUP_RETRY_SECONDS", 15.0)  # reintento de pasos fallidos (BD aún no disponible, etc.)
+
+
+def _warm_vector_index(client_id: int) -> bool:
+    index = index_registry.get(client_id)
+    if index is None or index.ntotal == 0:
+        return False
+    # una búsqueda recorre los vectores y deja las páginas del mmap en memoria
+    index_registry.search(client_id, np.zeros((1, index.d), dtype=np.float32), 1)
+    return True
+
+
+class Readiness:
+    """
+    Calentamiento en segundo plano al arrancar: modelo de embeddings (vía el mismo batcher que usan
+    las consultas) e índices FAISS/BM25 de los clientes más activos. `/ready` responde 200 solo
+    cuando todos los pasos terminaron bien (los fallidos se reintentan); `/health` sigue indicando
+    únicamente que el proceso vive.
+    """
+
+    def __init__(self, enabled: bool = WARMUP_ENABLED):
+        self.enabled = enabled
+        self.steps: Dict[str, str] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.attempts = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        if not self.enabled:
+            return True
+        return self.finished_at is not None
+
+    def start(self) -> None:
+        if not self.enabled or self._task is not None:
+            return
+        self.started_at = time.time()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    def status(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "enabled": self.enabled,
+            "attempts": self.attempts,
+            "steps": dict(self.steps),
+            "seconds": round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            self.attempts += 1
+            if WARMUP_EMBEDDING_MODEL:
+                await self._step("embedding_model", self._warm_model)
+            await self._step("tokenizer", self._warm_tokenizer)
+            if RERANK_ENABLED:
+                await self._step("rerank_model", reranker.warm)
+            client_ids = await self._hot_clients()
+            for client_id in client_ids:
+                await self._step(f"client_{client_id}", self._warm_client, client_id)
+            if all(v in ("ok", "skipped") for v in self.steps.values()):
+                self.finished_at = time.time()
+                return
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+
+    async def _step(self, name: str, fn, *args) -> None:
+        if self.steps.get(name) in ("ok", "skipped"):
+            return
+        self.steps[name] = "pending"
+        try:
+            result = await fn(*args)
+            self.steps[name] = "skipped" if result is False else "ok"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.steps[name] = f"error: {e.__class__.__name__}: {e}"
+            print(f"Warm-up step {name} failed: {e}")
+
+    async def _warm_model(self) -> bool:
+        await query_batcher.embed("warmup")
+        return True
+
+    async def _warm_tokenizer(self) -> bool:
+        # sin tokenizer la memoria de conversación estima tokens: no bloquea la disponibilidad
+        return await anyio.to_thread.run_sync(get_tokenizer) is not None
+
+    async def _warm_client(self, client_id: int) -> bool:
+        has_vectors = await anyio.to_thread.run_sync(_warm_vector_index, client_id)
+        if not has_vectors:
+            return False
+        # bm25_store lo construye desde el primario (se persiste para todos los workers)
+        await bm25_store.get(client_id)
+        return True
+
+    async def _hot_clients(self) -> List[int]:
+        if WARMUP_CLIENT_IDS:
+            return [int(c) for c in WARMUP_CLIENT_IDS.split(",") if c.strip().isdigit()]
+        if WARMUP_HOT_CLIENTS <= 0:
+            return []
+        if self.steps.get("hot_clients") == "ok":
+            return [int(k.split("_", 1)[1]) for k in self.steps if k.startswith("client_")]
+        self.steps["hot_clients"] = "pending"
+        try:
+            async with ReadSessionLocal() as db:
+                result = await db.execute(
+                    select(Users.idClient)
+                    .join(Chats, Chats.idUser == Users.id)
+                    .group_by(Users.idClient)
+                    .order_by(func.max(Chats.id).desc())
+                    .limit(WARMUP_HOT_CLIENTS)
+                )
+                ids = [int(r[0]) for r in result.all() if r[0] is not None]
+        except Exception as e:
+            self.steps["hot_clients"] = f"error: {e.__class__.__name__}: {e}"
+            print(f"Warm-up could not list hot clients: {e}")
+            return []
+        self.steps["hot_clients"] = "ok"
+        return ids
+
+
+readiness = Readiness()
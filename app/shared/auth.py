@@ -0,0 +1,44 @@
+# app/shared/auth.py
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.security import HTTPBearer
+
+from app.services.tokenVerifier import InvalidToken, token_verifier
+from app.util.env import env_bool
+
+# Con AUTH_ENABLED=false (por defecto) las rutas siguen abiertas como hasta ahora
+AUTH_ENABLED = env_bool("AUTH_ENABLED", False)
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+async def get_token_claims(request: Request) -> Dict:
+    """Claims del token Bearer de Cognito, verificado localmente; 401 si falta o no es válido."""
+    credentials = await _bearer(request)
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Token requerido.", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        claims = token_verifier.verify(credentials.credentials)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+    request.state.claims = claims
+    return claims
+
+
+async def require_auth(request: Request) -> Optional[Dict]:
+    """Dependencia de router: exige token solo si AUTH_ENABLED."""
+    if not AUTH_ENABLED:
+        return None
+    return await get_token_claims(request)
+
+
+def token_matches_user(claims: Optional[Dict], username: str, email: str) -> bool:
+    """
+    El token es del usuario: los usuarios se crean en Cognito con el email como Username, así que
+    se compara `username` (access token) o `cognito:username`/`email` (id token) con el de la fila.
+    """
+    if not claims:
+        return False
+    names = {str(claims[k]).strip().lower() for k in ("username", "cognito:username", "email") if claims.get(k)}
+    return bool(names & {(username or "").strip().lower(), (email or "").strip().lower()})
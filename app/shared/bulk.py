@@ -0,0 +1,84 @@
+# app/shared/bulk.py
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.util.env import env_int
+
+BULK_MAX_ITEMS = env_int("BULK_MAX_ITEMS", 5000)
+BULK_INSERT_BATCH_SIZE = env_int("BULK_INSERT_BATCH_SIZE", 1000)  # filas por INSERT multi-fila
+
+
+def item_ok(index: int, id: Optional[int] = None) -> Dict:
+    return {"index": index, "ok": True, "id": id, "error": None}
+
+def item_error(index: int, error: str) -> Dict:
+    return {"index": index, "ok": False, "id": None, "error": error}
+
+def summarize(items: Iterable[Dict]) -> Dict:
+    items = sorted(items, key=lambda i: i["index"])
+    ok = sum(1 for i in items if i["ok"])
+    return {"succeeded": ok, "failed": len(items) - ok, "items": items}
+
+def find_duplicates(values: List[Any]) -> Dict[int, Any]:
+    """Índices cuyo valor ya apareció antes en la misma lista."""
+    seen = set()
+    dups = {}
+    for i, v in enumerate(values):
+        if v is None:
+            continue
+        if v in seen:
+            dups[i] = v
+        seen.add(v)
+    return dups
+
+async def insert_rows(db: AsyncSession, model, rows: List[Dict], batch_size: int = BULK_INSERT_BATCH_SIZE) -> None:
+    """INSERT multi-fila en lotes; no hace commit (la transacción la controla el servicio)."""
+    for i in range(0, len(rows), batch_size):
+        await db.execute(insert(model), rows[i:i + batch_size])
+
+async def update_by_id(db: AsyncSession, model, rows: List[Dict]) -> List[Dict]:
+    """
+    ORM bulk UPDATE por clave primaria en una transacción (`rows[i]` debe incluir `id`).
+    Devuelve el resultado por ítem; ids inexistentes o repetidos se reportan como error.
+    """
+    ids = [r["id"] for r in rows]
+    existing = set((await db.execute(select(model.id).where(model.id.in_(ids)))).scalars().all()) if ids else set()
+    dups = find_duplicates(ids)
+    results: List[Dict] = []
+    valid: List[Dict] = []
+    for i, row in enumerate(rows):
+        if i in dups:
+            results.append(item_error(i, f"id {row['id']} repetido en el lote"))
+        elif row["id"] not in existing:
+            results.append(item_error(i, "not found"))
+        else:
+            valid.append({"index": i, "row": row})
+    try:
+        if valid:
+            await db.execute(update(model), [v["row"] for v in valid])
+        await db.commit()
+        results.extend(item_ok(v["index"], v["row"]["id"]) for v in valid)
+    except SQLAlchemyError as e:
+        await db.rollback()
+        results.extend(item_error(v["index"], f"db error: {e.__class__.__name__}") for v in valid)
+    return results
+
+async def delete_by_id(db: AsyncSession, model, ids: List[int]) -> List[Dict]:
+    """DELETE ... WHERE id IN (...) en una transacción; ids inexistentes se reportan como error."""
+    existing = set((await db.execute(select(model.id).where(model.id.in_(ids)))).scalars().all()) if ids else set()
+    dups = find_duplicates(ids)
+    results = [item_error(i, "not found") for i, id_ in enumerate(ids) if id_ not in existing]
+    valid = [(i, id_) for i, id_ in enumerate(ids) if id_ in existing and i not in dups]
+    results.extend(item_error(i, f"id {ids[i]} repetido en el lote") for i in dups if ids[i] in existing)
+    try:
+        if valid:
+            await db.execute(delete(model).where(model.id.in_([id_ for _, id_ in valid])))
+        await db.commit()
+        results.extend(item_ok(i, id_) for i, id_ in valid)
+    except SQLAlchemyError as e:
+        await db.rollback()
+        results.extend(item_error(i, f"db error: {e.__class__.__name__}") for i, _ in valid)
+    return results
@@ -0,0 +1,22 @@
+from typing import Generic, List, Optional, TypeVar
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+class PageDto(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None  # None -> no hay más páginas
+
+class BulkItemResultDto(BaseModel):
+    index: int                  # posición del ítem en la lista enviada
+    ok: bool
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkResultDto(BaseModel):
+    succeeded: int
+    failed: int
+    items: List[BulkItemResultDto]
+
+class BulkDeleteDto(BaseModel):
+    ids: List[int]
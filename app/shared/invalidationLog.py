@@ -0,0 +1,56 @@
+# app/shared/invalidationLog.py
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from filelock import FileLock
+
+
+class InvalidationLog:
+    """Una línea JSON por escritura; cada worker lee desde su último offset."""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._offset: Optional[int] = None
+
+    def publish(self, message: Dict) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with FileLock(self.path + ".lock"):
+            mode = "a"
+            try:
+                if os.path.getsize(self.path) > self.max_bytes:
+                    mode = "w"
+            except FileNotFoundError:
+                pass
+            with open(self.path, mode, encoding="utf-8") as f:
+                f.write(json.dumps(message) + "\n")
+
+    def poll(self) -> Tuple[bool, List[Dict]]:
+        """(reset, mensajes) desde la última llamada; `reset` si el registro se truncó."""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            # si se crea después, todo su contenido es nuevo para nosotros
+            self._offset = 0
+            return False, []
+        if self._offset is None:
+            self._offset = size
+            return False, []
+        if size == self._offset:
+            return False, []
+        if size < self._offset:
+            self._offset = size
+            return True, []
+        with open(self.path, "r", encoding="utf-8") as f:
+            f.seek(self._offset)
+            data = f.read(size - self._offset)
+        end = data.rfind("\n") + 1
+        self._offset += len(data[:end].encode("utf-8"))
+        return False, [json.loads(line) for line in data[:end].splitlines() if line]
+
+    def skip_to_end(self) -> None:
+        try:
+            self._offset = os.path.getsize(self.path)
+        except FileNotFoundError:
+            self._offset = 0
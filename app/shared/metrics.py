@@ -0,0 +1,88 @@
+# app/shared/metrics.py
+import bisect
+import threading
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Límites superiores en segundos (estilo Prometheus); el último bucket es +Inf
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """Histograma acumulable de latencias con buckets fijos; barato de observar desde cualquier hilo."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """Aproximación por el límite superior del bucket que contiene el cuantil."""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return 0.0
+        rank, seen = q * total, 0
+        for i, c in enumerate(counts):
+            seen += c
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            count, total, counts = self.count, self.sum, list(self.counts)
+        return {
+            "count": count,
+            "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+            "p50_ms": self.quantile(0.50) * 1000,
+            "p95_ms": self.quantile(0.95) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+            "buckets": {("+Inf" if i == len(self.buckets) else str(self.buckets[i])): c for i, c in enumerate(counts)},
+        }
+
+    def cumulative(self) -> Tuple[List[Tuple[str, int]], int, float]:
+        """Buckets acumulados `le` (incluye +Inf), total y suma, como los expone Prometheus."""
+        with self._lock:
+            counts, count, total = list(self.counts), self.count, self.sum
+        out, seen = [], 0
+        for i, c in enumerate(counts):
+            seen += c
+            out.append(("+Inf" if i == len(self.buckets) else repr(float(self.buckets[i])), seen))
+        return out, count, total
+
+
+# --- Formato de texto de Prometheus (exposición 0.0.4) ---
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labels: Iterable[Tuple[str, str]]) -> str:
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + inner + "}" if inner else ""
+
+def prometheus_histogram(name: str, help_text: str, series: Mapping[Labels, LatencyHistogram]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, hist in series.items():
+        buckets, count, total = hist.cumulative()
+        for le, c in buckets:
+            lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {c}")
+        lines.append(f"{name}_sum{_labels(labels)} {total!r}")
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+    return lines
+
+def prometheus_metric(name: str, kind: str, help_text: str, series: Mapping[Labels, float]) -> List[str]:
+    """Serie de un contador (`counter`) o valor instantáneo (`gauge`)."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{_labels(labels)} {value}" for labels, value in series.items())
+    return lines
@@ -0,0 +1,40 @@
+# app/shared/pagination.py
+import base64
+import json
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def encode_cursor(last_id: int) -> str:
+    """Token opaco para la página siguiente (el cliente no debe interpretarlo)."""
+    raw = json.dumps({"id": int(last_id)}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(token: Optional[str]) -> Optional[int]:
+    """Devuelve el último id visto, o None para la primera página. ValueError si el token es inválido."""
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return int(data["id"])
+    except Exception as e:
+        raise ValueError("cursor inválido") from e
+
+async def keyset_page(db: AsyncSession, stmt: Select, id_column: Any, cursor: Optional[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Paginación por cursor sobre una columna indexada y creciente (`id`):
+    WHERE id > :último ORDER BY id LIMIT :limit + 1. El costo no depende del número de página.
+    """
+    last_id = decode_cursor(cursor)
+    if last_id is not None:
+        stmt = stmt.where(id_column > last_id)
+    result = await db.execute(stmt.order_by(id_column).limit(limit + 1))
+    items = list(result.scalars().all())
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(getattr(items[-1], id_column.key))
+    return items, next_cursor
@@ -0,0 +1,84 @@
+# app/shared/requestMetrics.py
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from app.db.queryMetrics import METRICS_SQL_ENABLED, begin_request, end_request, query_metrics
+from app.shared.metrics import LatencyHistogram, prometheus_histogram, prometheus_metric
+from app.util.env import env_bool
+
+# Apagado: ni middleware ni eventos de SQLAlchemy (costo cero) y /metrics responde 404
+METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+
+# Requests sin ruta (404) van a una sola serie: la cardinalidad no depende de las URLs recibidas
+UNMATCHED = "<unmatched>"
+
+
+class HttpMetrics:
+    """Latencia por método y plantilla de ruta (`/clients/{client_id}`), respuestas por status y requests en curso."""
+
+    def __init__(self):
+        self.latency: Dict[Tuple, LatencyHistogram] = {}
+        self.responses: Counter = Counter()
+        self.in_flight: Counter = Counter()
+
+    def observe(self, method: str, route: str, status: int, seconds: float) -> None:
+        key = (("method", method), ("route", route))
+        hist = self.latency.get(key)
+        if hist is None:
+            hist = self.latency.setdefault(key, LatencyHistogram())
+        hist.observe(seconds)
+        self.responses[key + (("status", str(status)),)] += 1
+
+    def prometheus(self) -> List[str]:
+        lines = prometheus_histogram(
+            "http_request_duration_seconds", "Latencia de requests HTTP hasta el último byte de la respuesta.", self.latency,
+        )
+        lines += prometheus_metric("http_responses_total", "counter", "Respuestas HTTP por status.", self.responses)
+        lines += prometheus_metric(
+            "http_requests_in_flight", "gauge", "Requests HTTP en curso.",
+            {(("method", m),): n for m, n in self.in_flight.items()},
+        )
+        return lines
+
+
+http_metrics = HttpMetrics()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI puro (no `BaseHTTPMiddleware`: no envuelve el cuerpo ni rompe el streaming).
+    Mide hasta que se envía el último chunk, así que un SSE cuenta su duración completa. La ruta
+    se lee de `scope["route"]`, que el router de FastAPI deja en el mismo scope al despachar.
+    """
+
+    def __init__(self, app, metrics: HttpMetrics = http_metrics, sql: bool = METRICS_SQL_ENABLED):
+        self.app = app
+        self.metrics = metrics
+        self.sql = sql
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        queries, token = begin_request() if self.sql else (None, None)
+        self.metrics.in_flight[method] += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.in_flight[method] -= 1
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED
+            self.metrics.observe(method, route, status, time.perf_counter() - started)
+            if queries is not None:
+                end_request(token)
+                query_metrics.finish_request(queries, method, route)
@@ -0,0 +1,64 @@
+# app/util/chunking.py
+import re
+from typing import Iterable, Iterator, List
+
+from app.util.env import env_int
+
+# Tamaños en caracteres; se cortan en límites de palabra para no partir códigos/RUCs
+CHUNK_SIZE = env_int("CHUNK_SIZE", 800)
+CHUNK_OVERLAP = env_int("CHUNK_OVERLAP", 120)
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Colapsa espacios en blanco; es la forma canónica usada para chunking y hashing."""
+    return _WS.sub(" ", text or "").strip()
+
+def chunk_text(text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """
+    Divide el texto en ventanas de ~`size` caracteres con `overlap` de solapamiento,
+    cortando siempre en un espacio cuando es posible.
+    """
+    return list(iter_chunks([text], size, overlap))
+
+def iter_chunks(blocks: Iterable[str], size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> Iterator[str]:
+    """
+    Versión incremental de `chunk_text` sobre un flujo de bloques de texto (p. ej. un archivo leído
+    por partes): produce exactamente los mismos chunks que sobre el texto concatenado, reteniendo
+    en memoria solo el bloque actual más una ventana.
+    """
+    overlap = max(0, min(overlap, size // 2))
+    buf, start, leading = "", 0, True
+    for block in blocks:
+        if not block:
+            continue
+        buf = _WS.sub(" ", buf[start:] + block)
+        if leading:
+            buf = buf.lstrip()
+            leading = not buf
+        # un espacio final podría desaparecer con el strip del texto completo: no se usa para decidir cortes
+        start = yield from _windows(buf, 0, len(buf) - 1, size, overlap)
+    buf = buf[start:].rstrip()
+    start = yield from _windows(buf, 0, len(buf), size, overlap)
+    tail = buf[start:].strip()
+    if tail:
+        yield tail
+
+def _windows(text: str, start: int, limit: int, size: int, overlap: int) -> Iterator[str]:
+    """Emite las ventanas que terminan antes de `limit` y devuelve el inicio de la siguiente."""
+    while start + size < limit:
+        end = start + size
+        cut = text.rfind(" ", start + overlap + 1, end)
+        if cut != -1:
+            end = cut
+        chunk = text[start:end].strip()
+        if chunk:
+            yield chunk
+        # retrocede `overlap` caracteres, alineado al inicio de una palabra
+        next_start = end - overlap
+        if overlap:
+            sp = text.find(" ", next_start, end)
+            next_start = sp + 1 if sp != -1 else next_start
+        start = max(next_start, start + 1)
+    return start
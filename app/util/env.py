@@ -0,0 +1,33 @@
+# app/util/env.py
+import os
+
+
+def env(name: str, default: str | None = None) -> str | None:
+    """Lee una variable de entorno tratando "", "none" y "null" como no definidas."""
+    v = os.getenv(name)
+    if v is None:
+        return default
+    v = v.strip()
+    if v == "" or v.lower() in {"none", "null"}:
+        return default
+    return v
+
+def env_int(name: str, default: int) -> int:
+    v = env(name)
+    try:
+        return int(v) if v is not None else default
+    except ValueError:
+        return default
+
+def env_float(name: str, default: float) -> float:
+    v = env(name)
+    try:
+        return float(v) if v is not None else default
+    except ValueError:
+        return default
+
+def env_bool(name: str, default: bool = False) -> bool:
+    v = env(name)
+    if v is None:
+        return default
+    return v.lower() in {"1", "true", "yes", "on", "si", "sí"}
@@ -0,0 +1,159 @@
+# app/util/parsing.py
+import codecs
+import os
+import re
+from typing import Iterable, Iterator, Optional
+
+from app.util.env import env_int
+
+# Lectura por bloques: la memoria del parser no depende del tamaño del archivo
+PARSE_BLOCK_SIZE = env_int("PARSE_BLOCK_SIZE", 64 * 1024)
+
+TEXT = "text"
+MARKDOWN = "markdown"
+PDF = "pdf"
+
+_EXTENSIONS = {".txt": TEXT, ".text": TEXT, ".md": MARKDOWN, ".markdown": MARKDOWN, ".pdf": PDF}
+_CONTENT_TYPES = {
+    "text/plain": TEXT,
+    "text/markdown": MARKDOWN,
+    "text/x-markdown": MARKDOWN,
+    "application/pdf": PDF,
+}
+
+
+class ParseError(ValueError):
+    pass
+
+
+class UnsupportedFormat(ParseError):
+    pass
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str] = None) -> Optional[str]:
+    """Formato por extensión y, si no se reconoce, por `Content-Type`. None si no está soportado."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in _EXTENSIONS:
+        return _EXTENSIONS[ext]
+    return _CONTENT_TYPES.get((content_type or "").split(";", 1)[0].strip().lower())
+
+def pdf_supported() -> bool:
+    try:
+        import pypdf  # noqa: F401  (dependencia opcional)
+    except ImportError:
+        return False
+    return True
+
+def iter_document(path: str, fmt: Optional[str] = None, block_size: int = PARSE_BLOCK_SIZE) -> Iterator[str]:
+    """Bloques de texto plano del archivo, en orden; pensado para alimentar `chunking.iter_chunks`."""
+    fmt = fmt or detect_format(path)
+    if fmt == TEXT:
+        return iter_text(path, block_size)
+    if fmt == MARKDOWN:
+        return iter_markdown(path, block_size)
+    if fmt == PDF:
+        return iter_pdf(path)
+    raise UnsupportedFormat(f"Formato no soportado: {os.path.basename(path)}")
+
+# --- texto ---
+
+def iter_text(path: str, block_size: int = PARSE_BLOCK_SIZE) -> Iterator[str]:
+    # decodificador incremental: un carácter multibyte puede quedar partido entre dos bloques
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    with open(path, "rb") as f:
+        while True:
+            raw = f.read(block_size)
+            if not raw:
+                break
+            text = decoder.decode(raw)
+            if text:
+                yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+def iter_lines(blocks: Iterable[str], max_line: int = PARSE_BLOCK_SIZE) -> Iterator[str]:
+    """Líneas (sin el salto) a partir de bloques; una línea más larga que `max_line` se entrega por partes."""
+    pending = ""
+    for block in blocks:
+        pending += block
+        lines = pending.split("\n")
+        pending = lines.pop()
+        yield from lines
+        if len(pending) > max_line:
+            yield pending
+            pending = ""
+    if pending:
+        yield pending
+
+# --- markdown ---
+
+_MD_FENCE = re.compile(r"^\s{0,3}(```|~~~)")
+_MD_RULE = re.compile(r"^\s{0,3}([-*_])(\s*\1){2,}\s*$")
+_MD_TABLE_SEP = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+_MD_PREFIX = re.compile(r"^\s{0,3}(#{1,6}\s+|>+\s?|[-*+]\s+|\d{1,9}[.)]\s+)+")
+_MD_HEADING_TAIL = re.compile(r"\s+#+\s*$")
+# sintaxis en línea; no cruza saltos de línea, así que se aplica a bloques enteros de una vez
+_MD_IMAGE = re.compile(r"!\[([^\]\n]*)\]\([^)\n]*\)")
+_MD_LINK = re.compile(r"\[([^\]\n]+)\]\([^)\n]*\)")
+_MD_CODE = re.compile(r"`+([^`\n]*)`+")
+_MD_EMPHASIS = re.compile(r"(\*{1,3}|_{2,3}|~~)(\S(?:.*?\S)?)\1")
+_MD_HTML = re.compile(r"</?[A-Za-z][^>\n]*>")
+
+
+def _strip_line(line: str) -> str:
+    if _MD_RULE.match(line) or _MD_TABLE_SEP.match(line):
+        return ""
+    if line.lstrip().startswith("#"):
+        line = _MD_HEADING_TAIL.sub("", line)
+    return _MD_PREFIX.sub("", line)
+
+def _strip_inline(text: str) -> str:
+    text = _MD_IMAGE.sub(r"\1", text)
+    text = _MD_LINK.sub(r"\1", text)
+    text = _MD_CODE.sub(r"\1", text)
+    text = _MD_EMPHASIS.sub(r"\2", text)
+    text = _MD_HTML.sub(" ", text)
+    return text.replace("|", " ")
+
+def strip_markdown(text: str) -> str:
+    """Quita la sintaxis Markdown conservando el texto (títulos, listas, enlaces, énfasis, tablas)."""
+    return _strip_inline("\n".join(_strip_line(line) for line in text.split("\n")))
+
+def iter_markdown(path: str, block_size: int = PARSE_BLOCK_SIZE) -> Iterator[str]:
+    in_code = False
+    out, size = [], 0
+    for line in iter_lines(iter_text(path, block_size), block_size):
+        fence = _MD_FENCE.match(line) is not None
+        if out and (fence or size >= block_size):
+            # bloques de ~block_size en vez de línea a línea; el código va tal cual (comandos, códigos de error)
+            text = "\n".join(out) + "\n"
+            yield text if in_code else _strip_inline(text)
+            out, size = [], 0
+        if fence:
+            in_code = not in_code
+            continue
+        out.append(line if in_code else _strip_line(line))
+        size += len(line) + 1
+    if out:
+        text = "\n".join(out) + "\n"
+        yield text if in_code else _strip_inline(text)
+
+# --- pdf ---
+
+def iter_pdf(path: str) -> Iterator[str]:
+    """Texto página a página con `pypdf` (opcional): solo la página actual se extrae a memoria."""
+    try:
+        from pypdf import PdfReader
+        from pypdf.errors import PyPdfError
+    except ImportError:
+        raise UnsupportedFormat("Para PDF se requiere el paquete opcional `pypdf`.")
+    with open(path, "rb") as f:
+        try:
+            reader = PdfReader(f)
+            for page in reader.pages:
+                text = page.extract_text() or ""
+                if text:
+                    yield text + "\n"
+        except PyPdfError as e:
+            raise ParseError(f"PDF inválido: {e}") from e
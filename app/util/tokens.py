@@ -0,0 +1,40 @@
+# app/util/tokens.py
+import math
+import threading
+from typing import List, Sequence
+
+from app.util.env import env
+
+# Tokenizer rápido (HF `tokenizers`, en Rust) compatible con el del LLM; se descarga una vez
+TOKENIZER_NAME = env("TOKENIZER_NAME", "Xenova/gpt-4o")
+
+_tokenizer = None
+_unavailable = False
+_lock = threading.Lock()
+
+
+def get_tokenizer():
+    """Tokenizer cargado al primer uso, o None si no está disponible (se usa una estimación)."""
+    global _tokenizer, _unavailable
+    if _tokenizer is None and not _unavailable:
+        with _lock:
+            if _tokenizer is None and not _unavailable:
+                try:
+                    from tokenizers import Tokenizer
+                    _tokenizer = Tokenizer.from_pretrained(TOKENIZER_NAME)
+                except Exception as e:
+                    print(f"Tokenizer {TOKENIZER_NAME} unavailable, estimating tokens: {e}")
+                    _unavailable = True
+    return _tokenizer
+
+def count_tokens_many(texts: Sequence[str]) -> List[int]:
+    if not texts:
+        return []
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        # ~4 caracteres por token en texto en español/inglés
+        return [math.ceil(len(t) / 4) for t in texts]
+    return [len(e.ids) for e in tokenizer.encode_batch(list(texts), add_special_tokens=False)]
+
+def count_tokens(text: str) -> int:
+    return count_tokens_many([text])[0]
@@ -0,0 +1,153 @@
+"""
+Compara los tipos de índice por cliente (flat / HNSW / IVF-PQ): recall@k contra el plano,
+latencia por consulta, throughput en lote, tiempo de construcción y tamaño del índice,
+barriendo efSearch (HNSW) y nprobe (IVF-PQ).
+
+    python -m benchmarks.annBench --vectors 200000 --dim 384 --queries 500 --k 10
+    python -m benchmarks.annBench --client-id 12          # vectores reales del cliente en VECTOR_STORE_DIR
+
+Usa el mismo camino de búsqueda que la API (`annIndex.ClientIndex`, con re-puntuación exacta
+de IVF-PQ). Por defecto genera vectores sintéticos agrupados (como embeddings de un corpus).
+Escribe los resultados como JSON en stdout (y en --out si se indica).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.services import annIndex, vectorStore
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+def _synthetic_flat(n: int, dim: int, seed: int) -> vectorStore.FlatVectors:
+    """Mezcla de gaussianas: ~n/200 temas con chunks alrededor de cada uno."""
+    rng = np.random.default_rng(seed)
+    centers = _normalize(rng.standard_normal((max(1, n // 200), dim)).astype(np.float32))
+    vectors = np.empty((n, dim), dtype=np.float32)
+    batch = 50_000
+    for i in range(0, n, batch):
+        m = min(batch, n - i)
+        x = centers[rng.integers(0, len(centers), m)] + 0.35 * rng.standard_normal((m, dim)).astype(np.float32) / np.sqrt(dim) * 4
+        vectors[i:i + m] = _normalize(x)
+    return vectorStore.FlatVectors.from_arrays(np.arange(n, dtype=np.int64), vectors)
+
+def _queries(flat: vectorStore.FlatVectors, n: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    base = flat.take(flat.live_positions()[np.sort(rng.choice(flat.ntotal, n, replace=False))])
+    noise = rng.standard_normal(base.shape).astype(np.float32) * 0.05
+    return np.ascontiguousarray(_normalize(base + noise), dtype=np.float32)
+
+def _size_bytes(index) -> int:
+    import faiss
+    fd, path = tempfile.mkstemp(suffix=".faiss")
+    os.close(fd)
+    try:
+        faiss.write_index(index, path)
+        return os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+def _recall(truth: np.ndarray, found: np.ndarray, k: int) -> float:
+    return round(float(np.mean([len(set(t[:k]) & set(f[:k])) / k for t, f in zip(truth, found)])), 4)
+
+def _measure(index, queries: np.ndarray, k: int, truth: np.ndarray, **params) -> dict:
+    samples = []
+    for q in queries:
+        t = time.perf_counter()
+        index.search(q[None, :], k, **params)
+        samples.append((time.perf_counter() - t) * 1000)
+    t = time.perf_counter()
+    _, found = index.search(queries, k, **params)
+    batch_seconds = time.perf_counter() - t
+    samples.sort()
+    return {
+        **params,
+        "recall_at_k": _recall(truth, found, k),
+        "p50_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[int(0.95 * (len(samples) - 1))], 4),
+        "batch_qps": round(len(queries) / batch_seconds, 1) if batch_seconds else None,
+    }
+
+def run(flat, n_queries: int, k: int, ef_values: list, nprobe_values: list, types: list, seed: int) -> dict:
+    queries = _queries(flat, min(n_queries, flat.ntotal), seed)
+    t = time.perf_counter()
+    _, truth = flat.search(queries, k)
+    flat_bytes = flat.nbytes
+    report = {
+        "vectors": int(flat.ntotal),
+        "dim": int(flat.d),
+        "queries": len(queries),
+        "k": k,
+        "auto_type": annIndex.choose_type(int(flat.ntotal)),
+        "results": [],
+    }
+    if "flat" in types:
+        report["results"].append({
+            "type": "flat", "build_seconds": 0.0, "index_bytes": flat_bytes,
+            "runs": [_measure(annIndex.ClientIndex(flat), queries, k, truth)],
+        })
+    for kind, knob, values in (("hnsw", "ef_search", ef_values), ("ivfpq", "nprobe", nprobe_values)):
+        if kind not in types:
+            continue
+        t = time.perf_counter()
+        ann = annIndex.build_from_flat(flat, kind, seed=seed)
+        build_seconds = time.perf_counter() - t
+        index = annIndex.ClientIndex(flat, ann)
+        entry = {
+            "type": kind,
+            "build_seconds": round(build_seconds, 3),
+            "index_bytes": _size_bytes(ann),
+            "runs": [_measure(index, queries, k, truth, **{knob: v}) for v in values],
+        }
+        if kind == "ivfpq":
+            # la re-puntuación lee del plano en disco (mmap): solo las páginas de los candidatos
+            entry["refine"] = annIndex.INDEX_PQ_REFINE
+            entry["flat_bytes_on_disk"] = flat_bytes
+        report["results"].append(entry)
+        del index, ann
+    return report
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--client-id", type=int, default=None, help="usar el índice plano real del cliente")
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef", default="16,32,64,128,256")
+    parser.add_argument("--nprobe", default="1,4,16,64")
+    parser.add_argument("--types", default="flat,hnsw,ivfpq")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    if args.client_id is not None:
+        flat = vectorStore.open_vectors(args.client_id)
+        if flat is None:
+            sys.exit(f"El cliente {args.client_id} no tiene índice en {vectorStore.VECTOR_STORE_DIR}")
+    else:
+        flat = _synthetic_flat(args.vectors, args.dim, args.seed)
+    report = run(
+        flat, args.queries, args.k,
+        [int(v) for v in args.ef.split(",") if v.strip()],
+        [int(v) for v in args.nprobe.split(",") if v.strip()],
+        [t.strip() for t in args.types.split(",") if t.strip()],
+        args.seed,
+    )
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,515 @@
+"""
+Prueba de carga de la API completa sin MySQL ni AWS: levanta `main:app` con uvicorn contra un
+SQLite temporal (aiosqlite), Cognito en memoria (`COGNITO_STUB`) y, por defecto, modelos sustitutos
+(`EMBEDDING_STUB`, `LLM_STUB`); siembra clientes, usuarios y documentos por la propia API y
+mide cada escenario con clientes httpx concurrentes.
+
+    python -m benchmarks.loadBench --concurrency 32 --duration 20
+    python -m benchmarks.loadBench --scenarios retrieval,chat --out load.json --baseline load_prev.json
+    python -m benchmarks.loadBench --real-models          # SentenceTransformer real (LLM sigue simulado)
+    python -m benchmarks.loadBench --workers 4 --model-server   # un solo proceso con el modelo
+
+Escenarios: `crud` (lecturas y escrituras de clientes, usuarios y documentos + login),
+`retrieval` (búsqueda híbrida) y `chat` (SSE completo; `chat.first_token` mide hasta el primer token).
+Reporta p50/p95/p99, media, máximo, requests por segundo y errores por escenario y por ruta.
+Escribe los resultados como JSON en stdout (y en --out si se indica); con --baseline agrega la
+variación de RPS y p95/p99 contra un reporte anterior. En Linux incluye RSS y PSS de cada proceso
+del servidor: con varios workers, PSS muestra cuánto de los índices y del modelo se comparte.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import httpx
+
+PASSWORD = "Bench-Pass-123!"
+_SYLLABLES = ("ca", "de", "fi", "go", "lu", "ma", "ne", "po", "ri", "sa", "te", "vo", "zu", "tra", "pre", "con")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _percentiles(samples: list) -> dict:
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    s = sorted(samples)
+    at = lambda q: s[min(len(s) - 1, int(q * len(s)))]
+    return {
+        "p50": round(at(0.50), 3),
+        "p95": round(at(0.95), 3),
+        "p99": round(at(0.99), 3),
+        "mean": round(statistics.fmean(s), 3),
+        "max": round(s[-1], 3),
+    }
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+# --- Corpus sintético ---
+
+class Corpus:
+    """Documentos por "temas": cada documento mezcla palabras de su tema con vocabulario común."""
+
+    def __init__(self, seed: int, topics: int = 40, words_per_topic: int = 30, common: int = 300):
+        self.rng = random.Random(seed)
+        self.common = [self._word() for _ in range(common)]
+        self.topics = [[self._word(3) for _ in range(words_per_topic)] for _ in range(topics)]
+
+    def _word(self, syllables: int = 2) -> str:
+        return "".join(self.rng.choice(_SYLLABLES) for _ in range(syllables + self.rng.randint(0, 1)))
+
+    def document(self, words: int) -> str:
+        topic = self.rng.choice(self.topics)
+        out = []
+        for i in range(words):
+            out.append(self.rng.choice(topic) if self.rng.random() < 0.35 else self.rng.choice(self.common))
+            if i % 15 == 14:
+                out[-1] += "."
+        return " ".join(out)
+
+    def query(self, rng: random.Random) -> str:
+        topic = rng.choice(self.topics)
+        return " ".join(rng.sample(topic, 3) + rng.sample(self.common, 2))
+
+
+# --- Servidor ---
+
+def _server_env(args, workdir: str, db_url: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "DB_URL": db_url,
+        "DB_READ_URL": "",
+        "COGNITO_STUB": "true",
+        "COGNITO_STUB_LATENCY_MS": str(args.cognito_latency_ms),
+        "COGNITO_APP_CLIENT_ID": env.get("COGNITO_APP_CLIENT_ID", "bench"),
+        "AUTH_ENABLED": "false",
+        "WARMUP_ENABLED": "false",
+        "VECTOR_STORE_DIR": os.path.join(workdir, "indexes"),
+        "EMBED_CACHE_DIR": os.path.join(workdir, "embed_cache"),
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "EMBED_WORKERS": env.get("EMBED_WORKERS", "1"),
+        "LLM_STUB": "true",
+        "LLM_STUB_TOKEN_MS": str(args.llm_token_ms),
+        "LLM_MAX_TOKENS": str(args.llm_tokens),
+    })
+    if not args.real_models:
+        env.update({"EMBEDDING_STUB": "true", "EMBEDDING_STUB_LATENCY_MS": str(args.embed_latency_ms)})
+    if args.model_server:
+        env["EMBEDDING_SERVER_SOCKET"] = os.path.join(workdir, "embedding.sock")
+    return env
+
+async def _create_schema(db_url: str) -> None:
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.db.base import Base
+    from app.db import loadModels  # noqa: F401  registra los modelos
+
+    engine = create_async_engine(db_url)
+    async with engine.begin() as conn:
+        # WAL: lecturas concurrentes mientras otra conexión escribe
+        await conn.execute(text("PRAGMA journal_mode=WAL"))
+        await conn.run_sync(Base.metadata.create_all)
+    await engine.dispose()
+
+def start_model_server(args, workdir: str, db_url: str):
+    env = _server_env(args, workdir, db_url)
+    path = env["EMBEDDING_SERVER_SOCKET"]
+    log = open(os.path.join(workdir, "model_server.log"), "wb")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.services.modelServer", "--socket", path],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + args.boot_timeout
+    while time.monotonic() < deadline and proc.poll() is None:
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            return proc
+        except OSError:
+            time.sleep(0.2)
+        finally:
+            probe.close()
+    proc.kill()
+    raise RuntimeError("El servidor de modelo no arrancó (ver model_server.log)")
+
+def start_server(args, workdir: str, db_url: str):
+    port = args.port or _free_port()
+    cmd = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+    ]
+    log = open(os.path.join(workdir, "server.log"), "wb")
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=_server_env(args, workdir, db_url), stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.boot_timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            break
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return proc, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.kill()
+    log.close()
+    with open(os.path.join(workdir, "server.log"), "rb") as f:
+        tail = f.read()[-4000:].decode("utf-8", "replace")
+    raise RuntimeError(f"El servidor no arrancó:\n{tail}")
+
+def stop_server(proc) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+# --- Datos ---
+
+async def seed(client: httpx.AsyncClient, corpus: Corpus, args) -> dict:
+    """Crea los datos por la API (mismas rutas y validaciones que en producción)."""
+    t = time.perf_counter()
+    resp = await client.post("/clients/bulk", json=[
+        {"ruc": f"{20_000_000_000 + i}", "name": f"bench-client-{i}"} for i in range(args.clients)
+    ])
+    resp.raise_for_status()
+    clients = [c["id"] for c in (await client.get("/clients/", params={"limit": 500})).json()["items"]][: args.clients]
+
+    users = {}
+    for cid in clients:
+        payload = [
+            {"username": f"u{cid}-{j}@bench.example.com", "email": f"u{cid}-{j}@bench.example.com", "password": PASSWORD, "idClient": cid}
+            for j in range(args.users)
+        ]
+        (await client.post("/users/bulk", json=payload)).raise_for_status()
+        page = (await client.get("/users/", params={"idClient": cid, "limit": 500})).json()["items"]
+        users[cid] = [(u["id"], u["email"]) for u in page]
+
+    documents = defaultdict(list)
+    for cid in clients:
+        for j in range(args.documents):
+            resp = await client.post("/documents/", json={
+                "idClient": cid, "title": f"doc-{cid}-{j}", "content": corpus.document(args.document_words),
+            })
+            resp.raise_for_status()
+            documents[cid].append(resp.json()["id"])
+    jobs = {}
+    for cid in clients:
+        resp = await client.post(f"/documents/ingest/{cid}")
+        resp.raise_for_status()
+        jobs[cid] = resp.json()["job_id"]
+    ingest = {}
+    while len(ingest) < len(jobs):  # la ingestión corre como job en el servidor
+        for cid, job_id in jobs.items():
+            if cid in ingest:
+                continue
+            job = (await client.get(f"/jobs/{job_id}")).json()
+            if job["status"] in ("failed", "cancelled"):
+                raise RuntimeError(f"ingest job {job_id} {job['status']}: {job.get('error')}")
+            if job["status"] == "done":
+                ingest[cid] = job["result"]
+        await asyncio.sleep(0.2)
+    return {
+        "clients": clients,
+        "users": users,
+        "documents": dict(documents),
+        "seconds": round(time.perf_counter() - t, 3),
+        "chunks": sum(r["chunks"] for r in ingest.values()),
+    }
+
+
+# --- Escenarios: cada operación devuelve [(ruta, status, segundos)] ---
+
+async def _timed(client: httpx.AsyncClient, label: str, method: str, url: str, **kw):
+    t = time.perf_counter()
+    resp = await client.request(method, url, **kw)
+    return [(label, resp.status_code, time.perf_counter() - t)]
+
+def crud_ops(data: dict, corpus: Corpus):
+    async def get_client(c, rng):
+        return await _timed(c, "GET /clients/{id}", "GET", f"/clients/{rng.choice(data['clients'])}")
+
+    async def list_clients(c, rng):
+        return await _timed(c, "GET /clients/", "GET", "/clients/", params={"limit": 50})
+
+    async def list_documents(c, rng):
+        return await _timed(c, "GET /documents/", "GET", "/documents/", params={"client_id": rng.choice(data["clients"]), "limit": 20})
+
+    async def get_user(c, rng):
+        uid, _ = rng.choice(data["users"][rng.choice(data["clients"])])
+        return await _timed(c, "GET /users/{id}", "GET", f"/users/{uid}")
+
+    async def update_client(c, rng):
+        cid = rng.choice(data["clients"])
+        return await _timed(c, "PUT /clients/{id}", "PUT", f"/clients/{cid}", json={"name": f"bench-client-{cid}-{rng.randint(0, 999)}"})
+
+    async def login(c, rng):
+        _, email = rng.choice(data["users"][rng.choice(data["clients"])])
+        return await _timed(c, "POST /auth/login", "POST", "/auth/login", json={"email": email, "password": PASSWORD})
+
+    return [(30, get_client), (15, list_clients), (20, list_documents), (15, get_user), (10, update_client), (10, login)]
+
+def retrieval_ops(data: dict, corpus: Corpus):
+    async def retrieve(c, rng):
+        return await _timed(
+            c, "POST /retrieval/{id}", "POST", f"/retrieval/{rng.choice(data['clients'])}",
+            json={"query": corpus.query(rng), "k": 5, "mode": "hybrid"},
+        )
+
+    return [(1, retrieve)]
+
+def chat_ops(data: dict, corpus: Corpus):
+    async def chat(c, rng):
+        cid = rng.choice(data["clients"])
+        uid, _ = rng.choice(data["users"][cid])
+        body = {"idUser": uid, "idClient": cid, "session_id": f"bench-{uid}-{rng.randint(0, 20)}", "message": corpus.query(rng), "k": 5}
+        t = time.perf_counter()
+        first = None
+        status = 0
+        async with c.stream("POST", "/chat/stream", json=body) as resp:
+            status = resp.status_code
+            async for line in resp.aiter_lines():
+                if first is None and line == "event: token":
+                    first = time.perf_counter() - t
+        out = [("POST /chat/stream", status, time.perf_counter() - t)]
+        if first is not None:
+            out.append(("chat.first_token", status, first))
+        return out
+
+    return [(1, chat)]
+
+SCENARIOS = {"crud": crud_ops, "retrieval": retrieval_ops, "chat": chat_ops}
+
+
+async def run_scenario(base_url: str, name: str, ops: list, concurrency: int, duration: float, warmup: float, seed: int) -> dict:
+    weights = [w for w, _ in ops]
+    fns = [fn for _, fn in ops]
+    samples = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    errors = defaultdict(int)
+    recording = False
+    stop_at = 0.0
+
+    async def worker(i: int, client: httpx.AsyncClient) -> None:
+        rng = random.Random(seed * 1000 + i)
+        while time.perf_counter() < stop_at:
+            fn = rng.choices(fns, weights)[0]
+            try:
+                results = await fn(client, rng)
+            except httpx.HTTPError as e:
+                if recording:
+                    errors[e.__class__.__name__] += 1
+                continue
+            if not recording:
+                continue
+            for label, status, seconds in results:
+                statuses[label][status] += 1
+                samples[label].append(seconds * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        if warmup > 0:
+            stop_at = time.perf_counter() + warmup
+            await asyncio.gather(*(worker(i, client) for i in range(concurrency)))
+        recording = True
+        started = time.perf_counter()
+        stop_at = started + duration
+        await asyncio.gather(*(worker(i, client) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    # chat.first_token es una medición dentro de otra request, no suma al throughput
+    counted = [l for l in samples if not l.startswith("chat.")]
+    requests = sum(len(samples[l]) for l in counted)
+    non_2xx = sum(n for l in counted for s, n in statuses[l].items() if not 200 <= s < 300)
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "requests": requests,
+        "rps": round(requests / elapsed, 2) if elapsed else None,
+        "non_2xx": non_2xx,
+        "errors": dict(errors),
+        "latency_ms": _percentiles([x for l in counted for x in samples[l]]),
+        "routes": {
+            label: {
+                "requests": len(values),
+                "rps": round(len(values) / elapsed, 2) if elapsed else None,
+                "status": {str(s): n for s, n in sorted(statuses[label].items())},
+                "latency_ms": _percentiles(values),
+            }
+            for label, values in sorted(samples.items())
+        },
+    }
+
+def _process_tree(pid: int) -> list:
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", encoding="ascii") as f:
+            children = [int(c) for c in f.read().split()]
+    except OSError:
+        return pids
+    for child in children:
+        pids += _process_tree(child)
+    return pids
+
+def process_memory(procs) -> dict | None:
+    """RSS y PSS (páginas compartidas repartidas entre quienes las mapean) por proceso, en MB. Solo Linux."""
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        return None
+    out = {}
+    for proc in procs:
+        for pid in _process_tree(proc.pid):
+            fields = {}
+            try:
+                with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+                    for line in f:
+                        parts = line.split()
+                        if parts[0] in ("Rss:", "Pss:"):
+                            fields[parts[0][:-1].lower() + "_mb"] = round(int(parts[1]) / 1024, 1)
+                with open(f"/proc/{pid}/cmdline", "rb") as f:
+                    cmd = f.read().replace(b"\0", b" ").decode("utf-8", "replace").strip()
+            except OSError:
+                continue
+            out[str(pid)] = {"cmd": cmd[:120], **fields}
+    out["total"] = {
+        key: round(sum(p.get(key, 0) for p in out.values()), 1) for key in ("rss_mb", "pss_mb")
+    }
+    return out
+
+async def server_stats(base_url: str) -> dict:
+    out = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=10.0) as client:
+        for path in ("/db/stats", "/retrieval/stats", "/auth/cognito/stats", "/chat/memory/stats"):
+            try:
+                resp = await client.get(path)
+                out[path] = resp.json() if resp.status_code == 200 else resp.status_code
+            except httpx.HTTPError as e:
+                out[path] = str(e)
+    return out
+
+def compare(report: dict, baseline: dict) -> dict:
+    """Variación porcentual respecto a un reporte anterior (positivo = más RPS / más latencia)."""
+    def pct(new, old):
+        return round((new - old) / old * 100, 2) if new is not None and old else None
+
+    old = {s["scenario"]: s for s in baseline.get("scenarios", [])}
+    out = {"baseline_commit": baseline.get("meta", {}).get("commit"), "scenarios": {}}
+    for s in report["scenarios"]:
+        b = old.get(s["scenario"])
+        if b is None:
+            continue
+        out["scenarios"][s["scenario"]] = {
+            "rps_pct": pct(s["rps"], b["rps"]),
+            "p95_pct": pct(s["latency_ms"]["p95"], b["latency_ms"]["p95"]),
+            "p99_pct": pct(s["latency_ms"]["p99"], b["latency_ms"]["p99"]),
+        }
+    return out
+
+async def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="rag_load_bench_")
+    db_url = f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}"
+    await _create_schema(db_url)
+    model_proc = start_model_server(args, workdir, db_url) if args.model_server else None
+    proc, base_url = start_server(args, workdir, db_url)
+    try:
+        corpus = Corpus(args.seed)
+        async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as client:
+            data = await seed(client, corpus, args)
+        scenarios = []
+        for name in args.scenarios:
+            ops = SCENARIOS[name](data, corpus)
+            scenarios.append(await run_scenario(base_url, name, ops, args.concurrency, args.duration, args.warmup, args.seed))
+        stats = await server_stats(base_url)
+        memory = process_memory([p for p in (proc, model_proc) if p is not None])
+    finally:
+        stop_server(proc)
+        if model_proc is not None:
+            stop_server(model_proc)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "models": "real embeddings + stub LLM" if args.real_models else "stub",
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+            "workdir": workdir if args.keep else None,
+        },
+        "seed": {k: data[k] for k in ("seconds", "chunks")} | {
+            "clients": len(data["clients"]),
+            "users": sum(len(u) for u in data["users"].values()),
+            "documents": sum(len(d) for d in data["documents"].values()),
+        },
+        "scenarios": scenarios,
+        "server_stats": stats,
+        "memory": memory,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="crud,retrieval,chat")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos medidos por escenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="segundos previos sin medir")
+    parser.add_argument("--workers", type=int, default=1, help="procesos de uvicorn")
+    parser.add_argument("--model-server", action="store_true", help="embeddings en un solo proceso (socket Unix)")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--users", type=int, default=10, help="por cliente")
+    parser.add_argument("--documents", type=int, default=50, help="por cliente")
+    parser.add_argument("--document-words", type=int, default=600)
+    parser.add_argument("--real-models", action="store_true", help="SentenceTransformer real en lugar del stub")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="latencia simulada por encode del stub")
+    parser.add_argument("--llm-token-ms", type=float, default=2.0, help="latencia simulada por token del LLM")
+    parser.add_argument("--llm-tokens", type=int, default=64)
+    parser.add_argument("--cognito-latency-ms", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--boot-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="conservar la BD, índices y server.log")
+    parser.add_argument("--baseline", default=None, help="reporte JSON anterior para comparar")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"escenarios desconocidos: {', '.join(unknown)} (opciones: {', '.join(SCENARIOS)})")
+
+    report = asyncio.run(run(args))
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+if __name__ == "__main__":
+    main()
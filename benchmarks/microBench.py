@@ -0,0 +1,189 @@
+"""
+Micro-benchmarks de las piezas calientes de la API, sin servidor ni base de datos:
+
+- embedding: `encode` por tamaño de lote y el micro-batcher de consultas con N consultas concurrentes;
+- búsqueda: plano exacto por cliente (`annIndex.ClientIndex`), BM25 y la fusión RRF;
+- serialización: respuesta de `/retrieval` (Pydantic vs json vs orjson si está instalado),
+  eventos SSE del chat y cursores de paginación.
+
+    python -m benchmarks.microBench                       # modelo sustituto (EMBEDDING_STUB)
+    python -m benchmarks.microBench --real-models --only embedding
+    python -m benchmarks.microBench --vectors 200000 --out micro.json
+
+Escribe los resultados como JSON en stdout (y en --out si se indica).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+
+def _time_calls(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[int(0.95 * (len(samples) - 1))], 4),
+        "p99_ms": round(samples[int(0.99 * (len(samples) - 1))], 4),
+        "ops_per_s": round(1000 / statistics.fmean(samples), 1) if statistics.fmean(samples) else None,
+    }
+
+def _texts(n: int, words: int, seed: int) -> list:
+    rng = random.Random(seed)
+    vocab = [f"palabra{i}" for i in range(5000)]
+    return [" ".join(rng.choices(vocab, k=words)) for _ in range(n)]
+
+
+# --- embedding ---
+
+def bench_embedding(args) -> dict:
+    from app.services import embeddingService
+    from app.services.queryBatcher import QueryEmbeddingBatcher
+
+    embeddingService.get_model()  # carga fuera de la medición
+    out = {"model": embeddingService.EMBEDDING_MODEL, "encode": [], "query_batcher": []}
+    for batch in args.embed_batches:
+        texts = _texts(batch, 120, args.seed)
+        stats = _time_calls(lambda: embeddingService.encode(texts), max(3, args.repeat // max(1, batch)))
+        stats["texts_per_s"] = round(stats["ops_per_s"] * batch, 1) if stats["ops_per_s"] else None
+        out["encode"].append({"batch_size": batch, **stats})
+
+    async def concurrent(n: int) -> dict:
+        batcher = QueryEmbeddingBatcher(embeddingService.encode, max_batch=32, max_wait_ms=5.0)
+        queries = _texts(n, 8, args.seed + n)
+        try:
+            t = time.perf_counter()
+            await asyncio.gather(*(batcher.embed(q) for q in queries))
+            seconds = time.perf_counter() - t
+            stats = batcher.stats()
+        finally:
+            await batcher.close()
+        return {"concurrent": n, "seconds": round(seconds, 4), "queries_per_s": round(n / seconds, 1), "batcher": stats}
+
+    for n in args.concurrency:
+        out["query_batcher"].append(asyncio.run(concurrent(n)))
+    return out
+
+
+# --- búsqueda ---
+
+def bench_search(args) -> dict:
+    from app.services import annIndex, vectorStore
+    from app.services.bm25Index import BM25Index, reciprocal_rank_fusion
+
+    rng = np.random.default_rng(args.seed)
+    x = rng.standard_normal((args.vectors, args.dim)).astype(np.float32)
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    index = annIndex.ClientIndex(vectorStore.FlatVectors.from_arrays(np.arange(args.vectors, dtype=np.int64), x))
+    queries = x[rng.choice(args.vectors, args.repeat)]
+    it = iter(range(10**9))
+
+    out = {"vectors": args.vectors, "dim": args.dim, "k": args.k}
+    out["faiss_flat_single"] = _time_calls(lambda: index.search(queries[next(it) % len(queries)][None, :], args.k), args.repeat)
+    batch = queries[:64]
+    out["faiss_flat_batch64"] = _time_calls(lambda: index.search(batch, args.k), max(3, args.repeat // 20))
+
+    chunks = _texts(args.chunks, 150, args.seed)
+    t = time.perf_counter()
+    bm25 = BM25Index.build(list(enumerate(chunks)))
+    out["bm25_build_ms"] = round((time.perf_counter() - t) * 1000, 3)
+    out["bm25_chunks"] = args.chunks
+    bm25_queries = _texts(args.repeat, 5, args.seed + 1)
+    it2 = iter(range(10**9))
+    out["bm25_search"] = _time_calls(lambda: bm25.search(bm25_queries[next(it2) % len(bm25_queries)], 50), args.repeat)
+
+    dense = list(range(50))
+    lexical = list(range(25, 75))
+    out["rrf_fusion_50x50"] = _time_calls(lambda: reciprocal_rank_fusion([dense, lexical]), args.repeat)
+    return out
+
+
+# --- serialización ---
+
+def bench_serialization(args) -> dict:
+    from app.controller.chatController import _sse
+    from app.schemas.retrievalDto import RetrievalResponseDto
+    from app.shared.pagination import decode_cursor, encode_cursor
+
+    content = _texts(1, 180, args.seed)[0]
+    payload = {
+        "results": [
+            {"vector_id": (i << 20) | i, "idDocument": i, "chunk_index": i, "content": content,
+             "score": 0.5 / (i + 1), "vector_rank": i + 1, "lexical_rank": i + 2}
+            for i in range(args.k)
+        ],
+        "timings_ms": {"embed": 3.1, "vector_search": 0.8, "lexical_search": 1.2, "fusion": 0.05, "fetch": 2.4, "total": 7.9},
+    }
+    out = {"results": args.k, "content_chars": len(content)}
+    out["retrieval_pydantic"] = _time_calls(lambda: RetrievalResponseDto.model_validate(payload).model_dump_json(), args.repeat)
+    out["retrieval_json"] = _time_calls(lambda: json.dumps(payload, ensure_ascii=False), args.repeat)
+    try:
+        import orjson
+        out["retrieval_orjson"] = _time_calls(lambda: orjson.dumps(payload), args.repeat)
+    except ImportError:
+        out["retrieval_orjson"] = None
+    out["sse_token_event"] = _time_calls(lambda: _sse("token", {"t": " palabra"}), args.repeat)
+    out["cursor_roundtrip"] = _time_calls(lambda: decode_cursor(encode_cursor(123_456_789)), args.repeat)
+    return out
+
+
+BENCHES = {"embedding": bench_embedding, "search": bench_search, "serialization": bench_serialization}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default=",".join(BENCHES), help="embedding,search,serialization")
+    parser.add_argument("--real-models", action="store_true", help="SentenceTransformer real en lugar del stub")
+    parser.add_argument("--embed-batches", default="1,8,32,128")
+    parser.add_argument("--concurrency", default="1,16,64", help="consultas concurrentes al micro-batcher")
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--chunks", type=int, default=20_000, help="chunks del índice BM25")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+    args.embed_batches = [int(v) for v in args.embed_batches.split(",") if v.strip()]
+    args.concurrency = [int(v) for v in args.concurrency.split(",") if v.strip()]
+    selected = [b.strip() for b in args.only.split(",") if b.strip()]
+    unknown = [b for b in selected if b not in BENCHES]
+    if unknown:
+        parser.error(f"benchmarks desconocidos: {', '.join(unknown)} (opciones: {', '.join(BENCHES)})")
+    if not args.real_models:
+        # antes de importar embeddingService: la config se lee al importar
+        os.environ["EMBEDDING_STUB"] = "true"
+        os.environ.setdefault("EMBEDDING_STUB_DIM", str(args.dim))
+    os.environ.setdefault("COGNITO_STUB", "true")  # importar controladores no debe exigir AWS
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+    }
+    for name in selected:
+        report[name] = BENCHES[name](args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+if __name__ == "__main__":
+    main()
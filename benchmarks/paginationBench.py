@@ -0,0 +1,107 @@
+"""
+Compara la latencia de OFFSET vs cursor (keyset) en la página 1 y en páginas profundas.
+
+    python -m benchmarks.paginationBench --rows 1000000 --pages 1,100,10000
+    python -m benchmarks.paginationBench --url "mysql+asyncmy://user:pw@host/db"
+
+Por defecto usa un SQLite temporal (aiosqlite) para poder correrlo sin MySQL.
+Escribe los resultados como JSON en stdout (y en --out si se indica).
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db import loadModels  # noqa: F401  registra los modelos
+from app.models.clients import Clients
+from app.shared.pagination import encode_cursor, keyset_page
+
+
+async def _seed(session: AsyncSession, rows: int) -> None:
+    existing = (await session.execute(select(func.count(Clients.id)))).scalar_one()
+    batch = 10_000
+    for start in range(existing, rows, batch):
+        end = min(start + batch, rows)
+        await session.execute(insert(Clients), [
+            {"ruc": f"{i:011d}", "name": f"client-{i}", "swt": True} for i in range(start, end)
+        ])
+    await session.commit()
+
+async def _time(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - t) * 1000)
+    return round(statistics.median(samples), 3)
+
+async def run(url: str, rows: int, limit: int, pages: list, repeat: int) -> dict:
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    results = []
+    async with Session() as session:
+        await _seed(session, rows)
+        for page in pages:
+            skip = (page - 1) * limit
+            if skip >= rows:
+                continue
+            # el cliente ya tendría este token: lo calculamos fuera de la medición
+            cursor = None
+            if skip:
+                last_id = (await session.execute(
+                    select(Clients.id).order_by(Clients.id).offset(skip - 1).limit(1)
+                )).scalar_one()
+                cursor = encode_cursor(last_id)
+
+            async def offset_page():
+                stmt = select(Clients).order_by(Clients.id).offset(skip).limit(limit)
+                (await session.execute(stmt)).scalars().all()
+                session.expunge_all()
+
+            async def keyset():
+                await keyset_page(session, select(Clients), Clients.id, cursor, limit)
+                session.expunge_all()
+
+            results.append({
+                "page": page,
+                "offset_ms": await _time(offset_page, repeat),
+                "keyset_ms": await _time(keyset, repeat),
+            })
+    await engine.dispose()
+    return {"url": url.split("@")[-1], "rows": rows, "limit": limit, "repeat": repeat, "results": results}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="URL async de SQLAlchemy (por defecto SQLite temporal)")
+    parser.add_argument("--rows", type=int, default=1_000_100)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--pages", default="1,100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite+aiosqlite:///{os.path.join(tempfile.gettempdir(), 'rag_pagination_bench.db')}"
+    pages = [int(p) for p in args.pages.split(",") if p.strip()]
+    report = asyncio.run(run(url, args.rows, args.limit, pages, args.repeat))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,31 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.db.session import engine
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.db.session import db_pool_stats, engine, pool_stats, read_engine
+from app.db.queryMetrics import METRICS_SQL_ENABLED, query_metrics
 from app.db.base import Base
 from app.db import loadModels  # <-- importa modelos
+from app.services.jobQueue import job_queue
+from app.services.annIndex import index_builder
+from app.services.vectorStore import compactor
+from app.services.queryBatcher import query_batcher
+from app.services.reranker import reranker
+from app.services.tokenVerifier import jwks_cache
+from app.services.cognitoGateway import cognito_gateway
+from app.services.warmup import readiness
+from app.util.env import env_bool
+from app.shared.metrics import prometheus_histogram, prometheus_metric
+from app.shared.requestMetrics import METRICS_ENABLED, MetricsMiddleware, http_metrics
+from app.shared.auth import AUTH_ENABLED, require_auth
 from app.controller.userController import router as user_router  # importa tu router de usuario
 from app.controller.authController import router as auth_router  # importa tu router de autenticación
 from app.controller.clientController import router as client_router  # importa tu router de cliente
 from app.controller.tableXclientController import router as tableXclient_router  # importa tu router de tablaXcliente
+from app.controller.documentController import router as document_router  # documentos + ingestión
+from app.controller.indexController import router as index_router  # registro de índices FAISS
+from app.controller.retrievalController import router as retrieval_router  # búsqueda híbrida
+from app.controller.chatController import router as chat_router  # chat en streaming (SSE)
+from app.controller.jobController import router as job_router  # cola de jobs de ingestión
 
 app = FastAPI(title="Thesis RAG API", version="1.0.0")
 
@@ -14,20 +33,97 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
 )
+if METRICS_ENABLED:
+    # el último agregado envuelve a los demás: mide también el tiempo de CORS
+    app.add_middleware(MetricsMiddleware)
+    if METRICS_SQL_ENABLED:
+        query_metrics.instrument(engine, "primary")
+        if read_engine is not engine:
+            query_metrics.instrument(read_engine, "replica")
+
+# El esquema se gestiona con migraciones; create_all solo si se pide explícitamente
+DB_CREATE_ALL = env_bool("DB_CREATE_ALL", False)
 
 @app.on_event("startup")
 async def startup():
-    # crea tablas cuando haya MYSQL_URL real (en Railway)
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    if DB_CREATE_ALL:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    if AUTH_ENABLED:
+        # JWKS en memoria antes de atender: la verificación de tokens no toca la red
+        await jwks_cache.start()
+    # modelo e índices de los clientes activos en segundo plano: el worker acepta tráfico ya
+    readiness.start()
+    # workers de la cola de jobs: retoman también los que quedaron a medias en un arranque anterior
+    job_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await readiness.stop()
+    # los jobs en curso vuelven a la cola con su progreso
+    await job_queue.stop()
+    await query_batcher.close()
+    reranker.close()
+    await jwks_cache.stop()
+    cognito_gateway.shutdown()
+    index_builder.shutdown()
+    compactor.shutdown()
 
 # Incluye todos los routers de tus controladores
-app.include_router(user_router)
+# (todos salvo /auth exigen token cuando AUTH_ENABLED=true)
+protected = [Depends(require_auth)]
+app.include_router(user_router, dependencies=protected)
 app.include_router(auth_router)
-app.include_router(client_router)
-app.include_router(tableXclient_router)
+app.include_router(client_router, dependencies=protected)
+app.include_router(tableXclient_router, dependencies=protected)
+app.include_router(document_router, dependencies=protected)
+app.include_router(index_router, dependencies=protected)
+app.include_router(retrieval_router, dependencies=protected)
+app.include_router(chat_router, dependencies=protected)
+app.include_router(job_router, dependencies=protected)
 # Si tienes más controladores, agrégalos aquí
 
 @app.get("/health", tags=["Health"])
 def health():
-    return {"ok": True}
\ No newline at end of file
+    return {"ok": True}
+
+@app.get("/db/stats", tags=["Health"])
+def db_stats():
+    """Estado de los pools (primario y réplica) y espera al obtener conexión."""
+    return db_pool_stats()
+
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+def metrics():
+    """Métricas en formato de texto de Prometheus (por worker: cada proceso expone las suyas)."""
+    if not METRICS_ENABLED:
+        return PlainTextResponse("metrics disabled\n", status_code=404)
+    lines = http_metrics.prometheus()
+    if METRICS_SQL_ENABLED:
+        lines += query_metrics.prometheus()
+    lines += prometheus_histogram(
+        "db_pool_checkout_seconds", "Espera al obtener una conexión del pool.",
+        {(("engine", name),): s.checkout for name, s in pool_stats.items()},
+    )
+    lines += prometheus_metric(
+        "db_pool_timeouts_total", "counter", "Checkouts que agotaron DB_POOL_TIMEOUT.",
+        {(("engine", name),): s.timeouts for name, s in pool_stats.items()},
+    )
+    lines += prometheus_histogram(
+        "cognito_call_duration_seconds", "Latencia de llamadas a Cognito.",
+        {(("operation", name),): op.latency for name, op in cognito_gateway.operations().items()},
+    )
+    lines += prometheus_histogram("rerank_duration_seconds", "Latencia del re-ranking.", {(): reranker.latency})
+    jobs = job_queue.stats()
+    lines += prometheus_metric("jobs_running", "gauge", "Jobs en ejecución en este worker.", {(): jobs["running"]})
+    lines += prometheus_metric(
+        "jobs_total", "counter", "Eventos de la cola de jobs en este worker.",
+        {(("outcome", k),): jobs[k] for k in ("completed", "failed", "retried", "rejected", "recovered")},
+    )
+    lines += prometheus_metric("readiness_ready", "gauge", "1 si el warm-up terminó.", {(): int(readiness.ready)})
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/ready", tags=["Health"])
+def ready():
+    """503 hasta que el modelo de embeddings y los índices de los clientes activos estén cargados."""
+    status = readiness.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
\ No newline at end of file
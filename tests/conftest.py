@@ -0,0 +1,18 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+# los módulos de app leen el entorno al importarse: se fija antes de que los importe cualquier test.
+# BD SQLite y carpetas de índices temporales: las pruebas no tocan MySQL ni `data/`
+_SCRATCH = tempfile.mkdtemp(prefix="rag-tests-")
+os.environ.setdefault("DB_URL", f"sqlite+aiosqlite:///{os.path.join(_SCRATCH, 'tests.sqlite')}")
+os.environ["DB_READ_URL"] = ""
+os.environ.setdefault("VECTOR_STORE_DIR", os.path.join(_SCRATCH, "indexes"))
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_SCRATCH, "uploads"))
+os.environ.setdefault("JOB_WORKERS", "0")
+os.environ.setdefault("COGNITO_STUB", "true")
+os.environ.setdefault("EMBEDDING_STUB", "true")
+os.environ.setdefault("LLM_STUB", "true")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
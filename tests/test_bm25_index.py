@@ -0,0 +1,94 @@
+# tests/test_bm25_index.py
+import asyncio
+import random
+
+import numpy as np
+import pytest
+from sqlalchemy import delete
+
+from app.db import loadModels  # noqa: F401  registra los modelos en la metadata
+from app.db.base import Base
+from app.db.session import AsyncSessionLocal, engine
+from app.models.clients import Clients
+from app.models.documentChunks import DocumentChunks
+from app.models.documents import Documents
+from app.services import bm25Index
+from app.services.bm25Index import BM25Builder, BM25Index, BM25Store
+
+WORDS = ["ruc", "factura", "20.5.1", "sku-123", "pago", "boleta", "cliente", "igv", "nota", "crédito"]
+
+
+def run(coro):
+    """Corre `coro` en un loop nuevo y suelta las conexiones del pool (quedan atadas a ese loop)."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await engine.dispose()
+    return asyncio.run(main())
+
+
+def _docs(n, seed=0):
+    rng = random.Random(seed)
+    return [(i << 20, " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 12)))) for i in range(n)]
+
+
+def test_batched_build_matches_single_build():
+    docs = _docs(200)
+    whole = BM25Index.build(docs)
+    builder = BM25Builder()
+    for i in range(0, len(docs), 7):
+        builder.add(docs[i:i + 7])
+    batched = builder.finish()
+    np.testing.assert_array_equal(batched.ids, whole.ids)
+    np.testing.assert_allclose(batched.weights.toarray(), whole.weights.toarray())
+    for query in ("ruc factura", "sku", "20.5.1", "crédito nota", "inexistente"):
+        ids, scores = batched.search(query, 5)
+        expected_ids, expected_scores = whole.search(query, 5)
+        np.testing.assert_array_equal(ids, expected_ids)
+        np.testing.assert_allclose(scores, expected_scores)
+
+
+def test_empty_build():
+    index = BM25Builder().finish()
+    assert index.weights.shape == (0, 0)
+    assert len(index.search("ruc", 3)[0]) == 0
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(bm25Index, "VECTOR_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(bm25Index, "BM25_BUILD_BATCH", 16)
+    return BM25Store(4)
+
+
+async def _seed(docs, duplicates=()):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        for model in (DocumentChunks, Documents, Clients):
+            await db.execute(delete(model))
+        db.add(Clients(id=1, ruc="1", name="uno"))
+        db.add(Documents(id=1, idClient=1, title="t", content="c"))
+        await db.flush()
+        db.add_all(
+            DocumentChunks(idDocument=1, idClient=1, chunk_index=i, vector_id=vid, content=text,
+                           duplicate_of=0 if i in duplicates else None)
+            for i, (vid, text) in enumerate(docs)
+        )
+        await db.commit()
+
+
+def test_store_rebuilds_from_streamed_chunks(store):
+    docs = _docs(100, seed=1)
+
+    async def scenario():
+        await _seed(docs, duplicates={0, 1})
+        index = await store.get(1)
+        return index
+
+    index = run(scenario())
+    expected = BM25Index.build(docs[2:])
+    np.testing.assert_array_equal(index.ids, expected.ids)
+    np.testing.assert_array_equal(index.search("igv pago", 10)[0], expected.search("igv pago", 10)[0])
+    assert store.stats()["builds"] == 1
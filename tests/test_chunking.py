@@ -0,0 +1,59 @@
+# tests/test_chunking.py
+import random
+
+import pytest
+
+from app.util.chunking import chunk_text, iter_chunks
+
+
+def _text(rng: random.Random, words: int) -> str:
+    """Texto con palabras de largo variable, espacios repetidos, tabs y saltos de línea."""
+    seps = [" ", " ", " ", "  ", "\n", "\t", " \n "]
+    parts = []
+    for _ in range(words):
+        parts.append("x" * rng.randint(1, 14) if rng.random() > 0.02 else "y" * rng.randint(40, 120))
+        parts.append(rng.choice(seps))
+    return rng.choice(["", "  ", "\n"]) + "".join(parts)
+
+
+def _split(rng: random.Random, text: str, max_block: int):
+    """Corta el texto en bloques de largo aleatorio (incluidos bloques vacíos y de un carácter)."""
+    blocks, at = [], 0
+    while at < len(text):
+        n = rng.choice([0, 1, rng.randint(1, max_block)])
+        blocks.append(text[at:at + n])
+        at += n
+    return blocks
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_iter_chunks_matches_chunk_text_across_block_splits(seed):
+    rng = random.Random(seed)
+    size = rng.choice([20, 50, 120, 800])
+    overlap = rng.choice([0, 5, size // 4, size // 2, size])
+    text = _text(rng, rng.randint(0, 600))
+    expected = chunk_text(text, size, overlap)
+    for max_block in (1, 7, size, 3 * size, len(text) + 1):
+        assert list(iter_chunks(_split(rng, text, max_block), size, overlap)) == expected
+
+
+def test_block_boundary_inside_whitespace_run():
+    text = "alfa beta" + " " * 30 + "gamma delta " * 20
+    expected = chunk_text(text, 25, 6)
+    for cut in range(1, len(text)):
+        assert list(iter_chunks([text[:cut], text[cut:]], 25, 6)) == expected
+
+
+@pytest.mark.parametrize("blocks", [[], [""], ["   "], ["\n", " \t "]])
+def test_blank_input_has_no_chunks(blocks):
+    assert list(iter_chunks(blocks, 50, 10)) == []
+    assert chunk_text("".join(blocks), 50, 10) == []
+
+
+def test_chunks_are_bounded_and_overlap():
+    text = " ".join(f"palabra{i}" for i in range(500))
+    chunks = chunk_text(text, 100, 20)
+    assert all(0 < len(c) <= 100 for c in chunks)
+    # cada chunk empieza con una palabra que ya estaba al final del anterior
+    for prev, cur in zip(chunks, chunks[1:]):
+        assert cur.split(" ")[0] in prev.split(" ")
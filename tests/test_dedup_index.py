@@ -0,0 +1,44 @@
+# tests/test_dedup_index.py
+import numpy as np
+import pytest
+
+from app.services import dedupIndex, vectorStore
+
+
+@pytest.fixture(autouse=True)
+def _store(tmp_path, monkeypatch):
+    monkeypatch.setattr(vectorStore, "VECTOR_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(vectorStore.compactor, "schedule", lambda *args, **kwargs: False)
+
+
+def test_dedup_index_reads_base_and_delta():
+    rng = np.random.default_rng(2)
+    docs = {}
+
+    def update(doc_ids):
+        ids, sigs = [], []
+        for doc in doc_ids:
+            docs[doc] = (np.array([doc << 20, (doc << 20) | 1]), rng.integers(0, 3, (2, dedupIndex.NUM_PERM)).astype(np.uint32))
+            ids.append(docs[doc][0])
+            sigs.append(docs[doc][1])
+        dedupIndex.update_documents(1, doc_ids, np.concatenate(ids), np.concatenate(sigs))
+
+    def check():
+        index = dedupIndex.open_index(1)
+        ids = np.concatenate([i for i, _ in docs.values()])
+        sigs = np.concatenate([s for _, s in docs.values()])
+        reference = dedupIndex.DedupIndex.from_arrays(ids, sigs)
+        assert index.size == len(ids)
+        keys = dedupIndex.band_keys(sigs)
+        for got, expected in zip(index.candidates(keys), reference.candidates(keys)):
+            assert set(index.ids_at(got).tolist()) == set(reference.ids[expected].tolist())
+        return index
+
+    update(list(range(10)))
+    update([2, 11])
+    docs.pop(4)
+    dedupIndex.remove_documents(1, [4])
+    assert check().delta is not None
+    dedupIndex.compact(1)
+    index = check()
+    assert index.delta is None and index.generation == 1
@@ -0,0 +1,67 @@
+# tests/test_delta_log.py
+import os
+
+import numpy as np
+import pytest
+
+from app.services import deltaLog
+
+
+def _append(path, generation, doc, n, width=3):
+    ids = np.arange(n, dtype=np.int64) + (doc << 20)
+    rows = np.full((n, width), doc, dtype=np.float32)
+    return deltaLog.append(path, generation, np.array([doc]), ids, rows, hidden=1)
+
+
+def _docs(delta):
+    return [int(frame.removed[0]) for frame in delta.frames]
+
+
+def test_frames_round_trip(tmp_path):
+    path = str(tmp_path / "d.delta")
+    _append(path, 0, 1, 2)
+    counters = _append(path, 0, 2, 3)
+    delta = deltaLog.read(path, 0, np.float32)
+    assert _docs(delta) == [1, 2]
+    assert (counters.rows, counters.hidden) == (5, 2)
+    assert delta.end == os.path.getsize(path)
+    np.testing.assert_array_equal(delta.frames[1].rows, np.full((3, 3), 2, dtype=np.float32))
+
+
+@pytest.mark.parametrize("keep", [1, 20, 33, 60])
+def test_append_after_a_torn_frame_drops_it(tmp_path, keep):
+    path = str(tmp_path / "d.delta")
+    _append(path, 0, 1, 2)
+    _append(path, 0, 2, 2)
+    complete = os.path.getsize(path)
+    _append(path, 0, 3, 4)
+    # el proceso murió a mitad del tercer frame
+    with open(path, "r+b") as f:
+        f.truncate(complete + keep)
+    assert _docs(deltaLog.read(path, 0, np.float32)) == [1, 2]
+    _append(path, 0, 4, 1)
+    delta = deltaLog.read(path, 0, np.float32)
+    assert _docs(delta) == [1, 2, 4]
+    assert delta.end == os.path.getsize(path)
+
+
+def test_generations(tmp_path):
+    path = str(tmp_path / "d.delta")
+    _append(path, 1, 1, 1)
+    assert deltaLog.read(path, 2, np.float32) is None  # delta de un base ya fusionado
+    with pytest.raises(deltaLog.DeltaAhead):
+        deltaLog.read(path, 0, np.float32)
+    _append(path, 2, 2, 1)  # generación nueva: el delta viejo se descarta
+    assert _docs(deltaLog.read(path, 2, np.float32)) == [2]
+
+
+def test_rebase_keeps_only_frames_after_the_merge(tmp_path):
+    path = str(tmp_path / "d.delta")
+    _append(path, 0, 1, 2)
+    merged = deltaLog.read(path, 0, np.float32).end
+    _append(path, 0, 2, 3)
+    assert not deltaLog.rebase(path, 5, 6, merged, np.float32)
+    assert deltaLog.rebase(path, 0, 1, merged, np.float32)
+    delta = deltaLog.read(path, 1, np.float32)
+    assert _docs(delta) == [2]
+    assert (delta.rows, delta.hidden) == (3, 1)
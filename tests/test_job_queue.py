@@ -0,0 +1,216 @@
+# tests/test_job_queue.py
+import asyncio
+import json
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import delete, select, update
+
+from app.db import loadModels  # noqa: F401  registra los modelos en la metadata
+from app.db.base import Base
+from app.db.session import AsyncSessionLocal, engine
+from app.models.clients import Clients
+from app.models.documents import Documents
+from app.models.jobs import Jobs
+from app.schemas.documentsDto import CreateDocumentsDto, UpdateDocumentsDto
+from app.services.documentService import DocumentService
+from app.services.jobQueue import FAILED, INGEST, JOB_MAX_ATTEMPTS, QUEUED, RUNNING, JobQueue, job_queue, utcnow
+
+
+def run(coro):
+    """Corre `coro` en un loop nuevo y suelta las conexiones del pool (quedan atadas a ese loop)."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await engine.dispose()
+    return asyncio.run(main())
+
+
+async def _reset():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Jobs))
+        await db.execute(delete(Documents))
+        await db.execute(delete(Clients))
+        db.add_all([Clients(id=1, ruc="1", name="uno"), Clients(id=2, ruc="2", name="dos")])
+        await db.commit()
+
+
+async def _enqueue(queue: JobQueue, client_id: int, **payload) -> int:
+    async with AsyncSessionLocal() as db:
+        return (await queue.enqueue(db, client_id, INGEST, payload)).id
+
+
+async def _job(job_id: int) -> Jobs:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(Jobs).where(Jobs.id == job_id))).scalar_one()
+
+
+def _queue(owner: str, max_running_per_client: int = 1) -> JobQueue:
+    queue = JobQueue(0, 10, 10, max_running_per_client)
+    queue.owner = owner
+    return queue
+
+
+@pytest.fixture(autouse=True)
+def _clean_tables():
+    run(_reset())
+
+
+def test_claim_takes_the_oldest_job_and_leases_it():
+    async def scenario():
+        queue = _queue("w1")
+        first = await _enqueue(queue, 1, document_ids=[1])
+        await _enqueue(queue, 1, document_ids=[2])
+        job = await queue._claim()
+        row = await _job(job.id)
+        return first, job, row
+
+    first, job, row = run(scenario())
+    assert job.id == first and job.client_id == 1 and job.payload == {"document_ids": [1]}
+    assert job.attempts == 1
+    assert row.status == RUNNING and row.owner == "w1" and row.attempts == 1
+    assert row.lease_until > utcnow() and row.startedAt is not None
+
+
+def test_per_client_cap_blocks_a_second_claim():
+    async def scenario():
+        w1, w2 = _queue("w1"), _queue("w2")
+        a = await _enqueue(w1, 1)
+        b = await _enqueue(w1, 1)
+        c = await _enqueue(w1, 2)
+        claimed = [await w1._claim(), await w2._claim(), await w2._claim()]
+        return (a, b, c), claimed
+
+    (a, b, c), claimed = run(scenario())
+    # el segundo job del cliente 1 espera aunque otro worker esté libre
+    assert [j.id if j else None for j in claimed] == [a, c, None]
+
+
+def test_cap_is_enforced_between_concurrent_claims():
+    async def scenario():
+        workers = [_queue(f"w{i}") for i in range(4)]
+        for _ in range(4):
+            await _enqueue(workers[0], 1)
+        claimed = await asyncio.gather(*(w._claim() for w in workers))
+        async with AsyncSessionLocal() as db:
+            running = (await db.execute(select(Jobs.id).where(Jobs.status == RUNNING))).scalars().all()
+        return claimed, running
+
+    claimed, running = run(scenario())
+    assert len([j for j in claimed if j is not None]) == 1
+    assert len(running) == 1
+
+
+def test_release_requeues_without_spending_an_attempt():
+    async def scenario():
+        w1, w2 = _queue("w1"), _queue("w2")
+        job_id = await _enqueue(w1, 1)
+        job = await w1._claim()
+        await w1._release(job)
+        released = await _job(job_id)
+        again = await w2._claim()
+        return job_id, released, again
+
+    job_id, released, again = run(scenario())
+    assert released.status == QUEUED and released.owner is None and released.lease_until is None
+    assert released.attempts == 0
+    assert again.id == job_id and again.attempts == 1
+
+
+def test_expired_lease_goes_back_to_the_queue():
+    async def scenario():
+        w1, w2 = _queue("w1"), _queue("w2")
+        job_id = await _enqueue(w1, 1)
+        job = await w1._claim()
+        # w2 no lo recupera mientras la concesión siga vigente
+        assert await w2.recover_expired() == 0
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Jobs).where(Jobs.id == job_id).values(lease_until=utcnow() - timedelta(seconds=1)))
+            await db.commit()
+        recovered = await w2.recover_expired()
+        requeued = await _job(job_id)
+        taken = await w2._claim()
+        # el dueño anterior ya no puede cerrar ni devolver el job
+        finished = await w1._finish(job, "done", {"ok": True})
+        return job_id, recovered, requeued, taken, finished, await _job(job_id)
+
+    job_id, recovered, requeued, taken, finished, row = run(scenario())
+    assert recovered == 1
+    assert requeued.status == QUEUED and requeued.owner is None
+    assert taken.id == job_id and taken.attempts == 2
+    assert finished is False
+    assert row.status == RUNNING and row.owner == "w2"
+
+
+def test_expired_lease_fails_after_max_attempts():
+    async def scenario():
+        queue = _queue("w1")
+        job_id = await _enqueue(queue, 1)
+        await queue._claim()
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Jobs).where(Jobs.id == job_id)
+                .values(attempts=JOB_MAX_ATTEMPTS, lease_until=utcnow() - timedelta(seconds=1))
+            )
+            await db.commit()
+        recovered = await queue.recover_expired()
+        return recovered, queue.failed, await _job(job_id)
+
+    recovered, failed, row = run(scenario())
+    assert recovered == 0 and failed == 1
+    assert row.status == FAILED and row.finishedAt is not None and row.error
+
+
+async def _queued_jobs(client_id: int):
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(
+            select(Jobs).where(Jobs.idClient == client_id, Jobs.status == QUEUED).order_by(Jobs.id)
+        )).scalars().all()
+
+
+def test_document_changes_are_persisted_as_one_queued_job():
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            service = DocumentService(db)
+            first = await service.create_document(CreateDocumentsDto(idClient=1, title="a", content="uno"))
+            second = await service.create_document(CreateDocumentsDto(idClient=1, title="b", content="dos"))
+            await service.update_document(first.id, UpdateDocumentsDto(title="solo el título"))
+            await service.update_document(first.id, UpdateDocumentsDto(content="uno bis"))
+            await service.delete_document(second.id)
+            await service.create_document(CreateDocumentsDto(idClient=2, title="c", content="tres"))
+            ids = first.id, second.id
+        return ids, await _queued_jobs(1), await _queued_jobs(2)
+
+    (first, second), jobs, other = run(scenario())
+    # un solo job de ingestión por cliente con los documentos tocados, incluido el borrado
+    assert len(jobs) == 1 and len(other) == 1
+    payload = json.loads(jobs[0].payload)
+    assert jobs[0].kind == INGEST and payload["document_ids"] == [first, second]
+    assert payload["document_changes"] is True and jobs[0].progress_total == 2
+
+
+def test_document_changes_do_not_join_started_or_requested_jobs():
+    async def add(document_id):
+        async with AsyncSessionLocal() as db:
+            await job_queue.add_document_changes(db, 1, [document_id])
+            await db.commit()
+
+    async def scenario():
+        requested = await _enqueue(_queue("w1"), 1, document_ids=[7])
+        await add(1)
+        await add(2)
+        before = [json.loads(job.payload)["document_ids"] for job in await _queued_jobs(1)]
+        async with AsyncSessionLocal() as db:
+            # un worker tomó el job de cambios: lo que llega después va a otro job
+            await db.execute(update(Jobs).where(Jobs.id != requested).values(status=RUNNING))
+            await db.commit()
+        await add(3)
+        after = [json.loads(job.payload)["document_ids"] for job in await _queued_jobs(1)]
+        return before, after
+
+    before, after = run(scenario())
+    assert before == [[7], [1, 2]]
+    assert after == [[7], [3]]
@@ -0,0 +1,92 @@
+# tests/test_semantic_cache.py
+import asyncio
+import json
+
+import numpy as np
+import pytest
+from sqlalchemy import delete
+
+from app.db import loadModels  # noqa: F401  registra los modelos en la metadata
+from app.db.base import Base
+from app.db.session import AsyncSessionLocal, engine
+from app.models.chatDetails import ChatDetails
+from app.models.chats import Chats
+from app.models.clients import Clients
+from app.models.users import Users
+from app.services.chatService import sources_json
+from app.services.semanticCache import SemanticCache
+
+DIM = 4
+
+
+def run(coro):
+    """Corre `coro` en un loop nuevo y suelta las conexiones del pool (quedan atadas a ese loop)."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await engine.dispose()
+    return asyncio.run(main())
+
+
+async def _seed(chats):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        for model in (ChatDetails, Chats, Users, Clients):
+            await db.execute(delete(model))
+        db.add(Clients(id=1, ruc="1", name="uno"))
+        db.add(Users(id=1, username="u", email="u@x", password="x", idClient=1))
+        await db.flush()
+        db.add_all(Chats(idUser=1, **chat) for chat in chats)
+        await db.commit()
+
+
+async def _embed(texts):
+    return np.ones((len(texts), DIM), dtype=np.float32) / 2
+
+
+def _warm(chats):
+    async def scenario():
+        await _seed(chats)
+        cache = SemanticCache(0.5, 3600, 100)
+        async with AsyncSessionLocal() as db:
+            loaded = await cache.warm(1, db, _embed)
+        return cache, loaded
+    return run(scenario())
+
+
+def test_warm_loads_first_turns():
+    cache, loaded = _warm([
+        {"session_id": "a", "message": "¿horario?", "response": "de 9 a 18", "source_documents": "[3]"},
+        {"session_id": "a", "message": "¿y el sábado?", "response": "cerrado", "source_documents": "[3]"},
+    ])
+    assert loaded == 1
+    hit = cache.lookup(1, np.ones(DIM) / 2)
+    assert hit.answer == "de 9 a 18" and hit.doc_ids == frozenset({3})
+
+
+@pytest.mark.parametrize("chat", [
+    {"message": "¿política?", "response": "x" * 2000},
+    {"message": "q" * 1000, "response": "respuesta corta"},
+])
+def test_warm_skips_rows_cut_at_the_column_limit(chat):
+    cache, loaded = _warm([dict(chat, session_id="b", source_documents="[1]")])
+    assert loaded == 0
+    assert cache.lookup(1, np.ones(DIM) / 2) is None
+
+
+@pytest.mark.parametrize("sources", ["[1, 2", '{"a": 1}', sources_json(range(10**9, 10**9 + 1000))], ids=["cut", "object", "capped"])
+def test_warm_skips_rows_without_a_complete_source_list(sources):
+    cache, loaded = _warm([{"session_id": "c", "message": "¿precio?", "response": "10", "source_documents": sources}])
+    assert loaded == 0
+
+
+def test_sources_json_is_valid_and_fits_the_column():
+    ids = list(range(10**9, 10**9 + 1000)) + [10**9] * 50
+    raw = sources_json(ids)
+    assert len(raw) <= 4000
+    stored = json.loads(raw)
+    assert stored == ids[:len(stored)] and len(stored) == len(set(stored)) > 300
+    assert sources_json([5, 3, 5, 3]) == "[5, 3]"
+    assert json.loads(sources_json(range(10**6), limit=20)) == [0, 1, 2, 3, 4, 5]
@@ -0,0 +1,120 @@
+# tests/test_snapshot_store.py
+import json
+import mmap
+import os
+
+import numpy as np
+import pytest
+
+from app.services.snapshotStore import MAGIC, SnapshotWriter, _PREFIX, open_snapshot, write_snapshot
+
+
+def _header(path):
+    with open(path, "rb") as f:
+        magic, header_len = _PREFIX.unpack(f.read(_PREFIX.size))
+        assert magic == MAGIC
+        return json.loads(f.read(header_len).decode("utf-8"))
+
+
+def _arrays(n=1000, d=7):
+    rng = np.random.default_rng(0)
+    return {
+        "ids": rng.integers(0, 1 << 40, n, dtype=np.int64),
+        "vectors": rng.standard_normal((n, d)).astype(np.float32),
+        "flags": rng.integers(0, 2, n).astype(np.uint8),
+        "sigs": rng.integers(0, 1 << 32, (n, 3), dtype=np.uint64).astype(np.uint32),
+    }
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_round_trip(tmp_path, use_mmap):
+    path = str(tmp_path / "a.snap")
+    arrays = _arrays()
+    write_snapshot(path, arrays, {"dim": 7, "generation": 3})
+    snapshot = open_snapshot(path, use_mmap)
+    assert snapshot.meta == {"dim": 7, "generation": 3}
+    assert snapshot.mapped is use_mmap
+    assert snapshot.nbytes == os.path.getsize(path)
+    assert set(snapshot.arrays) == set(arrays)
+    for name, expected in arrays.items():
+        assert snapshot[name].dtype == expected.dtype
+        np.testing.assert_array_equal(snapshot[name], expected)
+        assert not snapshot[name].flags.writeable
+
+
+def test_arrays_are_page_aligned(tmp_path):
+    path = str(tmp_path / "a.snap")
+    # arreglos con tamaños que no son múltiplo de página
+    write_snapshot(path, _arrays(n=1001, d=3))
+    offsets = [spec["offset"] for spec in _header(path)["arrays"].values()]
+    assert all(offset % mmap.PAGESIZE == 0 for offset in offsets)
+    assert len(set(offsets)) == len(offsets)
+    snapshot = open_snapshot(path)
+    for array in snapshot.arrays.values():
+        assert array.ctypes.data % mmap.PAGESIZE == 0
+
+
+def test_block_writes_equal_single_write(tmp_path):
+    arrays = _arrays(n=997)
+    whole, blocks = str(tmp_path / "whole.snap"), str(tmp_path / "blocks.snap")
+    write_snapshot(whole, arrays)
+    layout = {name: (a.dtype, a.shape) for name, a in arrays.items()}
+    with SnapshotWriter(blocks, layout) as writer:
+        for name, a in arrays.items():
+            for i in range(0, len(a), 100):
+                writer.write(name, a[i:i + 100])
+    with open(whole, "rb") as a, open(blocks, "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_empty_arrays(tmp_path):
+    path = str(tmp_path / "empty.snap")
+    write_snapshot(path, {"ids": np.empty(0, dtype=np.int64), "vectors": np.empty((0, 5), dtype=np.float32)})
+    snapshot = open_snapshot(path)
+    assert snapshot["ids"].shape == (0,)
+    assert snapshot["vectors"].shape == (0, 5)
+    assert snapshot["vectors"].dtype == np.float32
+
+
+def test_incomplete_snapshot_is_not_published(tmp_path):
+    path = str(tmp_path / "a.snap")
+    writer = SnapshotWriter(path, {"ids": (np.int64, (10,))})
+    writer.write("ids", np.arange(5))
+    with pytest.raises(ValueError):
+        writer.commit()
+    writer.abort()
+    assert os.listdir(tmp_path) == []
+
+
+def test_write_past_declared_shape_fails(tmp_path):
+    with SnapshotWriter(str(tmp_path / "a.snap"), {"ids": (np.int64, (4,))}) as writer:
+        writer.write("ids", np.arange(4))
+        with pytest.raises(ValueError):
+            writer.write("ids", np.arange(1))
+
+
+def test_abort_keeps_previous_snapshot(tmp_path):
+    path = str(tmp_path / "a.snap")
+    write_snapshot(path, {"ids": np.arange(3)})
+    with pytest.raises(RuntimeError):
+        with SnapshotWriter(path, {"ids": (np.int64, (3,))}) as writer:
+            writer.write("ids", np.array([7, 8, 9]))
+            raise RuntimeError("falla a mitad de la escritura")
+    assert os.listdir(tmp_path) == ["a.snap"]
+    np.testing.assert_array_equal(open_snapshot(path)["ids"], [0, 1, 2])
+
+
+def test_open_mapping_survives_replacement(tmp_path):
+    path = str(tmp_path / "a.snap")
+    write_snapshot(path, {"ids": np.arange(1000)})
+    old = open_snapshot(path)
+    write_snapshot(path, {"ids": np.arange(1000) * 2})
+    np.testing.assert_array_equal(old["ids"], np.arange(1000))
+    np.testing.assert_array_equal(open_snapshot(path)["ids"], np.arange(1000) * 2)
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not.snap"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        open_snapshot(str(path))
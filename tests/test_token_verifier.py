@@ -0,0 +1,166 @@
+# tests/test_token_verifier.py
+import asyncio
+import base64
+import importlib.util
+import json
+import time
+
+import pytest
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+from app.shared import ttlCache
+
+ISSUER = "https://cognito-idp.us-east-1.amazonaws.com/us-east-1_test"
+CLIENT_ID = "app-client"
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _int(value: int) -> str:
+    return _b64(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+class Keys:
+    """Claves RSA locales publicadas como JWKS en un archivo (el de COGNITO_JWKS_FILE)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.private = {}
+
+    def add(self, kid: str) -> None:
+        self.private[kid] = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.publish()
+
+    def publish(self) -> None:
+        keys = []
+        for kid, key in self.private.items():
+            numbers = key.public_key().public_numbers()
+            keys.append({"kty": "RSA", "kid": kid, "alg": "RS256", "use": "sig", "n": _int(numbers.n), "e": _int(numbers.e)})
+        self.path.write_text(json.dumps({"keys": keys}), encoding="utf-8")
+
+    def token(self, kid: str = "k1", signer: str = None, alg: str = "RS256", **overrides) -> str:
+        now = int(time.time())
+        claims = {"iss": ISSUER, "token_use": "access", "client_id": CLIENT_ID, "sub": "u1", "exp": now + 600, "iat": now}
+        claims.update(overrides)
+        claims = {k: v for k, v in claims.items() if v is not None}
+        header = _b64(json.dumps({"kid": kid, "alg": alg}).encode())
+        payload = _b64(json.dumps(claims).encode())
+        key = self.private[signer or kid]
+        signature = key.sign(f"{header}.{payload}".encode(), padding.PKCS1v15(), hashes.SHA256())
+        return f"{header}.{payload}.{_b64(signature)}"
+
+
+@pytest.fixture
+def keys(tmp_path):
+    keys = Keys(tmp_path / "jwks.json")
+    keys.add("k1")
+    return keys
+
+
+@pytest.fixture
+def verifier_module(keys, monkeypatch):
+    """Copia propia de tokenVerifier configurada por entorno, como en producción."""
+    monkeypatch.setenv("COGNITO_JWKS_FILE", str(keys.path))
+    monkeypatch.setenv("COGNITO_ISSUER", ISSUER)
+    monkeypatch.setenv("COGNITO_APP_CLIENT_ID", CLIENT_ID)
+    monkeypatch.setenv("JWT_LEEWAY_SECONDS", "0")
+    monkeypatch.setenv("JWKS_MIN_REFRESH_SECONDS", "0")
+    spec = importlib.util.find_spec("app.services.tokenVerifier")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def verifier(verifier_module):
+    asyncio.run(verifier_module.jwks_cache.refresh())
+    return verifier_module.token_verifier
+
+
+def test_valid_token(verifier, keys):
+    claims = verifier.verify(keys.token(sub="abc"))
+    assert claims["sub"] == "abc" and claims["client_id"] == CLIENT_ID
+
+
+def test_id_token_uses_aud(verifier, keys):
+    assert verifier.verify(keys.token(token_use="id", client_id=None, aud=CLIENT_ID))["token_use"] == "id"
+
+
+def test_bad_signature(verifier_module, verifier, keys):
+    keys.private["other"] = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    with pytest.raises(verifier_module.InvalidToken, match="Firma inválida"):
+        verifier.verify(keys.token(kid="k1", signer="other"))
+    header, payload, signature = keys.token().split(".")
+    tampered = _b64(json.dumps(dict(json.loads(base64.urlsafe_b64decode(payload + "==")), sub="root")).encode())
+    with pytest.raises(verifier_module.InvalidToken, match="Firma inválida"):
+        verifier.verify(f"{header}.{tampered}.{signature}")
+    assert verifier.rejected == 2
+
+
+@pytest.mark.parametrize("token_kwargs, message", [
+    ({"exp": int(time.time()) - 5}, "expirado"),
+    ({"exp": None}, "expirado"),
+    ({"nbf": int(time.time()) + 300}, "aún no válido"),
+    ({"iss": "https://evil.example.com"}, "Emisor"),
+    ({"token_use": "refresh"}, "token_use"),
+    ({"client_id": "other-client"}, "otro cliente"),
+    ({"token_use": "id", "client_id": None, "aud": "other-client"}, "otro cliente"),
+    ({"alg": "HS256"}, "Algoritmo"),
+])
+def test_rejected_claims(verifier_module, verifier, keys, token_kwargs, message):
+    with pytest.raises(verifier_module.InvalidToken, match=message):
+        verifier.verify(keys.token(**token_kwargs))
+
+
+def test_malformed_token(verifier_module, verifier):
+    for token in ("", "a.b", "a.b.c", "e30.e30.e30.e30"):
+        with pytest.raises(verifier_module.InvalidToken):
+            verifier.verify(token)
+
+
+def test_unknown_kid_triggers_refresh(verifier_module, keys):
+    jwks = verifier_module.jwks_cache
+    verifier = verifier_module.token_verifier
+
+    async def scenario():
+        await jwks.start()
+        try:
+            keys.add("k2")  # rotación: el JWKS publicado ya tiene la clave nueva
+            token = keys.token(kid="k2")
+            with pytest.raises(verifier_module.InvalidToken, match="desconocida"):
+                verifier.verify(token)
+            for _ in range(100):
+                if jwks.get("k2") is not None:
+                    break
+                await asyncio.sleep(0.01)
+            return verifier.verify(token)
+        finally:
+            await jwks.stop()
+
+    assert asyncio.run(scenario())["sub"] == "u1"
+    assert jwks.refreshes == 2 and sorted(jwks.stats()["keys"]) == ["k1", "k2"]
+
+
+class _Clock:
+    def __init__(self):
+        self.offset = 0.0
+
+    def monotonic(self) -> float:
+        return time.monotonic() + self.offset
+
+
+def test_cache_hit_until_exp(verifier_module, verifier, keys, monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(ttlCache, "time", clock)
+    token = keys.token(exp=int(time.time()) + 60)
+    claims = verifier.verify(token)
+    # sin claves la firma ya no se puede comprobar: la segunda respuesta sale de la caché
+    verifier.jwks.load({"keys": []})
+    assert verifier.verify(token) == claims
+    assert verifier.stats()["verified_cache"]["hits"] == 1
+    clock.offset = 61
+    with pytest.raises(verifier_module.InvalidToken):
+        verifier.verify(token)
@@ -0,0 +1,126 @@
+# tests/test_vector_delta.py
+import os
+
+import numpy as np
+import pytest
+
+from app.services import vectorStore
+
+DIM = 8
+
+
+@pytest.fixture(autouse=True)
+def _store(tmp_path, monkeypatch):
+    monkeypatch.setattr(vectorStore, "VECTOR_STORE_DIR", str(tmp_path))
+    # las compactaciones se corren a mano: el resultado no depende de un hilo en segundo plano
+    monkeypatch.setattr(vectorStore.compactor, "schedule", lambda *args, **kwargs: False)
+
+
+class Truth:
+    """Contenido esperado del cliente, para comparar contra una búsqueda por fuerza bruta."""
+
+    def __init__(self, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        self.docs = {}
+
+    def upsert(self, doc_ids):
+        ids, vectors = [], []
+        for doc in doc_ids:
+            n = int(self.rng.integers(1, 5))
+            self.docs[doc] = (
+                np.array([(doc << 20) | c for c in range(n)], dtype=np.int64),
+                self.rng.standard_normal((n, DIM)).astype(np.float32),
+            )
+            ids.append(self.docs[doc][0])
+            vectors.append(self.docs[doc][1])
+        return vectorStore.upsert_document_vectors(1, doc_ids, np.concatenate(ids), np.concatenate(vectors))
+
+    def remove(self, doc_ids):
+        for doc in doc_ids:
+            self.docs.pop(doc, None)
+        return vectorStore.remove_documents(1, doc_ids)
+
+    def check(self):
+        flat = vectorStore.open_vectors(1)
+        ids = np.concatenate([ids for ids, _ in self.docs.values()])
+        vectors = np.concatenate([v for _, v in self.docs.values()])
+        assert flat.ntotal == len(ids)
+        queries = self.rng.standard_normal((6, DIM)).astype(np.float32)
+        _, found = flat.search(queries, 9)
+        expected = ids[np.argsort(-(queries @ vectors.T), axis=1, kind="stable")[:, :9]]
+        np.testing.assert_array_equal(found, expected)
+        positions = flat.locate(ids)
+        assert (positions >= 0).all()
+        np.testing.assert_array_equal(flat.ids_at(positions), ids)
+        np.testing.assert_allclose(flat.take(positions), vectors)
+        blocks = np.concatenate([block_ids for block_ids, _ in flat.blocks(5)])
+        assert sorted(blocks.tolist()) == sorted(ids.tolist())
+        return flat
+
+
+def test_changes_go_to_the_delta_and_compaction_merges_them():
+    truth = Truth()
+    assert truth.upsert(list(range(12))) == sum(len(i) for i, _ in truth.docs.values())
+    size = os.path.getsize(vectorStore.index_path(1))
+    assert not truth.check().layered
+
+    truth.upsert([3, 4, 40])
+    removed = len(truth.docs[5][0])
+    assert truth.remove([5]) == removed
+    flat = truth.check()
+    assert flat.layered and flat.generation == 0
+    # el snapshot base no se reescribió
+    assert os.path.getsize(vectorStore.index_path(1)) == size
+    assert (flat.locate(np.array([5 << 20])) == -1).all()
+
+    assert vectorStore.compact(1) == flat.ntotal
+    flat = truth.check()
+    assert not flat.layered and flat.generation == 1
+
+    truth.upsert([41])
+    assert truth.check().generation == 1
+    assert vectorStore.compact(1) is not None
+    assert vectorStore.compact(1) is None  # nada pendiente
+
+
+def test_frames_written_during_compaction_survive_it(monkeypatch):
+    truth = Truth(1)
+    truth.upsert(list(range(8)))
+    truth.upsert([1])
+    publish = vectorStore._publish_vectors
+
+    def publish_and_race(*args, **kwargs):
+        # otro worker escribe mientras se arma el snapshot compactado (sin el lock del cliente)
+        writer = publish(*args, **kwargs)
+        truth.upsert([2, 50])
+        truth.remove([3])
+        return writer
+
+    monkeypatch.setattr(vectorStore, "_publish_vectors", publish_and_race)
+    vectorStore.compact(1)
+    flat = truth.check()
+    assert flat.generation == 1 and flat.layered
+
+
+@pytest.mark.parametrize("overfetch", [0, 3, 256])
+def test_search_skips_hidden_rows_with_a_bounded_overfetch(monkeypatch, overfetch):
+    monkeypatch.setattr(vectorStore, "VECTOR_SEARCH_OVERFETCH", overfetch)
+    truth = Truth(2)
+    truth.upsert(list(range(30)))
+    # documentos reemplazados y borrados: sus filas viejas siguen en el base, ocultas
+    truth.upsert(list(range(0, 30, 3)))
+    truth.remove(list(range(1, 30, 4)))
+    flat = truth.check()
+    assert flat.dead.size > 3
+
+
+def test_hidden_rows_alone_trigger_compaction(monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(vectorStore, "VECTOR_COMPACT_MAX_HIDDEN", 5)
+    monkeypatch.setattr(vectorStore.compactor, "schedule", lambda client_id, *args: scheduled.append(client_id))
+    truth = Truth(3)
+    truth.upsert(list(range(10)))
+    truth.remove([0])
+    assert scheduled == []
+    truth.remove([1, 2, 3])
+    assert scheduled == [1]